@@ -1,21 +1,45 @@
+import copy
+import math
 import os
-import re
+import queue
+import threading
+import time
+from bisect import bisect_left
+from functools import partial
 
 from tkinter import *
 from tkinter import filedialog, colorchooser
 
 from PIL import ImageTk, Image
 
-from util.graph_plotter import graph_plotter
+from util.graph_plotter import graph_plotter, load_graph, load_image
 from gui.tk_factory import TkFactory
+from util.batch_render import BatchRenderer
+from util.dir_scanner import DirScanner, insert_sorted
+from util.export_manifest import style_hash
 from util.draw_graph import GraphDrawer
-from util.gxl_graph import ParsedGxlGraph
+from util.gxl_cache import GxlCache
+from util.gxl_schema import GxlDirSchema
+from util.image_encoder import EncodeOptions
+from util.image_index import ImageIndex
+from util.lru_cache import LRUCache
+from util.prefetcher import Prefetcher
+from util.render_worker import RenderWorker
+from util.search_index import SearchIndex
+from util.stats import stats
 
 # Import configuration of the nodes and edges
-from util.default_config import node_style, edge_style
+from util.default_config import node_style, edge_style, cache_dir, cache_max_bytes, graph_cache_max_bytes, \
+    image_cache_max_bytes, prefetch_depth, prefetch_workers, prefetch_render, drawer_cache_max_bytes, \
+    save_all_workers, export_format, tile_size, tile_cache_max_bytes, max_zoom
 
 
 class GraphViewer:
+    # delay (ms) merging the redraw requests, e.g. while the transparency scale is dragged
+    render_delay = 15
+    # interval (ms) at which the result of the background drawing is checked
+    poll_interval = 15
+
     def __init__(self, img_dir, gxl_dir, color_by_feature, cb_blank, transparency, scaling, selected_node):
         """
         This class provides all the methods associated to widgets and update the GUI if necessary.
@@ -37,7 +61,73 @@ class GraphViewer:
         self.selected_node = selected_node
 
         self.graph_img = GraphDrawer
+        # gxl file and image drawn by graph_img
+        self.drawn_files = (None, None)
+        # index of the images of img_dir, rebuilt when another directory is chosen
+        self.image_index = None
         self.listbox_content = []
+        self.pending_files = []
+        self.search_index = SearchIndex([])
+        # listing of the gxl directory and probing of its features, both in background threads
+        self.dir_scanner = None
+        self.dir_schema = None
+        # features of the node clicked on the canvas, read in a background thread (lazily parsed features are
+        # decoded from the gxl file)
+        self.node_info_worker = RenderWorker()
+        # Save All running in a background thread: BatchRenderer, queue of its results, number of results and
+        # failures received, time spent rendering (without the pauses) and time of the last update
+        self.batch_renderer = None
+        self.save_all_results = queue.Queue()
+        self.save_all_done = 0
+        self.save_all_failed = 0
+        self.save_all_time = 0.0
+        self.save_all_tick = 0.0
+        # draw all the images again, also the up to date ones (see ExportManifest)
+        self.save_all_rebuild = BooleanVar()
+        self.save_all_rebuild.set(False)
+        # format of the images saved by Save and Save All (see EncodeOptions)
+        self.export_format = StringVar()
+        self.export_format.set(export_format)
+        # 'graph' or 'density' (heatmap of the nodes)
+        self.render_mode = StringVar()
+        self.render_mode.set('graph')
+        self.gxl_cache = GxlCache(cache_dir, cache_max_bytes)
+        # parsed graphs and decoded images, such that changing the style only redraws the graph
+        self.graph_cache = LRUCache(graph_cache_max_bytes)
+        self.image_cache = LRUCache(image_cache_max_bytes)
+        # the graph is drawn in a background thread, graph_img is only used while holding drawer_lock
+        self.render_worker = RenderWorker()
+        self.drawer_lock = threading.Lock()
+        self.render_after = None
+        self.poll_after = None
+        # time of the last drawing request, the time until the graph is shown is measured as the latency stage
+        self.render_requested = 0.0
+        # show the time of the stages and the cache statistics on the canvas
+        self.show_stats = BooleanVar()
+        self.show_stats.set(stats.enabled)
+        # drawers of the previously shown and of the prefetched graphs {(gxl file, image): GraphDrawer}
+        self.drawer_cache = LRUCache(drawer_cache_max_bytes)
+        self.prefetcher = Prefetcher(prefetch_workers)
+        # zoomed view: scale of the drawing compared to the full resolution of the image (None = the whole image is
+        # fitted to the canvas), position of the top left corner of the canvas in the drawing at that scale, files
+        # shown and size of their image at full resolution
+        self.view_scale = None
+        self.view_x, self.view_y = 0, 0
+        self.view_files = (None, None)
+        self.view_full_size = None
+        # rendered tiles {(gxl file, image, style hash, scale, column, row): PIL image}
+        self.tile_cache = LRUCache(tile_cache_max_bytes)
+        # tiles on the canvas {(scale, column, row): (gxl file, image, style hash, canvas item, PhotoImage)}
+        self.tile_items = {}
+        # (gxl file, image, style hash) of the tiles requested last, number of the request (older ones stop)
+        self.tile_base = None
+        self.tile_request = 0
+        self.pan_position = None
+        self.press_position = None
+        # (parsed graph, scaling) of the last drawing, used to find the node under the mouse
+        self.view_graph = None
+        # legend of the node colors of the last drawing (see GraphDrawer.get_legend)
+        self.view_legend = []
 
         self.components = dict()
         self.customizers = dict()
@@ -73,48 +163,115 @@ class GraphViewer:
 
     def load_gxl_dir(self, new_dir):
         """
-        Load the gxl files on the listbox.
+        Load the gxl files on the listbox. The directory is listed in a background thread and the files are added
+        to the listbox as they are found, the listing of the previous directory is cancelled.
 
         Parameters:
             new_dir: directory where the gxl files are.
         """
+        if self.dir_scanner is not None:
+            self.dir_scanner.cancel()
         self.gxl_dir.set(new_dir)
+        self.listbox_content = []
+        # files listed but not inserted in listbox_content yet (see poll_gxl_dir)
+        self.pending_files = []
+        self.search_index = SearchIndex([])
+        # the listbox only creates its visible rows
+        self.components['gxl_listbox'].set_items(self.listbox_content)
+        # the search is available once the whole directory is listed
+        self.components['lb_entry']['state'] = DISABLED
+        self.dir_scanner = DirScanner(new_dir, '.gxl')
+        self.poll_gxl_dir(self.dir_scanner)
+        self.load_graph_features()
+
+    def poll_gxl_dir(self, dir_scanner):
+        """
+        Add the gxl files found since the last call to the listbox, the first graph is drawn as soon as it is found.
+
+        Parameters:
+            dir_scanner: DirScanner listing the gxl directory.
+        """
+        if dir_scanner is not self.dir_scanner:
+            # another directory was chosen
+            return
         listbox = self.components['gxl_listbox']
-        # delete previous gxl dir
-        listbox.delete(0, END)
-        for file in sorted(os.listdir(new_dir)):
-            if file.lower().endswith('.gxl'):
-                if os.path.isfile(os.path.join(new_dir, file)):
-                    listbox.insert(END, file.rsplit('.', 1)[0])
-        if listbox.size() > 0:
-            listbox.select_set(0)
-            self.listbox_content = listbox.get(0, END)
-            self.components['lb_entry']['state'] = NORMAL
-            self.load_graph_features()
-            self.onselect()
+        progress_label = self.components['gxl_progress_label']
+        self.pending_files.extend(file.rsplit('.', 1)[0] for file in dir_scanner.poll())
+        # every insertion goes through the whole list -> the files are inserted once they are an eighth of the
+        # inserted files (or the listing is done), such that listing n files takes O(n log n) and not O(n^2)
+        if self.pending_files and (dir_scanner.done or len(self.pending_files) * 8 >= len(self.listbox_content)):
+            selection = listbox.curselection()
+            selected = listbox.get(selection[0]) if selection else None
+            top = listbox.get(listbox.nearest(0)) if selected is not None else None
+            # the listbox shows listbox_content, selecting an item refreshes its visible rows
+            insert_sorted(self.listbox_content, self.pending_files)
+            self.pending_files = []
+            if selected is None:
+                listbox.select_set(0)
+                self.onselect()
+            else:
+                listbox.select_set(bisect_left(self.listbox_content, selected))
+                # selecting scrolls to the selection -> the first visible row is shown at the top again (the middle
+                # of its fraction, such that the rounding of the fraction gives it back)
+                listbox.yview(MOVETO, (bisect_left(self.listbox_content, top) + 0.5) / len(self.listbox_content))
+
+        if not dir_scanner.done:
+            progress_label['text'] = f'Loading... {dir_scanner.count} gxl files'
+            listbox.after(50, self.poll_gxl_dir, dir_scanner)
+        elif dir_scanner.error is not None:
+            progress_label['text'] = f'Could not list the directory: {dir_scanner.error}'
+        else:
+            progress_label['text'] = f'{len(self.listbox_content)} gxl files'
+            self.search_index = SearchIndex(self.listbox_content)
+            if self.listbox_content:
+                self.components['lb_entry']['state'] = NORMAL
 
     def update_gxl_listbox(self, pattern):
         """
-        Update the list of gxl files such that it only display files that start with a given pattern.
+        Update the list of gxl files such that it only displays the files matching a given pattern: the files
+        starting with it first, then the files containing it, then the files containing its characters in order.
 
         Parameters:
              pattern: string given by the user.
         """
-        listbox = self.components['gxl_listbox']
-        listbox.delete(0, END)
-        for file in self.listbox_content:
-            if str(file).upper().startswith(pattern.get().upper()):
-                listbox.insert(END, file)
+        self.components['gxl_listbox'].set_items(self.search_index.search(pattern.get()))
 
     def load_graph_features(self):
         """
-        Fill the option menu with the graph features in order to color the nodes by features.
+        Fill the option menu with the graph features in order to color the nodes by features. The features of the
+        gxl files are read in background threads while the directory is listed, the probing of the previous
+        directory is cancelled.
         """
-        parsed = ParsedGxlGraph(os.path.join(self.gxl_dir.get(), os.listdir(self.gxl_dir.get())[0]))
-        features = [f for f in parsed.node_feature_names if f not in ['x', 'y']]
-        for feature in features:
-            cbf_menu = self.components['cbf_menu']
-            cbf_menu['menu'].add_command(label=feature, command=lambda value=feature: self.color_by_feature.set(value))
+        if self.dir_schema is not None:
+            self.dir_schema.cancel()
+        # remove the features of the previous directory (keep 'None')
+        self.components['cbf_menu']['menu'].delete(1, END)
+        self.dir_schema = GxlDirSchema(self.gxl_dir.get())
+        self.poll_graph_features(self.dir_schema, [])
+
+    def poll_graph_features(self, dir_schema, features):
+        """
+        Update the option menu with the features of the gxl files probed since the last call: the menu is filled
+        from the first probed file, the features missing in the next files are removed.
+
+        Parameters:
+            dir_schema: GxlDirSchema probing the gxl directory.
+            features: features in the menu
+        """
+        if dir_schema is not self.dir_schema:
+            # another directory was chosen
+            return
+        cbf_menu = self.components['cbf_menu']
+        done = dir_schema.done
+        # only the features every graph of the directory has can be used to color the nodes
+        new_features = [f for f in dir_schema.get_node_intersection() if f not in ['x', 'y']]
+        if new_features != features:
+            cbf_menu['menu'].delete(1, END)
+            for feature in new_features:
+                cbf_menu['menu'].add_command(label=feature,
+                                             command=lambda value=feature: self.color_by_feature.set(value))
+        if not done:
+            cbf_menu.after(self.poll_interval, self.poll_graph_features, dir_schema, new_features)
 
     def get_color_by_feature(self):
         """
@@ -128,6 +285,34 @@ class GraphViewer:
         else:
             return self.color_by_feature.get()
 
+    def get_style(self):
+        """
+        Get a copy of the current style, which can be used outside of the GUI thread.
+
+        Returns:
+            dict with the parameters of graph_plotter defining the style.
+        """
+        return {'color_by_feature': self.get_color_by_feature(), 'current_node': self.selected_node.get(),
+                'scaling': float(self.scaling.get()), 'transparency': self.transparency.get(),
+                'node_style': copy.deepcopy(node_style), 'edge_style': copy.deepcopy(edge_style),
+                'render_mode': self.render_mode.get(),
+                'density_weight': self.components['density_weight_entry'].get().strip() or None,
+                'density_class': self.components['density_class_entry'].get().strip() or None}
+
+    def get_encoding(self):
+        """
+        Get the format, quality, compression level and maximal size of the saved images chosen by the user.
+
+        Returns:
+            EncodeOptions, the empty entries are None (default of OpenCV / full size).
+        """
+        def entry_value(name):
+            value = self.components[name].get()
+            return int(value) if value else None
+
+        return EncodeOptions(self.export_format.get(), entry_value('export_quality_entry'),
+                             entry_value('export_compression_entry'), entry_value('export_max_size_entry'))
+
     def save_img(self, *arg):
         """
         Save the current image in a directory chosen by the user.
@@ -135,27 +320,136 @@ class GraphViewer:
         output_path = filedialog.askdirectory()
         if output_path:
             if os.path.isdir(output_path):
-                self.graph_img.save(output_path)
+                style = self.get_style()
+                with self.drawer_lock:
+                    gxl_filepath, img_filepath = self.drawn_files
+                    if self.graph_img.img_scale == 1.0:
+                        # the drawer may not have drawn the latest style yet
+                        self.update_graph_img(gxl_filepath, img_filepath, style)
+                        graph_img = self.graph_img
+                    else:
+                        # the preview was drawn on a reduced image, the image is decoded again at full resolution
+                        graph_img = graph_plotter(gxl_filepath=gxl_filepath, img_filepath=img_filepath, **style,
+                                                  cache=self.gxl_cache, lazy=True, graph_cache=self.graph_cache)
+                    graph_img.save(output_path, encoding=self.get_encoding())
 
     def save_all(self, *args):
         """
-        Save all images in a directory chosen by the user.
+        Save all images in a directory chosen by the user. The images are drawn by worker processes, the progress
+        and the errors are shown under the Save All button.
         """
+        if self.batch_renderer is not None:
+            return
         output_path = filedialog.askdirectory()
         if output_path:
             if os.path.isdir(output_path):
-                for gxl_file in os.listdir(self.gxl_dir.get()):
-                    gxl_filename = gxl_file.rsplit('.', 1)[0]
-                    img_filepath = self.search_img_filepath(gxl_filename)
-                    if img_filepath:
-                        gxl_filepath = os.path.join(self.gxl_dir.get(), gxl_file)
-                        temp_graph = graph_plotter(gxl_filepath=gxl_filepath, img_filepath=img_filepath,
-                                                   color_by_feature=self.get_color_by_feature(),
-                                                   node_style=node_style, edge_style=edge_style,
-                                                   scaling=float(self.scaling.get()),
-                                                   transparency=self.transparency.get(),
-                                                   current_node=self.selected_node.get())
-                        temp_graph.save(output_path)
+                workers = self.components['save_all_workers_entry'].get()
+                self.batch_renderer = BatchRenderer(self.gxl_dir.get(), self.img_dir.get() or None, output_path,
+                                                    style=self.get_style(),
+                                                    workers=int(workers) if workers else save_all_workers,
+                                                    blank=self.cb_blank.get(),
+                                                    incremental=not self.save_all_rebuild.get(),
+                                                    encoding=self.get_encoding())
+                self.save_all_results = queue.Queue()
+                self.save_all_done, self.save_all_failed = 0, 0
+                self.save_all_time, self.save_all_tick = 0.0, time.monotonic()
+                threading.Thread(target=self.run_save_all, args=(self.batch_renderer, self.save_all_results),
+                                 daemon=True).start()
+
+                self.components['save_all_errors'].delete(0, END)
+                self.components['save_all_progressbar']['value'] = 0
+                self.components['save_all_button']['state'] = DISABLED
+                self.components['save_all_pause_button'].configure(text='Pause', state=NORMAL)
+                self.components['save_all_cancel_button']['state'] = NORMAL
+                self.poll_save_all()
+
+    @staticmethod
+    def run_save_all(batch_renderer, results):
+        """
+        Render all the files and send the results to the GUI thread (called in a background thread).
+
+        Parameters:
+            batch_renderer: BatchRenderer of the files.
+            results: queue receiving the RenderResult of every file, then None.
+        """
+        try:
+            for result in batch_renderer.run():
+                results.put(result)
+        finally:
+            results.put(None)
+
+    def poll_save_all(self):
+        """
+        Show the progress of Save All: number of files saved, estimated remaining time and errors.
+        """
+        batch_renderer = self.batch_renderer
+        now = time.monotonic()
+        if not batch_renderer.paused:
+            self.save_all_time += now - self.save_all_tick
+        self.save_all_tick = now
+
+        finished = False
+        while not finished:
+            try:
+                result = self.save_all_results.get_nowait()
+            except queue.Empty:
+                break
+            if result is None:
+                finished = True
+            else:
+                self.save_all_done += 1
+                if result.error is not None:
+                    self.save_all_failed += 1
+                    self.components['save_all_errors'].insert(
+                        END, f'{os.path.basename(result.gxl_filepath)}: {result.error}')
+
+        total = len(batch_renderer.jobs)
+        done, failed = self.save_all_done, self.save_all_failed
+        self.components['save_all_progressbar']['value'] = 100 * done / total if total else 100
+        save_all_label = self.components['save_all_label']
+        if finished:
+            state = 'Cancelled' if batch_renderer.cancelled else 'Done'
+            save_all_label['text'] = f'{state}: {done - failed} saved, {len(batch_renderer.up_to_date)} up to date, ' \
+                                     f'{failed} failed, {len(batch_renderer.skipped)} without image ' \
+                                     f'in {self.save_all_time:.0f}s'
+            self.batch_renderer = None
+            self.components['save_all_button']['state'] = NORMAL
+            self.components['save_all_pause_button']['state'] = DISABLED
+            self.components['save_all_cancel_button']['state'] = DISABLED
+            return
+
+        if batch_renderer.cancelled:
+            progress = 'cancelling...'
+        elif batch_renderer.paused:
+            progress = 'paused'
+        elif done > 0:
+            # estimated from the average time per file so far
+            progress = f'{self.save_all_time / done * (total - done):.0f}s left'
+        else:
+            progress = 'starting...'
+        save_all_label['text'] = f'{done}/{total} saved ({failed} failed), {progress}'
+        save_all_label.after(100, self.poll_save_all)
+
+    def pause_save_all(self, *args):
+        """
+        Pause or resume Save All.
+        """
+        if self.batch_renderer is None:
+            return
+        if self.batch_renderer.paused:
+            self.batch_renderer.resume()
+            self.components['save_all_pause_button']['text'] = 'Pause'
+        else:
+            self.batch_renderer.pause()
+            self.components['save_all_pause_button']['text'] = 'Resume'
+
+    def cancel_save_all(self, *args):
+        """
+        Stop Save All, the files being drawn are finished.
+        """
+        if self.batch_renderer is not None:
+            self.batch_renderer.cancel()
+            self.components['save_all_pause_button']['state'] = DISABLED
 
     def search_img_filepath(self, gxl_filename):
         """
@@ -167,23 +461,31 @@ class GraphViewer:
         Returns:
             Path to the corresponding image if exists, otherwise None.
         """
-        extensions = ('png', 'bmp', 'jpg', 'jpeg', 'gif')
-
-        for img in os.listdir(self.img_dir.get()):
-            if re.match(r'.*' + re.escape(gxl_filename) + r'.*', img):
-                for ext in extensions:
-                    if img.endswith(ext):
-                        return os.path.join(self.img_dir.get(), img)
-
-        return None
+        img_dir = self.img_dir.get()
+        if not img_dir:
+            return None
+        if self.image_index is None or self.image_index.img_dir != img_dir:
+            self.image_index = ImageIndex(img_dir)
+        return self.image_index.lookup(gxl_filename)
 
     def onselect(self, *args):
         """
-        Draw the image with the graph on the canvas
+        Draw the image with the graph on the canvas. The requests following each other within render_delay are
+        merged in a single drawing.
+        """
+        canvas = self.components['canvas']
+        if self.render_after is not None:
+            canvas.after_cancel(self.render_after)
+        self.render_after = canvas.after(self.render_delay, self.request_render)
+
+    def request_render(self):
         """
+        Start the drawing of the selected graph in the background thread, the drawing still waiting or running
+        for a previous request is dropped.
+        """
+        self.render_after = None
         if self.img_dir.get() != '':
             canvas = self.components['canvas']
-            canvas.delete("all")
             listbox = self.components['gxl_listbox']
             try:
                 index = int(listbox.curselection()[0])
@@ -195,26 +497,478 @@ class GraphViewer:
             gxl_filepath = os.path.join(self.gxl_dir.get(), gxl_filename + '.gxl')
             img_filepath = self.search_img_filepath(gxl_filename)
 
+            if (gxl_filepath, img_filepath) != self.view_files:
+                # another graph is shown fitted to the canvas
+                self.view_scale = None
+                self.view_files = (gxl_filepath, img_filepath)
+                self.view_full_size = None
+
             if img_filepath or (not img_filepath and self.cb_blank.get()):
                 self.enable_customisation()
+                if self.view_scale is not None:
+                    self.request_tiles()
+                    return
 
-                self.graph_img = graph_plotter(gxl_filepath=gxl_filepath, img_filepath=img_filepath,
-                                               color_by_feature=self.get_color_by_feature(),
-                                               node_style=node_style, edge_style=edge_style,
-                                               scaling=float(self.scaling.get()), transparency=self.transparency.get(),
-                                               current_node=self.selected_node.get())
-                img = self.graph_img.get_image()
-
-                photo_img = ImageTk.PhotoImage(
-                    Image.fromarray(img).resize((canvas.winfo_width(), canvas.winfo_height()),
-                                                Image.ANTIALIAS))
-                canvas.image = photo_img
-                canvas.create_image(0, 0, image=photo_img, anchor=NW)
+                # draw directly at the size of the canvas, the full resolution is only drawn when saving
+                size = (max(canvas.winfo_width(), 1), max(canvas.winfo_height(), 1))
+                self.render_requested = time.perf_counter()
+                self.render_worker.submit(partial(self.render_preview, gxl_filepath, img_filepath, self.get_style(),
+                                                  size))
+                if self.poll_after is None:
+                    self.poll_after = canvas.after(self.poll_interval, self.poll_render)
             else:
+                self.render_worker.cancel()
                 self.disable_customisation()
+                canvas.delete("all")
                 canvas.create_text(canvas.winfo_width() / 2, canvas.winfo_height() / 2,
                                    text=f'No image found for the gxl file {gxl_filename}')
 
+    def render_preview(self, gxl_filepath, img_filepath, style, size):
+        """
+        Draw the graph at the size of the canvas (called in the background thread).
+
+        Parameters:
+            gxl_filepath: path to the gxl file.
+            img_filepath: path to the image (None to draw on a blank background).
+            style: style of the drawing (see get_style).
+            size: (width, height) of the canvas.
+
+        Returns:
+            PIL image of the drawing.
+        """
+        with self.drawer_lock:
+            self.update_graph_img(gxl_filepath, img_filepath, style, size)
+            self.view_full_size = self.graph_img.full_size
+            self.view_graph = (self.graph_img.graph, self.graph_img.scaling)
+            self.view_legend = self.graph_img.get_legend()
+            preview = self.graph_img.get_preview(size)
+            with stats.stage('to_pil'):
+                return Image.fromarray(preview)
+
+    def poll_render(self):
+        """
+        Show the result of the background drawing on the canvas once it is done.
+        """
+        canvas = self.components['canvas']
+        # checked before taking the result: when the worker is idle, its last result is already queued
+        busy = self.render_worker.busy
+        result = self.render_worker.poll()
+        if self.view_scale is not None:
+            # zoomed view: the tiles are shown as soon as they are rendered
+            self.show_tiles()
+            if result is not None and result[2] is not None:
+                canvas.create_text(canvas.winfo_width() / 2, canvas.winfo_height() / 2, tags='tile',
+                                   text=f'The graph could not be drawn: {result[2]}')
+            elif result is not None:
+                self.draw_legend()
+                if stats.enabled:
+                    self.draw_stats()
+        elif result is not None:
+            _, img, error = result
+            canvas.delete("all")
+            self.tile_items.clear()
+            if error is None:
+                with stats.stage('present'):
+                    photo_img = ImageTk.PhotoImage(img)
+                    canvas.image = photo_img
+                    canvas.create_image(0, 0, image=photo_img, anchor=NW)
+                self.draw_legend()
+                if stats.enabled:
+                    stats.add('latency', time.perf_counter() - self.render_requested)
+                    self.draw_stats()
+                # the neighbours are only prepared once the selected graph is shown, not to slow it down
+                self.prefetch_neighbours()
+            else:
+                canvas.create_text(canvas.winfo_width() / 2, canvas.winfo_height() / 2,
+                                   text=f'The graph could not be drawn: {error}')
+        self.poll_after = canvas.after(self.poll_interval, self.poll_render) if busy else None
+
+    def zoom(self, event):
+        """
+        Zoom in or out by a factor 2 around the mouse (mouse wheel). Zooming out of the smallest zoom shows the whole
+        image fitted to the canvas again.
+        """
+        if self.view_full_size is None:
+            return
+        canvas = self.components['canvas']
+        full_width, full_height = self.view_full_size
+        width, height = max(canvas.winfo_width(), 1), max(canvas.winfo_height(), 1)
+        zoom_in = event.num == 4 or event.delta > 0
+        # scale showing the whole image
+        fit_scale = min(width / full_width, height / full_height)
+
+        if self.view_scale is None:
+            if not zoom_in:
+                return
+            # the whole image is stretched to the canvas
+            x, y = event.x / width * full_width, event.y / height * full_height
+            scale = 2.0 ** (math.floor(math.log2(fit_scale)) + 1)
+        else:
+            x, y = (self.view_x + event.x) / self.view_scale, (self.view_y + event.y) / self.view_scale
+            scale = self.view_scale * (2 if zoom_in else 0.5)
+            if scale > max_zoom:
+                return
+            if scale <= fit_scale:
+                self.reset_zoom()
+                return
+
+        # the point of the image under the mouse stays under it
+        self.view_scale = scale
+        self.view_x, self.view_y = round(x * scale - event.x), round(y * scale - event.y)
+        self.clamp_view()
+        canvas.delete('all')
+        self.tile_items.clear()
+        self.request_tiles()
+
+    def click(self, event):
+        """
+        Show the features of the node under the mouse in a tooltip (mouse released without dragging). The node is
+        found with the spatial index of the graph, its features are read in a background thread.
+        """
+        canvas = self.components['canvas']
+        canvas.delete('tooltip')
+        if self.press_position is None or self.view_graph is None or self.view_full_size is None or \
+                abs(event.x - self.press_position[0]) + abs(event.y - self.press_position[1]) > 3:
+            return
+        graph, scaling = self.view_graph
+        if scaling <= 0:
+            return
+
+        # pixels of the canvas -> pixels of the image at full resolution
+        if self.view_scale is None:
+            factor = min(max(canvas.winfo_width(), 1) / self.view_full_size[0],
+                         max(canvas.winfo_height(), 1) / self.view_full_size[1])
+            x = event.x / max(canvas.winfo_width(), 1) * self.view_full_size[0]
+            y = event.y / max(canvas.winfo_height(), 1) * self.view_full_size[1]
+        else:
+            factor = self.view_scale
+            x, y = (self.view_x + event.x) / factor, (self.view_y + event.y) / factor
+
+        # the node is hit within its radius, and at least within a few pixels of the canvas
+        radius = max([style['radius'] for style in node_style.values() if isinstance(style, dict)], default=0)
+        max_distance = max(radius, 5 / factor) / scaling
+        with stats.stage('hit_test'):
+            hit = graph.spatial_index.nearest(x / scaling, y / scaling, max_distance=max_distance)
+        if hit is None:
+            return
+        request = self.node_info_worker.submit(partial(graph.get_node_features, hit[0]))
+        canvas.after(self.poll_interval, self.poll_node_info, request, hit[0], event.x, event.y)
+
+    def poll_node_info(self, request, node, x, y):
+        """
+        Show the features of the clicked node once they are read.
+
+        Parameters:
+            request: number of the request, the polling stops when another node is clicked.
+            node: index of the node.
+            x, y: position of the tooltip on the canvas.
+        """
+        canvas = self.components['canvas']
+        if request != self.node_info_worker.generation:
+            return
+        busy = self.node_info_worker.busy
+        result = self.node_info_worker.poll()
+        if result is None:
+            if busy:
+                canvas.after(self.poll_interval, self.poll_node_info, request, node, x, y)
+            return
+        _, features, error = result
+        lines = [f'node {node}']
+        if error is None:
+            lines += [f'{name}: {value}' for name, value in features.items()]
+        else:
+            lines.append(f'The features could not be read: {error}')
+        text = canvas.create_text(x + 10, y + 10, text='\n'.join(lines), anchor=NW, font='TkFixedFont',
+                                  tags='tooltip')
+        background = canvas.create_rectangle(canvas.bbox(text), fill='lightyellow', outline='black', tags='tooltip')
+        canvas.tag_lower(background, text)
+
+    def reset_zoom(self, *args):
+        """
+        Show the whole image fitted to the canvas.
+        """
+        if self.view_scale is not None:
+            self.view_scale = None
+            self.onselect()
+
+    def start_pan(self, event):
+        self.pan_position = (event.x, event.y)
+        self.press_position = (event.x, event.y)
+
+    def pan(self, event):
+        """
+        Move the zoomed view with the mouse, the tiles on the canvas are moved and only the newly visible ones are
+        rendered.
+        """
+        if self.view_scale is None or self.pan_position is None:
+            return
+        self.components['canvas'].delete('tooltip')
+        view = (self.view_x, self.view_y)
+        self.view_x -= event.x - self.pan_position[0]
+        self.view_y -= event.y - self.pan_position[1]
+        self.pan_position = (event.x, event.y)
+        self.clamp_view()
+        self.components['canvas'].move('tile', view[0] - self.view_x, view[1] - self.view_y)
+        self.request_tiles()
+
+    def clamp_view(self):
+        """
+        Keep the zoomed image on the canvas (centered if it is smaller than the canvas).
+        """
+        canvas = self.components['canvas']
+        for position, canvas_size, full_size in (('view_x', canvas.winfo_width(), self.view_full_size[0]),
+                                                 ('view_y', canvas.winfo_height(), self.view_full_size[1])):
+            level_size = round(full_size * self.view_scale)
+            if level_size <= canvas_size:
+                setattr(self, position, (level_size - canvas_size) // 2)
+            else:
+                setattr(self, position, min(max(getattr(self, position), 0), level_size - canvas_size))
+
+    def get_visible_tiles(self):
+        """
+        Get the tiles of the zoomed view intersecting the canvas.
+
+        Returns:
+            list of (scale, column, row), the tiles at the center of the canvas first.
+        """
+        canvas = self.components['canvas']
+        width, height = max(canvas.winfo_width(), 1), max(canvas.winfo_height(), 1)
+        level_width = round(self.view_full_size[0] * self.view_scale)
+        level_height = round(self.view_full_size[1] * self.view_scale)
+        columns = range(max(0, self.view_x // tile_size),
+                        min(-(-level_width // tile_size), (self.view_x + width - 1) // tile_size + 1))
+        rows = range(max(0, self.view_y // tile_size),
+                     min(-(-level_height // tile_size), (self.view_y + height - 1) // tile_size + 1))
+        center = ((self.view_x + width / 2) / tile_size - 0.5, (self.view_y + height / 2) / tile_size - 0.5)
+        tiles = [(self.view_scale, column, row) for row in rows for column in columns]
+        return sorted(tiles, key=lambda tile: (tile[1] - center[0]) ** 2 + (tile[2] - center[1]) ** 2)
+
+    def request_tiles(self):
+        """
+        Show the tiles of the zoomed view which are already rendered, and render the missing ones in the background
+        thread. The tiles outside of the canvas are removed from it.
+        """
+        gxl_filepath, img_filepath = self.view_files
+        style = self.get_style()
+        self.tile_base = (gxl_filepath, img_filepath, style_hash(style))
+        visible = self.get_visible_tiles()
+        self.show_tiles(visible)
+
+        missing = [tile for tile in visible
+                   if tile not in self.tile_items or self.tile_items[tile][:3] != self.tile_base]
+        if missing:
+            self.tile_request += 1
+            self.render_worker.submit(partial(self.render_tiles, gxl_filepath, img_filepath, style, self.tile_base,
+                                              missing, self.tile_request))
+            if self.poll_after is None:
+                self.poll_after = self.components['canvas'].after(self.poll_interval, self.poll_render)
+
+    def render_tiles(self, gxl_filepath, img_filepath, style, base, tiles, request):
+        """
+        Render tiles of the zoomed view into tile_cache (called in the background thread), until a newer request is
+        made.
+
+        Parameters:
+            gxl_filepath: path to the gxl file.
+            img_filepath: path to the image (None to draw on a blank background).
+            style: style of the drawing (see get_style).
+            base: (gxl file, image, style hash) of the tiles.
+            tiles: list of (scale, column, row).
+            request: number of the request.
+        """
+        with self.drawer_lock:
+            self.update_graph_img(gxl_filepath, img_filepath, style,
+                                  min_img_scale=min(1.0, max(scale for scale, _, _ in tiles)))
+            self.view_graph = (self.graph_img.graph, self.graph_img.scaling)
+            self.view_legend = self.graph_img.get_legend()
+            for scale, column, row in tiles:
+                if request != self.tile_request:
+                    return
+                key = base + (scale, column, row)
+                if key in self.tile_cache:
+                    continue
+                with stats.stage('tile'):
+                    tile = self.graph_img.render_tile(scale, column * tile_size, row * tile_size, tile_size,
+                                                      tile_size)
+                self.tile_cache.put(key, Image.fromarray(tile), tile.nbytes)
+
+    def show_tiles(self, visible=None):
+        """
+        Show the rendered tiles of the zoomed view, and remove the tiles outside of the canvas.
+
+        Parameters:
+            visible: tiles intersecting the canvas (see get_visible_tiles).
+        """
+        canvas = self.components['canvas']
+        visible = self.get_visible_tiles() if visible is None else visible
+        visible_set = set(visible)
+        for tile in [tile for tile in self.tile_items if tile not in visible_set]:
+            canvas.delete(self.tile_items.pop(tile)[3])
+
+        for tile in visible:
+            if tile in self.tile_items and self.tile_items[tile][:3] == self.tile_base:
+                continue
+            img = self.tile_cache.get(self.tile_base + tile)
+            if img is None:
+                continue
+            # the tile drawn with the previous style is only replaced now, such that the canvas does not flicker
+            if tile in self.tile_items:
+                canvas.delete(self.tile_items[tile][3])
+            with stats.stage('present'):
+                photo_img = ImageTk.PhotoImage(img)
+                item = canvas.create_image(tile[1] * tile_size - self.view_x, tile[2] * tile_size - self.view_y,
+                                           image=photo_img, anchor=NW, tags='tile')
+            self.tile_items[tile] = self.tile_base + (item, photo_img)
+        canvas.tag_raise('legend')
+        canvas.tag_raise('tooltip')
+        canvas.tag_raise('stats')
+
+    def toggle_stats(self, *args):
+        """
+        Start or stop measuring the stages of the drawing, and show or hide their times on the canvas.
+        """
+        stats.enabled = self.show_stats.get()
+        stats.reset()
+        self.draw_stats()
+
+    def draw_stats(self):
+        """
+        Show the time of the stages, the counters and the cache statistics in the top left corner of the canvas.
+        """
+        canvas = self.components['canvas']
+        canvas.delete('stats')
+        if not self.show_stats.get():
+            return
+        lines = stats.format()
+        for name, cache in (('graph cache', self.graph_cache), ('image cache', self.image_cache),
+                            ('drawer cache', self.drawer_cache), ('tile cache', self.tile_cache)):
+            cache_stats = cache.stats()
+            lines.append(f'{name}: {cache_stats["hits"]} hits, {cache_stats["misses"]} misses, '
+                         f'{cache_stats["nbytes"] / 1024 ** 2:.0f}/{cache_stats["max_bytes"] / 1024 ** 2:.0f} MB')
+        text = canvas.create_text(5, 5, text='\n'.join(lines), anchor=NW, fill='white', font='TkFixedFont',
+                                  tags='stats')
+        background = canvas.create_rectangle(canvas.bbox(text), fill='black', outline='', tags='stats')
+        canvas.tag_lower(background, text)
+
+    def draw_legend(self):
+        """
+        Show the colors of the values of the feature coloring the nodes in the top right corner of the canvas.
+        """
+        canvas = self.components['canvas']
+        canvas.delete('legend')
+        if not self.view_legend:
+            return
+        right, y = canvas.winfo_width() - 5, 5
+        items = []
+        for label, color in self.view_legend:
+            text = canvas.create_text(right, y, text=label, anchor=NE, font='TkFixedFont', tags='legend')
+            left, top, _, bottom = canvas.bbox(text)
+            items.append(canvas.create_rectangle(left - 16, top + 1, left - 4, bottom - 1, outline='black',
+                                                 fill='#{:02x}{:02x}{:02x}'.format(*color[:3]), tags='legend'))
+            items.append(text)
+            y = bottom + 2
+        x0, y0, x1, y1 = canvas.bbox('legend')
+        background = canvas.create_rectangle(x0 - 3, y0 - 3, x1 + 3, y1 + 3, fill='white', outline='black',
+                                             tags='legend')
+        canvas.tag_lower(background, items[0])
+
+    def prefetch_neighbours(self):
+        """
+        Prepare in the background the graphs before and after the selected one in the listbox (prefetch_depth on
+        each side, the nearest first), such that browsing the list with the arrow keys shows them immediately.
+        """
+        listbox = self.components['gxl_listbox']
+        selection = listbox.curselection()
+        if prefetch_depth <= 0 or not selection:
+            return
+        index = int(selection[0])
+        canvas = self.components['canvas']
+        size = (max(canvas.winfo_width(), 1), max(canvas.winfo_height(), 1))
+        style = self.get_style()
+
+        tasks = []
+        for distance in range(1, prefetch_depth + 1):
+            for neighbour in (index + distance, index - distance):
+                if 0 <= neighbour < listbox.size():
+                    gxl_filename = listbox.get(neighbour)
+                    img_filepath = self.search_img_filepath(gxl_filename)
+                    if img_filepath or self.cb_blank.get():
+                        gxl_filepath = os.path.join(self.gxl_dir.get(), gxl_filename + '.gxl')
+                        tasks.append(partial(self.prefetch_file, gxl_filepath, img_filepath, style, size))
+        self.prefetcher.prefetch(tasks)
+
+    def prefetch_file(self, gxl_filepath, img_filepath, style, size):
+        """
+        Parse the graph and decode the image into the caches, and draw the graph if prefetch_render is set (called
+        in a prefetching thread).
+
+        Parameters:
+            gxl_filepath: path to the gxl file.
+            img_filepath: path to the image (None to draw on a blank background).
+            style: style of the drawing (see get_style).
+            size: (width, height) of the canvas.
+        """
+        key = (gxl_filepath, img_filepath)
+        if key in self.drawer_cache or key == self.drawn_files:
+            return
+        if not prefetch_render:
+            load_graph(gxl_filepath, color_by_feature=style['color_by_feature'], cache=self.gxl_cache, lazy=True,
+                       graph_cache=self.graph_cache)
+            if img_filepath:
+                load_image(img_filepath, image_cache=self.image_cache, target_size=size)
+            return
+        graph_img = graph_plotter(gxl_filepath=gxl_filepath, img_filepath=img_filepath, **style,
+                                  cache=self.gxl_cache, lazy=True, graph_cache=self.graph_cache,
+                                  image_cache=self.image_cache, target_size=size)
+        graph_img.get_preview(size)
+        self.drawer_cache.put(key, graph_img, graph_img.nbytes)
+
+    def update_graph_img(self, gxl_filepath, img_filepath, style, size=None, min_img_scale=None):
+        """
+        Update the graph drawer with the given style. The drawer is only rebuilt when another graph or image is
+        shown and it is not in drawer_cache, otherwise only the layers affected by the style changes are redrawn.
+        drawer_lock must be held.
+
+        Parameters:
+            gxl_filepath: path to the gxl file.
+            img_filepath: path to the image (None to draw on a blank background).
+            style: style of the drawing (see get_style).
+            size: (width, height) the graph is displayed at, the image may be decoded at a reduced resolution
+            covering it (None = full resolution).
+            min_img_scale: the image is decoded again at full resolution if it was decoded at a smaller scale
+            (e.g. for the zoomed view).
+        """
+        key = (gxl_filepath, img_filepath)
+        if not isinstance(self.graph_img, GraphDrawer) or self.drawn_files != key:
+            if isinstance(self.graph_img, GraphDrawer):
+                # keep the previous drawer, going back to it only redraws what changed since (it is not modified
+                # while it is in the cache -> its size is measured now)
+                self.drawer_cache.put(self.drawn_files, self.graph_img, self.graph_img.nbytes)
+            # the shown drawer is taken out of the cache: its layers grow while it is used and the prefetching
+            # threads must not get it
+            graph_img = self.drawer_cache.pop(key)
+            if graph_img is None:
+                graph_img = graph_plotter(gxl_filepath=gxl_filepath, img_filepath=img_filepath, **style,
+                                          cache=self.gxl_cache, lazy=True, graph_cache=self.graph_cache,
+                                          image_cache=self.image_cache, target_size=size)
+            self.graph_img = graph_img
+            self.drawn_files = key
+        if min_img_scale is not None and self.graph_img.img_scale < min_img_scale:
+            self.graph_img = graph_plotter(gxl_filepath=gxl_filepath, img_filepath=img_filepath, **style,
+                                           cache=self.gxl_cache, lazy=True, graph_cache=self.graph_cache,
+                                           image_cache=self.image_cache)
+
+        self.graph_img.color_by_feature = style['color_by_feature']
+        self.graph_img.current_node = style['current_node']
+        self.graph_img.scaling = style['scaling']
+        # the blank background is not transparent
+        self.graph_img.transparency = style['transparency'] if img_filepath else 255
+        self.graph_img.node_style = style['node_style']
+        self.graph_img.edge_style = style['edge_style']
+        self.graph_img.render_mode = style['render_mode']
+        self.graph_img.density_weight = style['density_weight']
+        self.graph_img.density_class = style['density_class']
+
     def update_ns_view(self, *args):
         """
         Update node style (color + radius).
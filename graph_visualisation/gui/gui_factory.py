@@ -30,6 +30,13 @@ class GUIFactory(ABC):
         """
         pass
 
+    @abstractmethod
+    def create_virtual_listbox(self, *args):
+        """
+        Create a list box which only creates its visible rows (for long lists)
+        """
+        pass
+
     @abstractmethod
     def create_scrollbar(self, *args):
         """
@@ -58,6 +65,13 @@ class GUIFactory(ABC):
         """
         pass
 
+    @abstractmethod
+    def create_progressbar(self, *args):
+        """
+        Create a progress bar
+        """
+        pass
+
     @abstractmethod
     def create_option_menu(self, *args):
         """
@@ -3,6 +3,7 @@ from tkinter import *
 from tkinter import colorchooser, filedialog, ttk
 
 from gui.gui_factory import GUIFactory
+from gui.virtual_listbox import VirtualListbox
 
 
 class ComponentAlreadyExists(Exception):
@@ -53,6 +54,11 @@ class TkFactory(GUIFactory):
         self.add(name, listbox, is_customizer)
         return listbox
 
+    def create_virtual_listbox(self, frame: tkinter.Frame, name: str, is_customizer: bool = False):
+        listbox = VirtualListbox(frame)
+        self.add(name, listbox, is_customizer)
+        return listbox
+
     def create_scrollbar(self, frame: tkinter.Frame, name: str, is_customizer: bool = False):
         scrollbar = ttk.Scrollbar(frame)
         self.add(name, scrollbar, is_customizer)
@@ -73,6 +79,11 @@ class TkFactory(GUIFactory):
         self.add(name, scale, is_customizer)
         return scale
 
+    def create_progressbar(self, frame: tkinter.Frame, name: str, is_customizer: bool = False):
+        progressbar = ttk.Progressbar(frame)
+        self.add(name, progressbar, is_customizer)
+        return progressbar
+
     def create_option_menu(self, frame: tkinter.Frame, name: str, is_customizer: bool, value,  *options):
         option_menu = OptionMenu(frame, value, *options)
         self.add(name, option_menu, is_customizer)
@@ -0,0 +1,182 @@
+from tkinter import *
+
+
+class VirtualListbox(Listbox):
+    def __init__(self, master=None, **kw):
+        """
+        This class is a listbox showing a sequence of items of any length: only the visible rows are inserted in
+        the tkinter listbox. The methods used on a listbox (size, get, insert, delete, curselection, selection_set,
+        see, nearest, yview) work with the indices of the whole sequence, and yscrollcommand receives the position in it.
+
+        :param master: parent widget
+        :param kw: options of the tkinter listbox
+        """
+        self._yscrollcommand = kw.pop('yscrollcommand', None)
+        kw.setdefault('exportselection', False)
+        super().__init__(master, **kw)
+        # items shown by the listbox (any sequence, e.g. a SearchResult)
+        self._items = []
+        # index of the first visible item, index of the selected item (None = no selection)
+        self._top = 0
+        self._selection = None
+
+        super().bind('<<ListboxSelect>>', self._on_select, add='+')
+        for sequence, step in (('<Up>', -1), ('<Down>', 1)):
+            super().bind(sequence, lambda event, step=step: self._move_selection(step))
+        for sequence, step in (('<Prior>', -1), ('<Next>', 1)):
+            super().bind(sequence, lambda event, step=step: self._move_selection(step * self.rows))
+        super().bind('<MouseWheel>', lambda event: self._scroll(-1 if event.delta > 0 else 1))
+        super().bind('<Button-4>', lambda event: self._scroll(-1))
+        super().bind('<Button-5>', lambda event: self._scroll(1))
+
+    @property
+    def rows(self) -> int:
+        """
+        Number of visible rows
+        """
+        return max(1, int(self.cget('height')))
+
+    def configure(self, cnf=None, **kw):
+        if isinstance(cnf, dict) and 'yscrollcommand' in cnf:
+            cnf = dict(cnf)
+            self._yscrollcommand = cnf.pop('yscrollcommand')
+        if 'yscrollcommand' in kw:
+            self._yscrollcommand = kw.pop('yscrollcommand')
+        result = super().configure(cnf, **kw)
+        self._refresh()
+        return result
+
+    config = configure
+
+    def __setitem__(self, key, value):
+        self.configure({key: value})
+
+    def bind(self, sequence=None, func=None, add=None):
+        # the selection of the items is updated by a binding of <<ListboxSelect>>, which must not be replaced
+        if sequence == '<<ListboxSelect>>' and func is not None:
+            add = '+'
+        return super().bind(sequence, func, add)
+
+    def set_items(self, items):
+        """
+        Show another sequence of items, the selection is cleared
+
+        Parameters:
+            items: sequence of items (supporting len and indexing)
+        """
+        self._items = items
+        self._top = 0
+        self._selection = None
+        self._refresh()
+
+    def size(self):
+        return len(self._items)
+
+    def get(self, first, last=None):
+        if last is None:
+            return self._items[self._index(first)]
+        last = len(self._items) - 1 if last == END else int(last)
+        return tuple(self._items[self._index(first):last + 1])
+
+    def insert(self, index, *elements):
+        if not isinstance(self._items, list):
+            self._items = list(self._items)
+        index = len(self._items) if index == END else int(index)
+        self._items[index:index] = elements
+        self._refresh()
+
+    def delete(self, first, last=None):
+        if not isinstance(self._items, list):
+            self._items = list(self._items)
+        first = self._index(first)
+        last = first if last is None else (len(self._items) - 1 if last == END else int(last))
+        del self._items[first:last + 1]
+        if self._selection is not None and first <= self._selection:
+            self._selection = None if self._selection <= last else self._selection - (last - first + 1)
+        self._refresh()
+
+    def curselection(self):
+        return () if self._selection is None else (self._selection,)
+
+    def selection_set(self, first, last=None):
+        self._selection = self._index(first)
+        self.see(self._selection)
+
+    select_set = selection_set
+
+    def selection_clear(self, first=None, last=None):
+        self._selection = None
+        self._refresh()
+
+    select_clear = selection_clear
+
+    def see(self, index):
+        index = self._index(index)
+        if index < self._top:
+            self._top = index
+        elif index >= self._top + self.rows:
+            self._top = index - self.rows + 1
+        self._refresh()
+
+    def nearest(self, y):
+        if not self._items:
+            return -1
+        return self._top + super().nearest(y)
+
+    def yview(self, *args):
+        """
+        Position of the visible rows in the items, or scroll them (called by a scrollbar)
+        """
+        if not args:
+            return self._fractions()
+        if args[0] == MOVETO:
+            self._top = int(float(args[1]) * len(self._items))
+        elif args[0] == SCROLL:
+            self._top += int(args[1]) * (self.rows if args[2] == PAGES else 1)
+        self._refresh()
+
+    def _index(self, index):
+        if index == END:
+            return len(self._items) - 1
+        return int(index)
+
+    def _fractions(self):
+        if not self._items:
+            return 0.0, 1.0
+        return self._top / len(self._items), min(1.0, (self._top + self.rows) / len(self._items))
+
+    def _refresh(self):
+        """
+        Insert the visible items in the tkinter listbox
+        """
+        if not hasattr(self, '_items'):
+            # configure called by the constructor of the listbox
+            return
+        rows = self.rows
+        self._top = max(0, min(self._top, len(self._items) - rows))
+        super().delete(0, END)
+        visible = self._items[self._top:self._top + rows]
+        if len(visible) > 0:
+            super().insert(END, *visible)
+        if self._selection is not None and self._top <= self._selection < self._top + rows:
+            super().selection_set(self._selection - self._top)
+        if self._yscrollcommand is not None:
+            self._yscrollcommand(*self._fractions())
+
+    def _on_select(self, event):
+        # a click selects a visible row
+        selection = super().curselection()
+        if selection:
+            self._selection = self._top + int(selection[0])
+
+    def _move_selection(self, step):
+        if not self._items:
+            return 'break'
+        current = self._selection if self._selection is not None else self._top - (1 if step > 0 else 0)
+        self.selection_set(max(0, min(len(self._items) - 1, current + step)))
+        self.event_generate('<<ListboxSelect>>')
+        return 'break'
+
+    def _scroll(self, step):
+        self.yview(SCROLL, step * 3, UNITS)
+        return 'break'
@@ -0,0 +1,100 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+from util.batch_render import BatchRenderer, load_style
+from util.default_config import export_format, export_quality, export_compression, export_max_size, encode_workers
+from util.image_encoder import EncodeOptions, formats
+from util.stats import Stats, stats
+
+
+if __name__ == '__main__':
+    # pass the gxl, image and output folders as program arguments
+    parser = argparse.ArgumentParser('Draw all the graphs of a gxl folder on their images')
+    parser.add_argument('--gxl_folder', type=str, help='directory of the gxl files', required=True)
+    parser.add_argument('--img_folder', type=str, help='directory of the images (if not given, the graphs are '
+                                                       'drawn on a blank background)', default=None)
+    parser.add_argument('--output_folder', type=str, help='directory of the output folder', required=True)
+    parser.add_argument('--style_file', type=str, help='json file overriding the style of default_config.py',
+                        default=None)
+    parser.add_argument('--workers', type=int, help='number of worker processes (default: number of cpus)',
+                        default=None)
+    parser.add_argument('--chunksize', type=int, help='number of files sent at once to a worker', default=None)
+    parser.add_argument('--blank', action='store_true',
+                        help='draw the graphs without image on a blank background instead of skipping them')
+    parser.add_argument('--no_cache', action='store_true', help='do not use the on-disk cache of the gxl files')
+    parser.add_argument('--force', action='store_true',
+                        help='draw all the graphs again, also those whose gxl file, image and style did not change')
+    parser.add_argument('--format', type=str, choices=list(formats), help='format of the saved images',
+                        default=export_format)
+    parser.add_argument('--quality', type=int, help='quality of jpeg and webp images (1-100)', default=export_quality)
+    parser.add_argument('--compression', type=int, help='compression level of png images (0-9)',
+                        default=export_compression)
+    parser.add_argument('--max_size', type=int, help='maximal width and height of the saved images (downscaled)',
+                        default=export_max_size)
+    parser.add_argument('--encode_workers', type=int, help='number of threads encoding the images in each process',
+                        default=encode_workers)
+    parser.add_argument('--stats_log', type=str, default=None,
+                        help='json lines file receiving the time of the stages of every file and a summary')
+    args = parser.parse_args()
+
+    assert os.path.isdir(args.gxl_folder), f'The gxl folder {args.gxl_folder} does not exist'
+    assert args.img_folder is None or os.path.isdir(args.img_folder), \
+        f'The image folder {args.img_folder} does not exist'
+
+    # the stats are enabled before creating the renderer, such that its worker processes measure the stages
+    stats.enabled = args.stats_log is not None
+    renderer = BatchRenderer(args.gxl_folder, args.img_folder, args.output_folder,
+                             style=load_style(args.style_file), workers=args.workers, chunksize=args.chunksize,
+                             blank=args.blank or args.img_folder is None, use_cache=not args.no_cache,
+                             incremental=not args.force,
+                             encoding=EncodeOptions(args.format, args.quality, args.compression, args.max_size),
+                             encoder_workers=args.encode_workers)
+    # stop the process if there is nothing to render
+    assert len(renderer.jobs) + len(renderer.up_to_date) > 0, \
+        f'There is no graph to render in the directory {args.gxl_folder}'
+    if renderer.up_to_date:
+        print(f'{len(renderer.up_to_date)} images are up to date, {len(renderer.jobs)} to draw')
+
+    stats_log = open(args.stats_log, 'w') if args.stats_log else None
+    # stages of all the files, measured in the worker processes
+    totals = Stats(enabled=True)
+
+    start = time.perf_counter()
+    results = []
+    for result in renderer.run():
+        results.append(result)
+        if stats_log is not None:
+            totals.merge(result.stages)
+            stats_log.write(json.dumps({'gxl': result.gxl_filepath, 'img': result.img_filepath,
+                                        'output': result.output_file, 'error': result.error,
+                                        'seconds': result.seconds, 'stages': result.stages}) + '\n')
+        gxl_filename = os.path.basename(result.gxl_filepath)
+        if result.error is None:
+            print(f'[{len(results)}/{len(renderer.jobs)}] {gxl_filename} -> {result.output_file} '
+                  f'({result.seconds:.2f}s)')
+        else:
+            print(f'[{len(results)}/{len(renderer.jobs)}] {gxl_filename} FAILED: {result.error}')
+
+    if stats_log is not None:
+        summary = totals.snapshot()
+        stats_log.write(json.dumps({'summary': {'rebuilt': len(results), 'up_to_date': len(renderer.up_to_date),
+                                                'skipped': len(renderer.skipped),
+                                                'seconds': time.perf_counter() - start, **summary}}) + '\n')
+        stats_log.close()
+
+    # summary in the order of the files
+    failed = sorted((result for result in results if result.error is not None), key=lambda r: r.gxl_filepath)
+    print(f'\n{len(results) - len(failed)} rebuilt, {len(renderer.up_to_date)} up to date, {len(failed)} failed, '
+          f'{len(renderer.skipped)} skipped (no image) in {time.perf_counter() - start:.1f}s')
+    for result in sorted(results, key=lambda r: r.gxl_filepath):
+        if result.error is None:
+            print(f'  rebuilt: {result.gxl_filepath}')
+    for result in failed:
+        print(f'  failed: {result.gxl_filepath}: {result.error}')
+    for gxl_filepath in renderer.skipped:
+        print(f'  skipped: {gxl_filepath}')
+
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,14 @@
+import os
+import sys
+
+import pytest
+
+# the modules are imported as in the application (e.g. from util.gxl_graph import ParsedGxlGraph)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tests.gxl_files import write_gxl  # noqa: E402
+
+
+@pytest.fixture
+def gxl_file(tmp_path):
+    return write_gxl(tmp_path / 'graph_0.gxl')
@@ -0,0 +1,26 @@
+# nodes (id, type, x, y, area, count) and edges (from, to, distance) of the test graph, the node ids start at 1
+nodes = [(1, 'tumorbud', 10.5, 20.0, 15.5, 9),
+         (2, 'lymphocyte', 30.0, 5.25, 144.0, 0),
+         (3, 'lymphocyte', 50.0, 40.0, 46.5, 1),
+         (4, 'tumorbud', 12.0, 60.0, 133.25, 7)]
+edges = [(1, 2, 7.5), (2, 3, 17.0), (4, 1, 3.25)]
+
+
+def write_gxl(path, graph_id='graph_0', nodes=nodes, edges=edges):
+    """
+    Write a gxl file with the given nodes and edges
+    """
+    lines = ['<?xml version="1.0" encoding="UTF-8"?>', '<gxl xmlns:xlink="http://www.w3.org/1999/xlink">',
+             f'  <graph id="{graph_id}" edgeids="False" edgemode="undirected">']
+    for node_id, node_type, x, y, area, count in nodes:
+        lines.append(f'    <node id="_{node_id}"><attr name="type"><string>{node_type}</string></attr>'
+                     f'<attr name="x"><float>{x}</float></attr><attr name="y"><float>{y}</float></attr>'
+                     f'<attr name="area"><float>{area}</float></attr><attr name="count"><int>{count}</int></attr>'
+                     f'</node>')
+    for start, end, distance in edges:
+        lines.append(f'    <edge from="_{start}" to="_{end}"><attr name="distance"><float>{distance}</float>'
+                     f'</attr></edge>')
+    lines += ['  </graph>', '</gxl>']
+    with open(path, 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+    return str(path)
@@ -0,0 +1,64 @@
+import numpy as np
+
+from util.color_map import get_lut, lut_size, map_values, max_categories
+
+
+def test_lut():
+    lut = get_lut('viridis')
+
+    assert lut.shape == (lut_size, 4) and lut.dtype == np.uint8
+    assert not lut.flags.writeable
+    assert get_lut('viridis') is lut
+
+
+def test_categories_are_spread_over_the_colormap():
+    values = np.array(['b', 'a', 'c', 'a', 'b'])
+    mapping = map_values(values, 'Spectral')
+    lut = get_lut('Spectral')
+
+    assert list(mapping.categories) == ['a', 'b', 'c']
+    np.testing.assert_array_equal(mapping.inverse, [1, 0, 2, 0, 1])
+    # category i of k gets the color at i / (k - 1) of the colormap
+    np.testing.assert_array_equal(mapping.codes, [128, 0, 255, 0, 128])
+    assert mapping.legend == [('a', tuple(lut[0].tolist())), ('b', tuple(lut[128].tolist())),
+                              ('c', tuple(lut[255].tolist()))]
+
+
+def test_integers_with_few_values_are_categories():
+    mapping = map_values(np.array([3, 1, 3]), 'Spectral')
+
+    assert list(mapping.categories) == [1, 3]
+    np.testing.assert_array_equal(mapping.codes, [255, 0, 255])
+
+
+def test_single_category():
+    mapping = map_values(np.array(['a', 'a']), 'Spectral')
+
+    np.testing.assert_array_equal(mapping.codes, [0, 0])
+    assert len(mapping.legend) == 1
+
+
+def test_continuous_values_are_binned():
+    values = np.array([0.0, 2.5, 5.0, 10.0, np.nan])
+    mapping = map_values(values, 'viridis')
+
+    assert mapping.categories is None and mapping.inverse is None
+    # normalized between the minimum and the maximum, the values which are not finite get the first color
+    np.testing.assert_array_equal(mapping.codes, [0, 64, 128, 255, 0])
+    assert [label for label, _ in mapping.legend] == ['0', '2.5', '5', '7.5', '10']
+
+
+def test_integers_with_many_values_are_continuous():
+    values = np.arange(max_categories + 1)
+    mapping = map_values(values, 'viridis')
+
+    assert mapping.categories is None
+    assert mapping.codes[0] == 0 and mapping.codes[-1] == lut_size - 1
+    assert np.all(np.diff(mapping.codes.astype(int)) >= 0)
+
+
+def test_constant_values():
+    mapping = map_values(np.full(3, 2.0), 'viridis')
+
+    np.testing.assert_array_equal(mapping.codes, [0, 0, 0])
+    assert len(mapping.legend) == 1
@@ -0,0 +1,68 @@
+import numpy as np
+
+from util.color_map import get_lut
+from util.default_config import node_colormap, density_colormap, density_opacity
+from util.draw_graph import GraphDrawer
+from util.gxl_graph import ParsedGxlGraph
+
+edge_style = {'color': (168, 50, 117, 255), 'thickness': 1}
+
+
+def draw(gxl_file, color_by_feature, node_style):
+    graph = ParsedGxlGraph(gxl_file)
+    img = np.zeros((100, 100, 3), dtype=np.uint8)
+    drawer = GraphDrawer(graph, img, color_by_feature, node_style, dict(edge_style), 1.0, 125, 'tumorbud')
+    return drawer, drawer.get_image()
+
+
+def test_category_colored_by_the_colormap(gxl_file):
+    # the types have no style -> they are colored with the colormap, tumorbud is the last category
+    drawer, img = draw(gxl_file, 'type', None)
+
+    lut = get_lut(node_colormap)
+    # center of the first node (tumorbud at x=10.5, y=20)
+    assert tuple(img[20, 10]) == tuple(lut[255])
+    assert dict(drawer.get_legend())['tumorbud'] == tuple(lut[255].tolist())
+
+
+def test_category_colored_by_the_style(gxl_file):
+    node_style = {'tumorbud': {'color': (175, 230, 25, 255), 'radius': 5},
+                  'lymphocyte': {'color': (255, 45, 240, 255), 'radius': 5}, 'thickness': -1}
+    _, img = draw(gxl_file, 'type', node_style)
+
+    assert tuple(img[20, 10]) == (175, 230, 25, 255)
+    # second node (lymphocyte at x=30, y=5.25)
+    assert tuple(img[5, 30]) == (255, 45, 240, 255)
+
+
+def test_density_colored_by_the_colormap(gxl_file):
+    graph = ParsedGxlGraph(gxl_file)
+    drawer = GraphDrawer(graph, np.zeros((100, 100, 3), dtype=np.uint8), None, None, dict(edge_style), 1.0, 125,
+                         'tumorbud', render_mode='density')
+    img = drawer.get_image()
+
+    density = drawer._layers[('density', None)]
+    row, column = np.unravel_index(np.argmax(density), density.shape)
+    # black background -> the color of the heatmap scaled by its opacity
+    opacity = density_opacity / 255 * density[row, column] / 255
+    expected = get_lut(density_colormap)[density[row, column], :3] * opacity
+    np.testing.assert_allclose(img[row, column, :3], expected, atol=1)
+
+
+def test_overlapping_sprites_show_the_last_node(gxl_file):
+    drawer, _ = draw(gxl_file, None, None)
+    # a disk of radius 6 stamped on nodes 2 pixels apart, every pixel is covered by several sprites
+    dy, dx = np.nonzero(np.hypot(*np.mgrid[-6:7, -6:7]) <= 6)
+    dy, dx = dy - 6, dx - 6
+    points = np.array([[10 + 2 * (i % 8), 10 + 2 * (i // 8)] for i in range(64)], dtype=np.float64)
+    nodes = np.arange(64)
+    # several chunks of nodes
+    drawer.stamp_chunk_size = 10 * len(dy)
+
+    layer = drawer.stamp_nodes(nodes, points, dy, dx, (40, 40))
+
+    expected = np.zeros((40, 40), dtype=np.int32)
+    for node in nodes:
+        x, y = points[node].astype(int)
+        expected[y + dy, x + dx] = node + 1
+    np.testing.assert_array_equal(layer, expected)
@@ -0,0 +1,99 @@
+import os
+
+from util.export_manifest import ExportManifest, input_signature, output_filename
+from util.image_encoder import EncodeOptions
+
+style = {'color_by_feature': None, 'transparency': 125, 'scaling': 1.0, 'current_node': 'tumorbud',
+         'node_style': {'tumorbud': {'color': (175, 230, 25, 255), 'radius': 22}, 'thickness': -1},
+         'edge_style': {'color': (168, 50, 117, 255), 'thickness': 5}, 'render_mode': 'graph',
+         'density_weight': None, 'density_class': None}
+
+
+def save_image(output_dir, gxl_filepath, img_filepath, style=style, encoding=None):
+    """
+    Save a (fake) image of a gxl file and record it in the manifest
+    """
+    manifest = ExportManifest(output_dir, style, encoding)
+    signature = input_signature(gxl_filepath, img_filepath)
+    with open(os.path.join(output_dir, output_filename(gxl_filepath, encoding)), 'wb') as f:
+        f.write(b'image')
+    manifest.update(gxl_filepath, signature)
+    manifest.save()
+
+
+def write(path, content):
+    with open(path, 'w') as f:
+        f.write(content)
+    return str(path)
+
+
+def test_saved_image_is_up_to_date(tmp_path):
+    gxl_filepath, img_filepath = write(tmp_path / 'graph.gxl', 'gxl'), write(tmp_path / 'graph.png', 'png')
+    assert not ExportManifest(str(tmp_path), style).is_up_to_date(gxl_filepath, img_filepath)
+
+    save_image(str(tmp_path), gxl_filepath, img_filepath)
+    assert ExportManifest(str(tmp_path), style).is_up_to_date(gxl_filepath, img_filepath)
+    # drawn on the image, not on a blank background
+    assert not ExportManifest(str(tmp_path), style).is_up_to_date(gxl_filepath, None)
+
+
+def test_changed_inputs(tmp_path):
+    gxl_filepath, img_filepath = write(tmp_path / 'graph.gxl', 'gxl'), write(tmp_path / 'graph.png', 'png')
+    save_image(str(tmp_path), gxl_filepath, img_filepath)
+
+    write(img_filepath, 'other png')
+    assert not ExportManifest(str(tmp_path), style).is_up_to_date(gxl_filepath, img_filepath)
+
+
+def test_same_content_with_another_modification_time(tmp_path):
+    gxl_filepath = write(tmp_path / 'graph.gxl', 'gxl')
+    save_image(str(tmp_path), gxl_filepath, None)
+
+    stat = os.stat(gxl_filepath)
+    os.utime(gxl_filepath, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    manifest = ExportManifest(str(tmp_path), style)
+    assert manifest.is_up_to_date(gxl_filepath)
+    # the new modification time is kept, the content is not read again
+    assert manifest.entries[output_filename(gxl_filepath)]['gxl']['mtime_ns'] == stat.st_mtime_ns + 10 ** 9
+
+
+def test_changed_style_or_encoding(tmp_path):
+    gxl_filepath = write(tmp_path / 'graph.gxl', 'gxl')
+    save_image(str(tmp_path), gxl_filepath, None)
+
+    assert not ExportManifest(str(tmp_path), dict(style, scaling=2.0)).is_up_to_date(gxl_filepath)
+    assert not ExportManifest(str(tmp_path), style, EncodeOptions(compression=9)).is_up_to_date(gxl_filepath)
+    # the order of the keys and tuples vs lists (e.g. read from a json style file) do not matter
+    reordered = {key: style[key] for key in reversed(list(style))}
+    reordered['edge_style'] = {'color': [168, 50, 117, 255], 'thickness': 5}
+    assert ExportManifest(str(tmp_path), reordered).is_up_to_date(gxl_filepath)
+
+
+def test_entries_of_other_styles_are_kept(tmp_path):
+    gxl_filepaths = [write(tmp_path / f'graph_{i}.gxl', 'gxl') for i in range(2)]
+    save_image(str(tmp_path), gxl_filepaths[0], None)
+    other_style = dict(style, scaling=2.0)
+    save_image(str(tmp_path), gxl_filepaths[1], None, style=other_style)
+
+    # saving an image with another style does not drop the entries saved with the first one
+    assert ExportManifest(str(tmp_path), style).is_up_to_date(gxl_filepaths[0])
+    assert not ExportManifest(str(tmp_path), style).is_up_to_date(gxl_filepaths[1])
+    assert ExportManifest(str(tmp_path), other_style).is_up_to_date(gxl_filepaths[1])
+
+    # an image drawn again with another style is only up to date with that style
+    save_image(str(tmp_path), gxl_filepaths[0], None, style=other_style)
+    assert not ExportManifest(str(tmp_path), style).is_up_to_date(gxl_filepaths[0])
+    assert ExportManifest(str(tmp_path), other_style).is_up_to_date(gxl_filepaths[0])
+
+
+def test_removed_image_or_entry(tmp_path):
+    gxl_filepath = write(tmp_path / 'graph.gxl', 'gxl')
+    save_image(str(tmp_path), gxl_filepath, None)
+
+    manifest = ExportManifest(str(tmp_path), style)
+    manifest.update(gxl_filepath, None)
+    assert not manifest.is_up_to_date(gxl_filepath)
+
+    save_image(str(tmp_path), gxl_filepath, None)
+    os.remove(os.path.join(str(tmp_path), output_filename(gxl_filepath)))
+    assert not ExportManifest(str(tmp_path), style).is_up_to_date(gxl_filepath)
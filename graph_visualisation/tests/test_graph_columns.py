@@ -0,0 +1,82 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from util.graph_plotter import load_graph
+from util.gxl_graph import ParsedGxlGraph
+from util.lru_cache import LRUCache
+from tests.gxl_files import nodes, edges
+
+
+@pytest.mark.parametrize('streaming', [True, False])
+def test_columns_of_parsed_graph(gxl_file, streaming):
+    columns = ParsedGxlGraph(gxl_file, streaming=streaming).columns
+
+    np.testing.assert_array_equal(columns.node_positions, [[x, y] for _, _, x, y, _, _ in nodes])
+    assert columns.node_positions.dtype == np.float64
+    # the node ids start at 1 -> the edges are shifted to indices starting at 0
+    np.testing.assert_array_equal(columns.edges, [[start - 1, end - 1] for start, end, _ in edges])
+    assert columns.edges.dtype == np.int32
+    assert columns.node_feature_names == ['type', 'x', 'y', 'area', 'count']
+    assert columns.edge_feature_names == ['distance']
+
+
+def test_typed_columns(gxl_file):
+    columns = ParsedGxlGraph(gxl_file).columns
+
+    assert columns.node_columns['area'].dtype == np.float64
+    assert columns.node_columns['count'].dtype == np.int64
+    # the strings are stored as codes of their categories and decoded on request
+    assert columns.node_columns['type'].dtype.kind == 'i'
+    assert list(columns.node_categories['type']) == ['tumorbud', 'lymphocyte']
+    assert list(columns.get_node_values('type')) == [node_type for _, node_type, _, _, _, _ in nodes]
+    np.testing.assert_array_equal(columns.get_node_values('count'), [count for *_, count in nodes])
+    np.testing.assert_array_equal(columns.get_edge_values('distance'), [distance for *_, distance in edges])
+
+
+def test_coordinates_are_views_on_the_positions(gxl_file):
+    columns = ParsedGxlGraph(gxl_file).columns
+
+    assert np.shares_memory(columns.node_columns['x'], columns.node_positions)
+    np.testing.assert_array_equal(columns.get_node_values('y'), columns.node_positions[:, 1])
+
+
+def test_nbytes(gxl_file):
+    columns = ParsedGxlGraph(gxl_file).columns
+
+    arrays = [columns.node_positions, columns.edges, *columns.node_columns.values(),
+              *columns.node_categories.values(), *columns.edge_columns.values(), *columns.edge_categories.values()]
+    assert columns.nbytes == sum(a.nbytes for a in arrays)
+
+
+def test_lazy_features_are_decoded_on_request(gxl_file):
+    graph = ParsedGxlGraph(gxl_file, color_by_feature='type', lazy=True)
+
+    assert set(graph.columns.node_columns) == {'type', 'x', 'y'}
+    np.testing.assert_array_equal(graph.get_node_feature_values('area'), [area for *_, area, _ in nodes])
+    assert graph.get_node_features(2) == {'type': 'lymphocyte', 'x': 50.0, 'y': 40.0, 'area': 46.5, 'count': 1}
+    with pytest.raises(KeyError):
+        graph.get_node_feature_values('missing')
+
+
+def test_cached_graph_is_charged_when_it_grows(gxl_file):
+    graph_cache = LRUCache(64 * 1024 ** 2)
+    graph = load_graph(gxl_file, color_by_feature='type', lazy=True, graph_cache=graph_cache)
+    assert graph_cache.nbytes == graph.columns.nbytes
+
+    graph.get_node_feature_values('area')
+    assert graph_cache.nbytes == graph.columns.nbytes
+    graph.spatial_index.get_edge_texture()
+    assert graph_cache.nbytes == graph.columns.nbytes + graph.spatial_index.nbytes > graph.columns.nbytes
+    assert load_graph(gxl_file, graph_cache=graph_cache) is graph
+
+
+def test_lazy_features_decoded_by_concurrent_threads(gxl_file):
+    graph = ParsedGxlGraph(gxl_file, lazy=True)
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        values = list(executor.map(graph.get_node_features, [i % len(nodes) for i in range(16)]))
+
+    for i, features in enumerate(values):
+        node_type, x, y, area, count = nodes[i % len(nodes)][1:]
+        assert features == {'type': node_type, 'x': x, 'y': y, 'area': area, 'count': count}
@@ -0,0 +1,116 @@
+import os
+
+import numpy as np
+
+from util.gxl_cache import GxlCache
+from util.gxl_graph import ParsedGxlGraph
+from tests.gxl_files import nodes, write_gxl
+
+
+def assert_same_columns(cached, parsed):
+    np.testing.assert_array_equal(cached.node_positions, parsed.node_positions)
+    np.testing.assert_array_equal(cached.edges, parsed.edges)
+    assert cached.node_feature_names == parsed.node_feature_names
+    assert cached.edge_feature_names == parsed.edge_feature_names
+    for feature in parsed.node_feature_names:
+        np.testing.assert_array_equal(cached.get_node_values(feature), parsed.get_node_values(feature))
+    np.testing.assert_array_equal(cached.get_edge_values('distance'), parsed.get_edge_values('distance'))
+
+
+def test_load_stored_graph(gxl_file, tmp_path):
+    cache = GxlCache(str(tmp_path / 'cache'), 1024 ** 2)
+    assert cache.load(gxl_file) is None
+
+    graph = ParsedGxlGraph(gxl_file, cache=cache)
+    graph_id, edge_ids_present, edgemode, columns = cache.load(gxl_file)
+    assert (graph_id, edge_ids_present, edgemode) == ('graph_0', False, 'undirected')
+    assert_same_columns(columns, graph.columns)
+    # the next parsing is loaded from the cache
+    assert_same_columns(ParsedGxlGraph(gxl_file, cache=cache).columns, graph.columns)
+
+
+def test_modified_gxl_invalidates_the_entry(gxl_file, tmp_path):
+    cache = GxlCache(str(tmp_path / 'cache'), 1024 ** 2)
+    ParsedGxlGraph(gxl_file, cache=cache)
+
+    write_gxl(gxl_file, nodes=nodes[:3], edges=[(1, 2, 1.0)])
+    assert cache.load(gxl_file) is None
+    assert not os.path.exists(cache.entry_dir(gxl_file))
+    graph = ParsedGxlGraph(gxl_file, cache=cache)
+    assert graph.nb_of_nodes == 3 and graph.nb_of_edges == 1
+
+
+def test_touched_gxl_invalidates_the_entry(gxl_file, tmp_path):
+    cache = GxlCache(str(tmp_path / 'cache'), 1024 ** 2)
+    ParsedGxlGraph(gxl_file, cache=cache)
+
+    stat = os.stat(gxl_file)
+    os.utime(gxl_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert cache.load(gxl_file) is None
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = GxlCache(str(tmp_path / 'cache'), 1024 ** 2)
+    paths = [write_gxl(tmp_path / f'graph_{i}.gxl', graph_id=f'graph_{i}') for i in range(3)]
+    for i, path in enumerate(paths):
+        ParsedGxlGraph(path, cache=cache)
+        # last use in the order of the graphs
+        meta_filepath = os.path.join(cache.entry_dir(path), cache.meta_filename)
+        os.utime(meta_filepath, ns=(i * 10 ** 9, i * 10 ** 9))
+    entry_size = sum(f.stat().st_size for f in os.scandir(cache.entry_dir(paths[0])))
+
+    # loading graph 0 marks it as recently used -> graph 1 is the least recently used
+    assert cache.load(paths[0]) is not None
+    cache.max_bytes = 2 * entry_size
+    cache.evict()
+    assert cache.load(paths[1]) is None
+    assert cache.load(paths[0]) is not None and cache.load(paths[2]) is not None
+
+
+def test_clear(gxl_file, tmp_path):
+    cache = GxlCache(str(tmp_path / 'cache'), 1024 ** 2)
+    ParsedGxlGraph(gxl_file, cache=cache)
+    cache.clear()
+    assert cache.load(gxl_file) is None
+    assert os.listdir(cache.cache_dir) == []
+
+
+def test_stores_only_scan_a_full_cache(tmp_path, monkeypatch):
+    cache = GxlCache(str(tmp_path / 'cache'), 1024 ** 2)
+    paths = [write_gxl(tmp_path / f'graph_{i}.gxl', graph_id=f'graph_{i}') for i in range(3)]
+    scans = []
+    scan = cache.scan
+    monkeypatch.setattr(cache, 'scan', lambda: scans.append(1) or scan())
+
+    graphs = [ParsedGxlGraph(path, cache=cache) for path in paths]
+    # only the first store measures the cache
+    assert len(scans) == 1
+    assert cache.nbytes == sum(size for _, size, _ in scan())
+
+    # a full cache is scanned and evicted down to max_bytes
+    cache.max_bytes = cache.nbytes - 1
+    cache.store(graphs[0])
+    assert len(scans) == 2
+    assert cache.nbytes == sum(size for _, size, _ in scan()) <= cache.max_bytes
+
+
+def test_lazy_features_are_added_to_the_entry(gxl_file, tmp_path, monkeypatch):
+    cache = GxlCache(str(tmp_path / 'cache'), 1024 ** 2)
+    graph = ParsedGxlGraph(gxl_file, cache=cache, lazy=True)
+    area = graph.get_node_feature_values('area')
+    distance = graph.get_edge_feature_values('distance')
+    node_type = graph.get_node_feature_values('type')
+    assert cache.nbytes == sum(size for _, size, _ in cache.scan())
+
+    # the next graph loads the decoded features from the cache instead of scanning the gxl file again
+    monkeypatch.setattr(ParsedGxlGraph, 'decode_lazy_feature', None)
+    cached = ParsedGxlGraph(gxl_file, cache=cache, lazy=True)
+    np.testing.assert_array_equal(cached.get_node_feature_values('area'), area)
+    np.testing.assert_array_equal(cached.get_edge_feature_values('distance'), distance)
+    np.testing.assert_array_equal(cached.get_node_feature_values('type'), node_type)
+    monkeypatch.undo()
+
+    # decoded features of a stale entry are not stored
+    write_gxl(gxl_file, nodes=nodes[:3], edges=[(1, 2, 1.0)])
+    graph.get_node_feature_values('count')
+    assert cache.load(gxl_file) is None
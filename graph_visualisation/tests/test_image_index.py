@@ -0,0 +1,38 @@
+import os
+
+from util.image_index import ImageIndex
+
+
+def touch(img_dir, *filenames):
+    for filename in filenames:
+        open(os.path.join(img_dir, filename), 'w').close()
+
+
+def test_exact_name_then_prefix_then_substring(tmp_path):
+    touch(tmp_path, 'graph_1.jpg', 'graph_1.png', 'graph_10.png', 'graph_2_overlay.png', 'he_graph_3.png',
+          'a_graph_3_b.png', 'notes.txt')
+    index = ImageIndex(str(tmp_path))
+
+    assert len(index) == 6
+    # png is preferred over jpg
+    assert index.lookup('graph_1') == os.path.join(tmp_path, 'graph_1.png')
+    assert index.lookup('graph_2') == os.path.join(tmp_path, 'graph_2_overlay.png')
+    # the first name in sorted order containing the name
+    assert index.lookup('graph_3') == os.path.join(tmp_path, 'a_graph_3_b.png')
+    # names are matched on whole tokens
+    assert index.lookup('graph_4') is None
+    assert index.lookup('raph_1') is None
+
+
+def test_refresh_when_the_directory_changes(tmp_path):
+    touch(tmp_path, 'graph_1.png')
+    index = ImageIndex(str(tmp_path))
+    assert index.lookup('graph_2') is None
+
+    touch(tmp_path, 'graph_2.bmp')
+    os.remove(os.path.join(tmp_path, 'graph_1.png'))
+    # the modification time of the directory changed
+    stat = os.stat(tmp_path)
+    os.utime(tmp_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert index.lookup('graph_2') == os.path.join(tmp_path, 'graph_2.bmp')
+    assert index.lookup('graph_1') is None
@@ -0,0 +1,59 @@
+import random
+
+from util.search_index import SearchIndex
+
+
+def brute_force_search(names, query):
+    """
+    Names starting with the query, then containing it, then containing its characters in order
+    """
+    query = query.casefold()
+
+    def is_subsequence(name):
+        characters = iter(name)
+        return all(character in characters for character in query)
+
+    folded = [name.casefold() for name in names]
+    prefix = [name for name, f in zip(names, folded) if f.startswith(query)]
+    substring = [name for name, f in zip(names, folded) if query in f and not f.startswith(query)]
+    fuzzy = [name for name, f in zip(names, folded) if query not in f and is_subsequence(f)]
+    return prefix + substring + fuzzy
+
+
+def test_order_of_the_groups():
+    names = ['xabc', 'axbxc', 'ABd', 'zzz', 'abc']
+    index = SearchIndex(names)
+
+    # prefix matches, then substring matches, then fuzzy matches, each in the order of the names
+    assert list(index.search('ab')) == ['ABd', 'abc', 'xabc', 'axbxc']
+    assert list(index.search('abc')) == ['abc', 'xabc', 'axbxc']
+    assert list(index.search('')) == names
+    assert list(index.search('q')) == []
+
+
+def test_backspace_goes_back_to_previous_matches():
+    names = ['graph_12', 'graph_21', 'image_1', 'g_r_a_p_h', 'other']
+    index = SearchIndex(names)
+
+    for query in ['g', 'gr', 'gra', 'gr', 'g', '', 'gx', 'g', 'graph_2', 'graph', 'o']:
+        assert list(index.search(query)) == brute_force_search(names, query), query
+
+
+def test_matches_brute_force_search():
+    rng = random.Random(0)
+    # names longer than 64 bytes use several words per name
+    names = [''.join(rng.choice('abcAB_1') for _ in range(rng.randint(0, 90))) for _ in range(300)]
+    index = SearchIndex(names)
+
+    for _ in range(100):
+        query = ''.join(rng.choice('abcAB_1') for _ in range(rng.randint(0, 6)))
+        assert list(index.search(query)) == brute_force_search(names, query), query
+
+
+def test_search_result_slices():
+    index = SearchIndex(['b1', 'a1', 'c1', 'a2'])
+    result = index.search('a')
+
+    assert len(result) == 2
+    assert result[0] == 'a1'
+    assert result[0:2] == ['a1', 'a2']
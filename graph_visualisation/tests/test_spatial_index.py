@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+
+from util.spatial_index import SpatialIndex
+
+
+@pytest.fixture
+def graph():
+    rng = np.random.default_rng(0)
+    positions = rng.uniform(0, 1000, (2000, 2))
+    # short edges between neighbours and a few edges across the graph
+    order = np.argsort(positions[:, 0])
+    edges = np.concatenate([np.stack([order[:-1], order[1:]], axis=1), rng.integers(0, 2000, (20, 2))])
+    return positions, edges.astype(np.int32)
+
+
+def test_query_nodes(graph):
+    positions, edges = graph
+    index = SpatialIndex(positions, edges)
+    rng = np.random.default_rng(1)
+
+    for _ in range(50):
+        x0, y0 = rng.uniform(-100, 1000, 2)
+        x1, y1 = x0 + rng.uniform(0, 300), y0 + rng.uniform(0, 300)
+        margin = rng.uniform(0, 20)
+        inside = (positions[:, 0] >= x0 - margin) & (positions[:, 0] <= x1 + margin) & \
+                 (positions[:, 1] >= y0 - margin) & (positions[:, 1] <= y1 + margin)
+        np.testing.assert_array_equal(index.query_nodes(x0, y0, x1, y1, margin), np.flatnonzero(inside))
+
+    np.testing.assert_array_equal(index.query_nodes(-1, -1, 1001, 1001), np.arange(len(positions)))
+    assert len(index.query_nodes(2000, 2000, 3000, 3000)) == 0
+
+
+def test_query_edges(graph):
+    positions, edges = graph
+    index = SpatialIndex(positions, edges)
+    low, high = positions[edges].min(axis=1), positions[edges].max(axis=1)
+    rng = np.random.default_rng(2)
+
+    for _ in range(50):
+        x0, y0 = rng.uniform(-100, 1000, 2)
+        x1, y1 = x0 + rng.uniform(0, 300), y0 + rng.uniform(0, 300)
+        intersecting = (high[:, 0] >= x0) & (low[:, 0] <= x1) & (high[:, 1] >= y0) & (low[:, 1] <= y1)
+        np.testing.assert_array_equal(index.query_edges(x0, y0, x1, y1), np.flatnonzero(intersecting))
+
+
+def test_nearest(graph):
+    positions, edges = graph
+    index = SpatialIndex(positions, edges)
+    rng = np.random.default_rng(3)
+
+    for x, y in rng.uniform(-200, 1200, (50, 2)):
+        distances = np.hypot(positions[:, 0] - x, positions[:, 1] - y)
+        node, distance = index.nearest(x, y)
+        assert distance == pytest.approx(distances.min())
+        assert distances[node] == pytest.approx(distances.min())
+
+    # no node close enough
+    x, y = positions[0] + 0.5
+    assert index.nearest(x, y, max_distance=0.1) is None
+    assert index.nearest(x, y, max_distance=1)[0] == 0
+    assert index.nearest(-500, -500, max_distance=10) is None
+
+
+def test_long_edges(graph):
+    positions, edges = graph
+    index = SpatialIndex(positions, edges)
+    sizes = np.abs(positions[edges[:, 0]] - positions[edges[:, 1]]).max(axis=1)
+
+    for min_size in (0, 1, 5, 100, 2000):
+        np.testing.assert_array_equal(np.sort(index.get_long_edges(min_size)), np.flatnonzero(sizes >= min_size))
+
+
+def test_edge_texture_counts_every_edge(graph):
+    positions, edges = graph
+    counts, x0, y0, cell = SpatialIndex(positions, edges).get_edge_texture()
+
+    # the 2 ends and the middle of every edge
+    assert counts.sum() == 3 * len(edges)
+    assert (x0, y0) == (positions[:, 0].min(), positions[:, 1].min())
+    assert max(counts.shape) == SpatialIndex.texture_size
+
+
+def test_empty_graph():
+    index = SpatialIndex(np.empty((0, 2)))
+
+    assert len(index.query_nodes(0, 0, 10, 10)) == 0
+    assert len(index.query_edges(0, 0, 10, 10)) == 0
+    assert index.nearest(0, 0) is None
@@ -0,0 +1,321 @@
+import copy
+import json
+import multiprocessing
+import os
+import threading
+import time
+from collections import namedtuple
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+from util.default_config import batch_style, cache_dir, cache_max_bytes, encode_workers
+from util.export_manifest import ExportManifest, input_signature
+from util.graph_plotter import graph_plotter
+from util.gxl_cache import GxlCache
+from util.image_encoder import ImageEncoder
+from util.image_index import ImageIndex
+from util.stats import stats
+
+# result of the rendering of one gxl file, output_file is None and error is set if it failed,
+# inputs is the signature of the gxl file and of the image read before drawing (see export_manifest),
+# stages the seconds spent in each stage of the drawing ({} if the stats are disabled, see util/stats.py)
+RenderResult = namedtuple('RenderResult', ['gxl_filepath', 'img_filepath', 'output_file', 'error', 'seconds',
+                                           'inputs', 'stages'])
+
+# gxl cache and image encoder of the current (worker) process
+_gxl_cache = None
+_encoder = None
+
+
+def load_style(style_file=None) -> dict:
+    """
+    Get the style of the batch renderer: batch_style of the default config, updated with a json style file.
+    The json file contains a subset of the keys color_by_feature, transparency, scaling, current_node,
+    node_style, edge_style, render_mode, density_weight and density_class.
+
+    Parameters:
+        style_file: path to the json style file (optional)
+
+    Returns:
+        dict with the style
+    """
+    style = copy.deepcopy(batch_style)
+    if style_file is None:
+        return style
+
+    with open(style_file) as f:
+        custom_style = json.load(f)
+    unknown = custom_style.keys() - style.keys()
+    if unknown:
+        raise ValueError(f'Unknown keys in the style file {style_file}: {", ".join(sorted(unknown))}')
+    style.update(custom_style)
+
+    # colors are lists in json
+    for node_config in style['node_style'].values():
+        if isinstance(node_config, dict) and 'color' in node_config:
+            node_config['color'] = tuple(node_config['color'])
+    if 'color' in style['edge_style']:
+        style['edge_style']['color'] = tuple(style['edge_style']['color'])
+    return style
+
+
+def find_jobs(gxl_dir, img_dir=None, blank=False) -> tuple:
+    """
+    Match the gxl files of a directory with their images
+
+    Parameters:
+        gxl_dir: path to the gxl directory
+        img_dir: path to the image directory (None = no images)
+        blank: draw the graphs without image on a blank background instead of skipping them
+
+    Returns:
+        tuple ([(str, str)], [str])
+        (gxl file, image or None) to render sorted by gxl file, and gxl files skipped because they have no image
+    """
+    with os.scandir(gxl_dir) as entries:
+        gxl_filepaths = sorted(entry.path for entry in entries
+                               if entry.name.lower().endswith('.gxl') and entry.is_file())
+    image_index = ImageIndex(img_dir) if img_dir else None
+
+    jobs, skipped = [], []
+    for gxl_filepath in gxl_filepaths:
+        gxl_filename = os.path.splitext(os.path.basename(gxl_filepath))[0]
+        img_filepath = image_index.lookup(gxl_filename) if image_index is not None else None
+        if img_filepath or blank:
+            jobs.append((gxl_filepath, img_filepath))
+        else:
+            skipped.append(gxl_filepath)
+    return jobs, skipped
+
+
+def render_file(gxl_filepath, img_filepath, output_dir, style, use_cache=True, encoding=None, encoder=None) -> Future:
+    """
+    Draw a graph on its image and save it as {file id}-vis.{extension} in the output directory. Errors are returned
+    in the result instead of being raised, such that one invalid file does not stop the batch. The image is encoded
+    by the encoder, such that the next file can be drawn in the meantime.
+
+    Parameters:
+        gxl_filepath: path to the gxl file
+        img_filepath: path to the image (None = blank background)
+        output_dir: path to the output directory
+        style: style of the drawing (see load_style)
+        use_cache: use the on-disk gxl cache
+        encoding: EncodeOptions of the saved image (None = full size png)
+        encoder: ImageEncoder (None = encode in this thread)
+
+    Returns:
+        Future of the RenderResult
+    """
+    global _gxl_cache
+    if use_cache and _gxl_cache is None:
+        _gxl_cache = GxlCache(cache_dir, cache_max_bytes)
+
+    start = time.perf_counter()
+
+    def failed(e, stages):
+        return RenderResult(gxl_filepath, img_filepath, None, f'{type(e).__name__}: {e}',
+                            time.perf_counter() - start, None, stages)
+
+    # the file is loaded in this thread and drawn / encoded in a thread of the encoder
+    with stats.record() as load_stages:
+        try:
+            inputs = input_signature(gxl_filepath, img_filepath)
+            graph_img = graph_plotter(gxl_filepath=gxl_filepath, img_filepath=img_filepath,
+                                      color_by_feature=style['color_by_feature'],
+                                      node_style=copy.deepcopy(style['node_style']),
+                                      edge_style=copy.deepcopy(style['edge_style']),
+                                      scaling=float(style['scaling']), transparency=style['transparency'],
+                                      current_node=style['current_node'], render_mode=style['render_mode'],
+                                      density_weight=style['density_weight'], density_class=style['density_class'],
+                                      cache=_gxl_cache if use_cache else None, lazy=True)
+        except Exception as e:
+            future = Future()
+            future.set_result(failed(e, load_stages))
+            return future
+
+    def save():
+        with stats.record() as save_stages:
+            try:
+                output_file = graph_img.save(output_dir, verbose=False, encoding=encoding)
+                error = None
+            except Exception as e:
+                error = e
+        stages = {**load_stages, **save_stages}
+        if error is not None:
+            return failed(error, stages)
+        return RenderResult(gxl_filepath, img_filepath, output_file, None, time.perf_counter() - start, inputs,
+                            stages)
+
+    return (encoder or ImageEncoder(max_workers=0)).submit(save)
+
+
+def render_chunk(jobs, output_dir, style, use_cache=True, encoding=None, encoder_workers=encode_workers,
+                 profile=False) -> list:
+    """
+    Render several files in a worker process (see render_file), drawing a file while the previous ones are encoded.
+    profile enables the stats of the worker process, such that the results give the time of the stages.
+
+    Returns:
+        [RenderResult]
+    """
+    global _encoder
+    stats.enabled = profile
+    if _encoder is None:
+        _encoder = ImageEncoder(encoder_workers)
+    futures = [render_file(gxl_filepath, img_filepath, output_dir, style, use_cache, encoding, _encoder)
+               for gxl_filepath, img_filepath in jobs]
+    return [future.result() for future in futures]
+
+
+class BatchRenderer:
+    # the manifest is written at least every save_interval seconds, such that an interrupted export is resumed
+    save_interval = 10
+
+    def __init__(self, gxl_dir, img_dir, output_dir, style=None, workers=None, chunksize=None, blank=False,
+                 use_cache=True, incremental=True, encoding=None, encoder_workers=None) -> None:
+        """
+        This class draws all the graphs of a gxl directory on their images in parallel processes, without display.
+        The rendering can be paused and cancelled from another thread (e.g. the GUI).
+        In incremental mode, the images whose gxl file, image and style did not change since they were saved
+        (according to the manifest of the output directory) are not drawn again.
+
+        :param gxl_dir: path to the gxl directory
+        :param img_dir: path to the image directory (None = no images)
+        :param output_dir: path to the output directory, created if it does not exist
+        :param style: style of the drawing (default = load_style())
+        :param workers: number of worker processes (None = number of cpus, 1 = render in this process)
+        :param chunksize: number of files sent at once to a worker (None = chosen from the number of files)
+        :param blank: draw the graphs without image on a blank background instead of skipping them
+        :param use_cache: use the on-disk gxl cache
+        :param incremental: skip the images which are up to date (False = draw all the images)
+        :param encoding: EncodeOptions of the saved images: format, quality and maximal size (None = full size png)
+        :param encoder_workers: number of threads encoding the images in each process (None = encode_workers)
+        """
+        self.output_dir = output_dir
+        self.style = style if style is not None else load_style()
+        self.workers = workers or os.cpu_count() or 1
+        self.use_cache = use_cache
+        self.encoding = encoding
+        self.encoder_workers = encoder_workers if encoder_workers is not None else encode_workers
+        # the worker processes measure the stages if the stats of this process are enabled
+        self.profile = stats.enabled
+        self.jobs, self.skipped = find_jobs(gxl_dir, img_dir, blank)
+        # gxl files whose image is up to date
+        self.up_to_date = []
+        self.manifest = ExportManifest(output_dir, self.style, encoding)
+        if incremental:
+            jobs = self.jobs
+            self.jobs = []
+            for gxl_filepath, img_filepath in jobs:
+                if self.manifest.is_up_to_date(gxl_filepath, img_filepath):
+                    self.up_to_date.append(gxl_filepath)
+                else:
+                    self.jobs.append((gxl_filepath, img_filepath))
+        # a few chunks per worker, such that the workers stay busy until the end
+        self.chunksize = chunksize or max(1, min(16, len(self.jobs) // (self.workers * 4)))
+
+        self._paused = threading.Event()
+        self._cancelled = threading.Event()
+
+    @property
+    def paused(self) -> bool:
+        return self._paused.is_set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def pause(self):
+        """
+        Stop starting new files, the files being drawn are finished
+        """
+        self._paused.set()
+
+    def resume(self):
+        self._paused.clear()
+
+    def cancel(self):
+        """
+        Stop the rendering, the files being drawn are finished
+        """
+        self._cancelled.set()
+        self._paused.clear()
+
+    def chunks(self):
+        return [self.jobs[i:i + self.chunksize] for i in range(0, len(self.jobs), self.chunksize)]
+
+    def run(self):
+        """
+        Render all the files (except the up to date ones). The results are yielded in the order the files are done;
+        closing the generator or calling cancel stops the rendering of the files which are not started yet. The
+        manifest of the output directory is updated with the saved images.
+
+        Returns:
+            generator of RenderResult
+        """
+        os.makedirs(self.output_dir, exist_ok=True)
+        last_save = time.monotonic()
+        try:
+            for result in self._render():
+                self.manifest.update(result.gxl_filepath, result.inputs)
+                if time.monotonic() - last_save > self.save_interval:
+                    self.manifest.save()
+                    last_save = time.monotonic()
+                yield result
+        finally:
+            self.manifest.save()
+
+    def _render(self):
+        """
+        Render the files (see run), without updating the manifest
+
+        Returns:
+            generator of RenderResult
+        """
+        if self.workers == 1:
+            encoder = ImageEncoder(self.encoder_workers)
+            # images being encoded, in the order of the files
+            futures = deque()
+            try:
+                for gxl_filepath, img_filepath in self.jobs:
+                    while self.paused:
+                        time.sleep(0.1)
+                    if self.cancelled:
+                        break
+                    futures.append(render_file(gxl_filepath, img_filepath, self.output_dir, self.style,
+                                               self.use_cache, self.encoding, encoder))
+                    while futures and futures[0].done():
+                        yield futures.popleft().result()
+                while futures:
+                    yield futures.popleft().result()
+            finally:
+                encoder.shutdown()
+            return
+
+        # only a few chunks per worker are submitted at once, such that pausing and cancelling take effect quickly
+        chunks = iter(self.chunks())
+        running = set()
+        finished = False
+        # the workers are spawned, forking a process running threads (e.g. the GUI) is not safe
+        executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'))
+        try:
+            while True:
+                while not finished and not self.paused and not self.cancelled and len(running) < 2 * self.workers:
+                    chunk = next(chunks, None)
+                    if chunk is None:
+                        finished = True
+                    else:
+                        running.add(executor.submit(render_chunk, chunk, self.output_dir, self.style,
+                                                    self.use_cache, self.encoding, self.encoder_workers,
+                                                    self.profile))
+                if not running:
+                    if finished or self.cancelled:
+                        return
+                    # paused
+                    time.sleep(0.1)
+                    continue
+                done, running = wait(running, timeout=0.1, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield from future.result()
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,77 @@
+from collections import namedtuple
+from functools import lru_cache
+
+import numpy as np
+import matplotlib as mpl
+
+# number of colors of a lookup table
+lut_size = 256
+# integer and string features with more distinct values are colored as continuous features (if they are numeric)
+max_categories = 256
+# number of values shown in the legend of a continuous feature
+legend_ticks = 5
+
+# colors of the values of a feature:
+# - codes: (N,) uint8 index of the color of every element in the lookup table
+# - categories: distinct values of a categorical feature (None if the feature is continuous)
+# - inverse: (N,) index of the category of every element (None if the feature is continuous)
+# - legend: list of (label, RGBA color) taken from the lookup table
+ColorMapping = namedtuple('ColorMapping', ['codes', 'categories', 'inverse', 'legend'])
+
+
+@lru_cache(maxsize=16)
+def get_lut(cmap_name: str) -> np.ndarray:
+    """
+    Get the lookup table of a matplotlib colormap (computed once per colormap)
+
+    Parameters:
+        cmap_name: name of the colormap (e.g. 'Spectral', 'viridis')
+
+    Returns:
+        np.ndarray (lut_size, 4) uint8 RGBA colors, read-only
+    """
+    cmap = mpl.colormaps[cmap_name].resampled(lut_size) if hasattr(mpl, 'colormaps') \
+        else mpl.cm.get_cmap(cmap_name, lut_size)
+    # integers index the colors of the colormap directly
+    lut = (cmap(np.arange(lut_size)) * 255).astype(np.uint8)
+    lut.flags.writeable = False
+    return lut
+
+
+def map_values(values: np.ndarray, cmap_name: str = 'Spectral') -> ColorMapping:
+    """
+    Map the values of a feature to the colors of a colormap. The categories of a categorical feature (strings,
+    integers with few distinct values) are spread over the whole colormap, the values of a continuous feature are
+    normalized between their minimum and maximum and binned in the lut_size colors.
+
+    Parameters:
+        values: (N,) values of the feature
+        cmap_name: name of the colormap
+
+    Returns:
+        ColorMapping, the colors of the elements are get_lut(cmap_name)[codes]
+    """
+    values = np.asarray(values)
+    lut = get_lut(cmap_name)
+    numeric = np.issubdtype(values.dtype, np.number) or values.dtype == bool
+    if not numeric or not np.issubdtype(values.dtype, np.floating):
+        categories, inverse = np.unique(values, return_inverse=True)
+        inverse = inverse.ravel()
+        if len(categories) <= max_categories or not numeric:
+            # category i of k gets the color at i / (k - 1) of the colormap
+            scale = (lut_size / (len(categories) - 1)) if len(categories) > 1 else 0
+            palette = np.minimum((np.arange(len(categories)) * scale).astype(np.int64), lut_size - 1)
+            legend = [(str(category), tuple(lut[code].tolist()))
+                      for category, code in zip(categories.tolist(), palette.tolist())]
+            return ColorMapping(palette.astype(np.uint8)[inverse], categories, inverse, legend)
+
+    finite = values[np.isfinite(values)] if np.issubdtype(values.dtype, np.floating) else values
+    low, high = (float(finite.min()), float(finite.max())) if len(finite) > 0 else (0.0, 0.0)
+    scale = lut_size / (high - low) if high > low else 0.0
+    # the values which are not finite get the first color
+    positions = np.multiply(values - low, scale, dtype=np.float32)
+    np.nan_to_num(positions, copy=False, nan=0.0, posinf=0.0, neginf=0.0)
+    codes = np.clip(positions, 0, lut_size - 1, out=positions).astype(np.uint8)
+    legend = [(f'{value:.4g}', tuple(lut[min(int((value - low) * scale), lut_size - 1)].tolist()))
+              for value in np.linspace(low, high, legend_ticks if high > low else 1).tolist()]
+    return ColorMapping(codes, None, None, legend)
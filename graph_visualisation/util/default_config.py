@@ -1,3 +1,5 @@
+import os
+
 
 nodes = ['tumorbud', 'lymphocyte']
 
@@ -6,3 +8,66 @@ node_style = {'tumorbud': {'color': (175, 230, 25, 255), 'radius': 22},
               'thickness': -1}
 
 edge_style = {'color': (168, 50, 117, 255), 'thickness': 5}
+
+# on-disk cache of the parsed gxl files
+cache_dir = os.path.join(os.path.expanduser('~'), '.cache', 'graph_visualisation')
+cache_max_bytes = 2 * 1024 ** 3
+
+# in-memory caches of the viewer
+graph_cache_max_bytes = 512 * 1024 ** 2
+image_cache_max_bytes = 1024 ** 3
+
+# style of the batch renderer (render_all.py), the keys can be overridden by a json style file
+batch_style = {'color_by_feature': None, 'transparency': 125, 'scaling': 1.0, 'current_node': nodes[0],
+               'node_style': node_style, 'edge_style': edge_style, 'render_mode': 'graph', 'density_weight': None,
+               'density_class': None}
+
+# neighbours of the selected graph in the list (prefetch_depth before and after) prepared in the background
+prefetch_depth = 2
+prefetch_workers = 2
+# also draw the neighbours with the current style, not only parse the graph and decode the image
+prefetch_render = True
+drawer_cache_max_bytes = 256 * 1024 ** 2
+
+# number of processes of Save All (None = number of cpus)
+save_all_workers = None
+
+# saved images: format (png, jpeg, webp or webp_lossless), quality of jpeg/webp (1-100), compression level of png
+# (0-9), maximal width and height (None = default of OpenCV / full size), see util/image_encoder.py
+export_format = 'png'
+export_quality = None
+export_compression = None
+export_max_size = None
+# threads encoding the saved images (per process of Save All / render_all.py)
+encode_workers = 1
+
+# measure the time of the stages of the drawing (parse, decode, draw, present, encode...) and count the cache hits,
+# see util/stats.py (can also be switched on in the viewer and with --stats_log of render_all.py)
+profiling = False
+
+# zoomed view of the viewer: size of the tiles in pixels, memory of the rendered tiles, maximal zoom (4 = 4 pixels of
+# the screen per pixel of the image at full resolution)
+tile_size = 256
+tile_cache_max_bytes = 256 * 1024 ** 2
+max_zoom = 4
+
+# matplotlib colormap of the nodes colored by a feature without a style in node_style (continuous features, e.g.
+# the area, are binned in 256 colors)
+node_colormap = 'Spectral'
+
+# 'density' render mode: heatmap of the nodes smoothed by a gaussian of density_sigma pixels (full resolution),
+# colored with density_colormap, the density_percentile percentile of the density of the whole image (drawn at most
+# density_reference_size pixels wide) gets the last color, opacity of the heatmap from 0 to 255
+density_sigma = 8
+density_colormap = 'inferno'
+density_percentile = 99
+density_reference_size = 1024
+density_opacity = 200
+
+# level of detail of the edges of the previews (the saved images draw every edge): the edges shorter than
+# edge_lod_min_length pixels and the duplicated segments are dropped, above edge_lod_thin_lines edges they are drawn
+# as 1 pixel anti-aliased lines and above edge_lod_max_lines as a texture of their density
+edge_lod = True
+edge_lod_min_length = 1
+edge_lod_thin_lines = 20000
+edge_lod_max_lines = 200000
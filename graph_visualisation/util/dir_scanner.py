@@ -0,0 +1,97 @@
+import os
+import queue
+import threading
+import time
+
+
+def insert_sorted(items: list, new_items) -> None:
+    """
+    Insert items in a sorted list, in place. The new items are sorted and appended, the sort of the list then only
+    merges the two sorted runs (one pass over the list).
+
+    Parameters:
+        items: sorted list
+        new_items: items to insert (any order)
+    """
+    items.extend(sorted(new_items))
+    items.sort()
+
+
+class DirScanner:
+    # a batch is sent when it has batch_size files or when batch_delay seconds passed since the previous one
+    batch_size = 1000
+    batch_delay = 0.1
+
+    def __init__(self, directory: str, extension: str) -> None:
+        """
+        This class lists the files of a directory with a given extension in a background thread. The files are sent
+        in batches as they are found, such that the first ones can be shown before the whole (e.g. network-mounted)
+        directory is listed.
+
+        :param directory: path to the directory
+        :param extension: extension of the files (case insensitive, e.g. '.gxl')
+        """
+        self.directory = directory
+        self.extension = extension.lower()
+        # number of files found so far
+        self.count = 0
+        self.done = False
+        # OSError raised while listing the directory
+        self.error = None
+
+        self._batches = queue.Queue()
+        self._cancelled = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='DirScanner', daemon=True)
+        self._thread.start()
+
+    def cancel(self):
+        """
+        Stop listing the directory (e.g. when another directory is chosen)
+        """
+        self._cancelled.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def poll(self) -> list:
+        """
+        Get the files found since the last call (to be called by the GUI thread), done is set once all the
+        files were returned
+
+        Returns:
+            list of file names (without directory)
+        """
+        filenames = []
+        while True:
+            try:
+                batch = self._batches.get_nowait()
+            except queue.Empty:
+                return filenames
+            if batch is None:
+                self.done = True
+            else:
+                filenames.extend(batch)
+
+    def _run(self):
+        batch = []
+        last_batch = time.monotonic()
+        try:
+            with os.scandir(self.directory) as entries:
+                for entry in entries:
+                    if self._cancelled.is_set():
+                        return
+                    if entry.name.lower().endswith(self.extension) and entry.is_file():
+                        batch.append(entry.name)
+                        self.count += 1
+                    if batch and (len(batch) >= self.batch_size or time.monotonic() - last_batch >= self.batch_delay):
+                        self._batches.put(batch)
+                        batch = []
+                        last_batch = time.monotonic()
+        except OSError as e:
+            self.error = e
+        finally:
+            if batch:
+                self._batches.put(batch)
+            # end of the listing
+            self._batches.put(None)
@@ -1,26 +1,81 @@
 import os
+import copy
+import math
+from functools import lru_cache
+
 import cv2
-import matplotlib as mpl
-from matplotlib import cm
+import numpy as np
+
+from util.color_map import ColorMapping, get_lut, map_values
+from util.default_config import node_colormap, density_sigma, density_colormap, density_opacity, \
+    density_percentile, density_reference_size, edge_lod, edge_lod_min_length, edge_lod_thin_lines, \
+    edge_lod_max_lines
+from util.image_encoder import EncodeOptions, extension, write_image
+from util.stats import stats
+
+# style of the nodes which have no style in node_style
+default_node_style = {'color': (47, 130, 224, 255), 'radius': 20, 'thickness': -1}
+
 
+@lru_cache(maxsize=64)
+def circle_sprite(radius: int, thickness: int) -> tuple:
+    """
+    Rasterize a circle (filled if thickness < 0) once with opencv, such that it can be stamped on many centers
 
-class MplColorHelper:
-    def __init__(self, cmap_name, nb_colors):
-        self.cmap_name = cmap_name
-        self.cmap = cm.get_cmap(cmap_name)
-        self.norm = mpl.colors.Normalize(vmin=0, vmax=nb_colors - 1)
-        self.scalarMap = cm.ScalarMappable(norm=self.norm, cmap=self.cmap)
+    Parameters:
+        radius: radius of the circle in pixels
+        thickness: thickness of the circle line, negative to fill the circle
 
-    def get_rgb(self, val):
-        return tuple([int(c * 255) for c in self.scalarMap.to_rgba(val)][:3])
+    Returns:
+        tuple (np.ndarray, np.ndarray)
+        row and column offsets of the circle pixels from the center
+    """
+    half = radius + max(thickness, 0) + 1
+    sprite = np.zeros((2 * half + 1, 2 * half + 1), dtype=np.uint8)
+    cv2.circle(sprite, (half, half), radius=radius, color=1, thickness=thickness)
+    dy, dx = np.nonzero(sprite)
+    return (dy - half).astype(np.int32), (dx - half).astype(np.int32)
+
+
+def to_rgba(color) -> np.ndarray:
+    """
+    Convert a color of the style to 4 channels, a color without alpha value gets alpha 0 (as opencv does)
+    """
+    rgba = np.zeros(4, dtype=np.uint8)
+    rgba[:len(color[:4])] = color[:4]
+    return rgba
 
 
 class GraphDrawer:
+    # maximal number of pixel indices computed at once when stamping the nodes
+    stamp_chunk_size = 1 << 22
+    # the edges of the tiles are cut on a grid of cells of this size, drawn with this number of fractional bits of
+    # their coordinates (see draw_tile_edges)
+    edge_cell_size = 128
+    edge_shift = 16
+    # circles with more pixels are drawn one by one by opencv, which is faster than stamping them (the stamping
+    # writes every pixel through an index array, opencv fills the rows of the circle)
+    max_sprite_size = 384
+
     def __init__(self, graph, img, color_by_feature, node_style, edge_style, scaling,
-                 transparency, current_node) -> None:
+                 transparency, current_node, img_scale=1.0, render_mode='graph', density_weight=None,
+                 density_class=None) -> None:
         """
         This class draws the graph on the image
 
+        The drawing is split in cached layers that are only redrawn when a parameter they depend on changes:
+        - background: the image with its alpha channel (img, transparency)
+        - edges: coverage of the edges (scaling, edge_style thickness and line type)
+        - nodes: index of the node on top of every pixel (scaling, node_style radii and thickness, current_node,
+          color_by_feature)
+        - density: smoothed number of nodes per pixel mapped to 0-255 (scaling, density_weight, density_class,
+          color_by_feature), only drawn in the 'density' render mode
+        - edge_blend: the background with the edges blended in their color (background, edges, edge_style color)
+        The nodes are then painted on a copy of edge_blend with the current colors, which is the image returned by
+        get_image.
+        get_preview draws the same layers directly at a smaller size (e.g. the size of the canvas), with a lower level
+        of detail of the edges (see draw_edges). get_image and save always draw every edge.
+
         :param graph: parsed GxlGraph
         :param img: image that the graphs is drawn on
         :param color_by_feature: name of the feature to color by
@@ -29,8 +84,22 @@ class GraphDrawer:
         :param scaling: scaling for the x,y coordinates (in case they are not in pixels)
         :param transparency: transparency of the original image
         :param current_node: the current node selected in the node style option menu
+        :param img_scale: scale of the image compared to its full resolution (< 1 if it was decoded reduced),
+        the coordinates, radii and thicknesses are scaled accordingly
+        :param render_mode: 'graph' to draw the nodes and the edges, 'density' to draw a heatmap of the nodes
+        :param density_weight: name of the node feature weighting the nodes in the heatmap (None = count the nodes)
+        :param density_class: only the nodes with this value of color_by_feature are in the heatmap (None = all)
         """
+        # {(layer name, size): cached layer}, missing layers are redrawn by get_image / get_preview
+        self._layers = {}
+        # colors of the values of color_by_feature (see get_color_mapping)
+        self._color_mapping = None
+        # nodes and weights of the heatmap, density mapped to the last color (see get_density_selection / norm)
+        self._density_selection = None
+        self._density_norm = None
+
         self.transparency = transparency
+        self.img_scale = img_scale
         self.graph = graph
         self.img = img
         self.scaling = scaling
@@ -40,18 +109,185 @@ class GraphDrawer:
 
         self.node_style = node_style
         self.edge_style = edge_style
+        self.render_mode = render_mode
+        self.density_weight = density_weight
+        self.density_class = density_class
+
+    def invalidate(self, *layers):
+        """
+        Drop cached layers such that they are redrawn, the composited image is always dropped
+
+        Parameters:
+            layers: names of the layers ('background', 'edges' and / or 'nodes')
+        """
+        layers = layers + ('composite',)
+        if 'background' in layers or 'edges' in layers:
+            layers = layers + ('edge_blend',)
+        if 'density' in layers:
+            self._density_selection = None
+            self._density_norm = None
+        for key in [key for key in self._layers if key[0] in layers]:
+            del self._layers[key]
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Number of bytes of the image and of the cached layers
+        """
+        return self._img.nbytes + sum(layer.nbytes for layer in self._layers.values())
+
+    @property
+    def transparency(self):
+        return self._transparency
+
+    @transparency.setter
+    def transparency(self, transparency):
+        if getattr(self, '_transparency', None) != transparency:
+            self.invalidate('background', 'pyramid')
+        self._transparency = transparency
+
+    @property
+    def scaling(self):
+        return self._scaling
+
+    @scaling.setter
+    def scaling(self, scaling):
+        if getattr(self, '_scaling', None) != scaling:
+            self.invalidate('edges', 'nodes', 'tile_points', 'density')
+        self._scaling = scaling
+
+    @property
+    def color_by_feature(self):
+        return self._color_by_feature
+
+    @color_by_feature.setter
+    def color_by_feature(self, color_by_feature):
+        if getattr(self, '_color_by_feature', None) != color_by_feature:
+            self.invalidate('nodes', 'density')
+            self._color_mapping = None
+        self._color_by_feature = color_by_feature
+
+    @property
+    def current_node(self):
+        return self._current_node
+
+    @current_node.setter
+    def current_node(self, current_node):
+        if getattr(self, '_current_node', None) != current_node:
+            self.invalidate('nodes')
+        self._current_node = current_node
+
+    @property
+    def render_mode(self):
+        return self._render_mode
+
+    @render_mode.setter
+    def render_mode(self, render_mode):
+        if render_mode not in ('graph', 'density'):
+            raise ValueError(f"Unknown render mode {render_mode}, expected 'graph' or 'density'")
+        if getattr(self, '_render_mode', None) != render_mode:
+            self.invalidate()
+        self._render_mode = render_mode
+
+    @property
+    def density_weight(self):
+        return self._density_weight
+
+    @density_weight.setter
+    def density_weight(self, density_weight):
+        if getattr(self, '_density_weight', None) != density_weight:
+            self.invalidate('density')
+        self._density_weight = density_weight
+
+    @property
+    def density_class(self):
+        return self._density_class
+
+    @density_class.setter
+    def density_class(self, density_class):
+        if getattr(self, '_density_class', None) != density_class:
+            self.invalidate('density')
+        self._density_class = density_class
+
+    @property
+    def img_scale(self):
+        return self._img_scale
+
+    @img_scale.setter
+    def img_scale(self, img_scale):
+        if getattr(self, '_img_scale', None) != img_scale:
+            self.invalidate('edges', 'nodes', 'pyramid', 'density')
+        self._img_scale = img_scale
+
+    @property
+    def full_size(self) -> tuple:
+        """
+        (width, height) of the image at full resolution
+        """
+        height, width = self._img.shape[:2]
+        return max(1, round(width / self.img_scale)), max(1, round(height / self.img_scale))
 
     @property
     def img(self):
-        return self._img
+        return self.get_background()
+
+    def get_background(self, size=None):
+        """
+        Get the image with its alpha channel
+
+        Parameters:
+            size: (width, height) of the background, None for the size of the image
+
+        Returns:
+            np.ndarray (height, width, 4) uint8
+        """
+        if ('background', size) not in self._layers:
+            img = self._img
+            if size is not None:
+                # downsample before adding the alpha channel, such that only the small image is converted
+                # (the downsampled image does not depend on the transparency -> it is kept)
+                if ('downsampled', size) not in self._layers:
+                    with stats.stage('resize'):
+                        self._layers[('downsampled', size)] = cv2.resize(img, size, interpolation=cv2.INTER_AREA)
+                img = self._layers[('downsampled', size)]
+            with stats.stage('convert'):
+                # Add alpha layer
+                bgra = cv2.cvtColor(img, cv2.COLOR_RGB2BGRA)
+                # Set alpha layer semi-transparent with Numpy indexing, B=0, G=1, R=2, A=3
+                bgra[..., 3] = self.transparency
+            self._layers[('background', size)] = bgra
+        return self._layers[('background', size)]
+
+    def get_size_factors(self, size=None) -> tuple:
+        """
+        Get the factors mapping the coordinates of the full resolution image to the coordinates of a smaller image
+
+        Parameters:
+            size: (width, height), None for the size of the image
+
+        Returns:
+            tuple (float, float, float)
+            factor along x, factor along y and factor for lengths (radius, thickness)
+        """
+        if size is None:
+            return self.img_scale, self.img_scale, self.img_scale
+        height, width = self._img.shape[:2]
+        fx, fy = size[0] * self.img_scale / width, size[1] * self.img_scale / height
+        return fx, fy, (fx * fy) ** 0.5
+
+    @staticmethod
+    def scale_length(length, factor) -> int:
+        """
+        Scale a radius or a thickness, it stays at least 1 pixel (negative thicknesses mean filled)
+        """
+        if factor == 1.0 or length < 0:
+            return int(length)
+        return max(1, int(round(length * factor)))
 
     @img.setter
     def img(self, img):
-        # Add alpha layer
-        bgra = cv2.cvtColor(img, cv2.COLOR_RGB2BGRA)
-        # Set alpha layer semi-transparent with Numpy indexing, B=0, G=1, R=2, A=3
-        bgra[..., 3] = self.transparency
-        self._img = bgra
+        self._img = img
+        self.invalidate('background', 'downsampled', 'pyramid')
 
     @property
     def node_style(self) -> dict:
@@ -59,17 +295,19 @@ class GraphDrawer:
 
     @node_style.setter
     def node_style(self, node_config):
-        default = {'color': (47, 130, 224, 255), 'radius': 20, 'thickness': -1}
         if node_config is None:
-            if self.color_by_feature is None:
-                node_config = default
-            else:
-                nb_diff_features = sorted(list(set(self.graph.color_by_features)))
-                color_mixer = MplColorHelper('Spectral', len(nb_diff_features))
-                node_config = {f: {'color': color_mixer.get_rgb(i), 'radius': 20} for i, f in
-                               enumerate(nb_diff_features)}
-                node_config['thickness'] = -1
+            # every node gets default_node_style, colored by the colormap if color_by_feature is given
+            node_config = {'thickness': default_node_style['thickness']}
 
+        # the style dictionaries are modified in place by the viewer -> compare with a copy of the previous style,
+        # the node layer is only redrawn when the shape of the nodes changes
+        geometry = {k: v['radius'] if isinstance(v, dict) else v for k, v in node_config.items()}
+        if getattr(self, '_node_geometry', None) != geometry:
+            self.invalidate('nodes')
+            self._node_geometry = geometry
+        if getattr(self, '_node_config_copy', None) != node_config:
+            self.invalidate()
+            self._node_config_copy = copy.deepcopy(node_config)
         self._node_config = node_config
 
     @property
@@ -81,52 +319,784 @@ class GraphDrawer:
         default = {'color': (30, 110, 30, 255), 'thickness': 10, 'lineType': cv2.LINE_AA}  #
         if edge_config is None:
             edge_config = default
-        elif len(edge_config) != default:
+        else:
             for k, v in default.items():
                 if k not in edge_config:
                     edge_config[k] = v
 
+        # the style dictionaries are modified in place by the viewer -> compare with a copy of the previous style,
+        # the edge layer is only redrawn when the shape of the edges changes
+        geometry = (edge_config['thickness'], edge_config['lineType'])
+        if getattr(self, '_edge_geometry', None) != geometry:
+            self.invalidate('edges')
+            self._edge_geometry = geometry
+        if getattr(self, '_edge_config_copy', None) != edge_config:
+            self.invalidate('edge_blend')
+            self._edge_config_copy = copy.deepcopy(edge_config)
         self._edge_config = edge_config
 
-    def get_image(self):
+    def get_points(self, size=None) -> np.ndarray:
+        """
+        Scaled coordinates of the nodes truncated to pixels
+
+        Parameters:
+            size: (width, height) of the drawing, None for the size of the image
+
+        Returns:
+            np.ndarray (N, 2) int32 [[x of node 1, y of node 1], ...]
+        """
+        fx, fy, _ = self.get_size_factors(size)
+        if fx == fy == 1.0:
+            return (self.graph.node_positions * self.scaling).astype(np.int32)
+        return (self.graph.node_positions * (self.scaling * np.array([fx, fy]))).astype(np.int32)
+
+    def draw_edges(self, points, shape, length_factor=1.0, edges=None, lod=None):
+        """
+        Draw the coverage of the edges: 0 where there is no edge, 255 where the edge color replaces the image,
+        in between on the anti-aliased borders.
+        With a lower level of detail, the edges shorter than edge_lod_min_length pixels are dropped (found in the
+        spatial index of the graph). Above edge_lod_max_lines edges, the edges are drawn as a texture of their
+        density. Otherwise the edges covering the same pixels as another one are dropped, and the others are drawn as
+        1 pixel anti-aliased lines above edge_lod_thin_lines edges. The time of the drawing then does not grow with
+        the number of edges.
+
+        Parameters:
+            points: scaled coordinates of the nodes
+            shape: (height, width) of the drawing
+            length_factor: factor applied to the thickness of the edges
+            edges: indices of the edges to draw (None = all the edges)
+            lod: (fx, fy) size factors of the drawing (see get_size_factors) to draw all the edges with a lower level
+                of detail (e.g. for the preview), None to draw every edge
+
+        Returns:
+            np.ndarray (height, width) uint8
+        """
+        thickness = self.scale_length(self.edge_style['thickness'], length_factor)
+        line_type = self.edge_style['lineType']
+        if lod is not None and edges is None:
+            fx, fy = lod
+            # the spatial index is in the coordinates of the gxl file
+            pixel_size = 1 / max(self.scaling * max(fx, fy), 1e-9)
+            edges = self.graph.spatial_index.get_long_edges(edge_lod_min_length * pixel_size)
+            stats.count('lod_edges', len(edges))
+            if len(edges) > edge_lod_max_lines:
+                return self.draw_edge_texture(shape, fx, fy)
+            edges = self.merge_duplicate_edges(points, edges)
+            if len(edges) > edge_lod_thin_lines:
+                thickness, line_type = 1, cv2.LINE_AA
+        coverage = np.zeros(shape, dtype=np.uint8)
+        edge_nodes = self.graph.edges if edges is None else self.graph.edges[edges]
+        if len(edge_nodes) > 0:
+            # every edge is a polyline of 2 points -> (E, 2, 2), drawn by a single opencv call
+            cv2.polylines(coverage, points[edge_nodes], isClosed=False, color=255, thickness=thickness,
+                          lineType=line_type)
+        return coverage
+
+    def drop_short_edges(self, points, edges=None) -> np.ndarray:
         """
-        Draw the graph (nodes + edges) on the image.
+        Drop the edges shorter than edge_lod_min_length pixels along x and y (hidden by their nodes)
+
+        Parameters:
+            points: scaled coordinates of the nodes
+            edges: indices of the edges (None = all the edges)
 
         Returns:
-            image with the graph drawn
+            np.ndarray increasing indices of the kept edges
+        """
+        edge_nodes = self.graph.edges if edges is None else self.graph.edges[edges]
+        delta = np.abs(points[edge_nodes[:, 1]] - points[edge_nodes[:, 0]])
+        long = np.flatnonzero((delta[:, 0] >= edge_lod_min_length) | (delta[:, 1] >= edge_lod_min_length))
+        return long if edges is None else np.asarray(edges)[long]
+
+    def merge_duplicate_edges(self, points, edges) -> np.ndarray:
         """
-        img = self.img
-        points = {i: tuple([int(x_y[0] * self.scaling), int(x_y[1] * self.scaling)]) for i, x_y in
-                  enumerate(self.graph.node_positions)}
+        Keep a single edge per segment of the drawing (the edges whose ends fall on the same pixels, in either
+        direction)
 
-        # draw the edges
-        for edge in self.graph.edges:
-            pt1, pt2 = (points[edge[0]], points[edge[1]])
-            img = cv2.line(img, pt1, pt2, color=self.edge_style['color'], thickness=self.edge_style['thickness'],
-                           lineType=self.edge_style['lineType'])
+        Parameters:
+            points: scaled coordinates of the nodes
+            edges: indices of the edges
 
-        # draw the points (according to the type, if applicable)
-        if self.color_by_feature:
-            for feature, (i, point) in zip(self.graph.color_by_features, points.items()):
-                img = cv2.circle(img, point, radius=self.node_style[feature]['radius'],
-                                 color=self.node_style[feature]['color'],
-                                 thickness=self.node_style['thickness'])
+        Returns:
+            np.ndarray increasing indices of the kept edges
+        """
+        edges = np.asarray(edges)
+        if len(edges) == 0:
+            return edges
+        ends = points[self.graph.edges[edges]]  # (E, 2, 2)
+        if ends.min() >= -(1 << 15) and ends.max() < (1 << 15):
+            # 16 bits per coordinate -> one integer per end, the smallest end first -> one integer per segment
+            packed = ends.astype(np.int64) + (1 << 15)
+            end_keys = (packed[..., 0] << 16) | packed[..., 1]
+            keys = (end_keys.min(axis=1) << 32) | end_keys.max(axis=1)
         else:
-            # default = {'color': (47, 130, 224, 255), 'radius': 20, 'thickness': -1}
-            for i, point in points.items():
-                img = cv2.circle(img, point, radius=self.node_style[self.current_node]['radius'],
-                                 color=self.node_style[self.current_node]['color'],
-                                 thickness=self.node_style['thickness'])
+            # the 2 int32 coordinates of an end as one int64, the smallest end first -> 16 bytes per segment
+            end_keys = np.sort(np.ascontiguousarray(ends, dtype=np.int32).view(np.int64).reshape(-1, 2), axis=1)
+            keys = end_keys.view(np.dtype((np.void, 16))).ravel()
+        _, first = np.unique(keys, return_index=True)
+        return edges[np.sort(first)]
+
+    def draw_edge_texture(self, shape, fx, fy) -> np.ndarray:
+        """
+        Draw the coverage of all the edges as a texture of their density: the edge texture of the spatial index
+        (number of ends and middles of edges per cell, computed once) is resampled to the pixels of the drawing and
+        slightly smoothed, the cost only depends on the size of the drawing
+
+        Parameters:
+            shape: (height, width) of the drawing
+            fx, fy: size factors of the drawing (see get_size_factors)
+
+        Returns:
+            np.ndarray (height, width) uint8
+        """
+        height, width = shape
+        counts, x0, y0, cell = self.graph.spatial_index.get_edge_texture()
+        rows, columns = counts.shape
+        # the cells of the texture in pixels of the drawing
+        scale_x, scale_y = self.scaling * fx, self.scaling * fy
+        resized_width = max(1, int(round(columns * cell * scale_x)))
+        resized_height = max(1, int(round(rows * cell * scale_y)))
+        # INTER_AREA averages the cells covering a pixel -> times the number of cells per pixel to get counts
+        resized = cv2.resize(counts, (resized_width, resized_height), interpolation=cv2.INTER_AREA)
+        resized *= (rows * columns) / (resized_width * resized_height)
+
+        texture = np.zeros(shape, dtype=np.float32)
+        left, top = int(x0 * scale_x), int(y0 * scale_y)
+        x_from, y_from = max(0, -left), max(0, -top)
+        x_to, y_to = min(resized_width, width - left), min(resized_height, height - top)
+        if x_from < x_to and y_from < y_to:
+            texture[top + y_from:top + y_to, left + x_from:left + x_to] = resized[y_from:y_to, x_from:x_to]
+        texture = cv2.GaussianBlur(texture, (0, 0), 0.7)
+        return np.clip(texture * 255, 0, 255, out=texture).astype(np.uint8)
+
+    def get_node_radii(self, length_factor=1.0) -> np.ndarray:
+        """
+        Get the radius of every node in pixels of the drawing
+
+        Parameters:
+            length_factor: factor applied to the radii
+
+        Returns:
+            np.ndarray (N,) int32
+        """
+        styles, style_ids = self.get_node_styles()
+        return np.array([self.scale_length(self.node_style.get(style, default_node_style)['radius'], length_factor)
+                         for style in styles], dtype=np.int32)[style_ids]
+
+    def get_color_mapping(self) -> ColorMapping:
+        """
+        Get the colors of the values of color_by_feature in the colormap (computed once per feature)
+
+        Returns:
+            ColorMapping (see color_map.map_values), None if the nodes are not colored by a feature
+        """
+        if not self.color_by_feature:
+            return None
+        if self._color_mapping is None:
+            self._color_mapping = map_values(self.graph.get_node_feature_values(self.color_by_feature), node_colormap)
+        return self._color_mapping
+
+    def is_styled_by_feature(self, mapping) -> bool:
+        """
+        Check if every category of color_by_feature has its own style in node_style (e.g. the node types), otherwise
+        the nodes are colored with the colormap
+        """
+        return mapping.categories is not None and \
+            all(isinstance(self.node_style.get(category), dict) for category in mapping.categories.tolist())
+
+    def get_node_styles(self) -> tuple:
+        """
+        Get the style of every node: the style of its category of color_by_feature if they all have one, otherwise
+        the style of current_node
 
+        Returns:
+            tuple ([str], np.ndarray)
+            style names and index of the style of every node
+        """
+        mapping = self.get_color_mapping()
+        if mapping is not None and self.is_styled_by_feature(mapping):
+            return mapping.categories.tolist(), mapping.inverse
+        return [self.current_node], np.zeros(self.graph.nb_of_nodes, dtype=np.intp)
+
+    def draw_nodes(self, points, shape, length_factor=1.0, nodes=None):
+        """
+        Draw the nodes as an index image: 0 where there is no node, otherwise the index (+ 1) of the node on top.
+        Nodes sharing the same radius are drawn together, by stamping a pre-rasterized circle on all their centers
+        at once for small circles, and with opencv for bigger ones.
+
+        Parameters:
+            points: scaled coordinates of the nodes
+            shape: (height, width) of the drawing
+            length_factor: factor applied to the radius and thickness of the nodes
+            nodes: increasing indices of the nodes to draw (None = all the nodes)
+
+        Returns:
+            np.ndarray (height, width) int32
+        """
+        node_radii = self.get_node_radii(length_factor)
+        thickness = self.scale_length(self.node_style['thickness'], length_factor)
+        if nodes is None:
+            nodes = np.arange(len(node_radii))
+
+        height, width = shape
+        top_node = None
+        all_nodes = nodes
+        for radius in np.unique(node_radii[all_nodes]).tolist():
+            nodes = all_nodes[node_radii[all_nodes] == radius]
+            dy, dx = circle_sprite(radius, thickness)
+            if len(dy) <= self.max_sprite_size:
+                layer = self.stamp_nodes(nodes, points, dy, dx, (height, width))
+            else:
+                layer = np.zeros((height, width), dtype=np.int32)
+                for node, point in zip(nodes.tolist(), points[nodes].tolist()):
+                    cv2.circle(layer, tuple(point), radius=radius, color=node + 1, thickness=thickness)
+            # the node with the highest index is on top (same order as drawing them one after the other)
+            top_node = layer if top_node is None else np.maximum(top_node, layer, out=top_node)
+
+        if top_node is None:
+            top_node = np.zeros((height, width), dtype=np.int32)
+        return top_node
+
+    def stamp_nodes(self, nodes, points, dy, dx, shape) -> np.ndarray:
+        """
+        Stamp the pixels of a circle sprite on the centers of the given nodes
+
+        Parameters:
+            nodes: indices of the nodes (increasing)
+            points: scaled coordinates of the nodes
+            dy, dx: row and column offsets of the pixels of the sprite
+            shape: (height, width) of the image
+
+        Returns:
+            np.ndarray (height, width) int32, index (+ 1) of the node on top of every pixel, 0 if there is none
+        """
+        height, width = shape
+        # one extra pixel collects the parts of the sprites outside of the image
+        layer = np.zeros(height * width + 1, dtype=np.int32)
+        offsets = dy.astype(np.int64) * width + dx
+        margin = max(np.abs(dy).max(), np.abs(dx).max())
+        chunk = max(1, self.stamp_chunk_size // len(offsets))
+        for i in range(0, len(nodes), chunk):
+            chunk_nodes = nodes[i:i + chunk]
+            xs, ys = points[chunk_nodes, 0].astype(np.int64), points[chunk_nodes, 1].astype(np.int64)
+            pixels = (ys * width + xs)[:, None] + offsets
+            border = (xs < margin) | (xs >= width - margin) | (ys < margin) | (ys >= height - margin)
+            if border.any():
+                outside = ((ys[border, None] + dy < 0) | (ys[border, None] + dy >= height) |
+                           (xs[border, None] + dx < 0) | (xs[border, None] + dx >= width))
+                pixels[border] = np.where(outside, height * width, pixels[border])
+            # the nodes are in increasing order -> the last write on a pixel is the node on top. Numpy does not
+            # define which write wins for repeated indices, the last one of every pixel is the first one of the
+            # reversed pixels (np.unique keeps the first occurrence)
+            reversed_pixels = pixels.ravel()[::-1]
+            top_pixels, first = np.unique(reversed_pixels, return_index=True)
+            layer[top_pixels] = (chunk_nodes[::-1] + 1)[first // len(offsets)]
+        return layer[:-1].reshape(height, width)
+
+    def get_node_colors(self) -> np.ndarray:
+        """
+        Get the color of every node, in the channel order of the style colors (RGBA, as the drawing)
+
+        Returns:
+            np.ndarray (N + 1, 4) uint8, the first row (no node) is not used
+        """
+        mapping = self.get_color_mapping()
+        node_colors = np.zeros((self.graph.nb_of_nodes + 1, 4), dtype=np.uint8)
+        if mapping is not None and not self.is_styled_by_feature(mapping):
+            # the lookup table is RGBA like the style colors, a single gather for all the nodes
+            node_colors[1:] = get_lut(node_colormap)[mapping.codes]
+            return node_colors
+        styles, style_ids = self.get_node_styles()
+        palette = np.array([to_rgba(self.node_style.get(style, default_node_style)['color']) for style in styles],
+                           dtype=np.uint8)
+        node_colors[1:] = palette[style_ids]
+        return node_colors
+
+    def get_legend(self) -> list:
+        """
+        Get the legend of the node colors when the nodes are colored by a feature, or of the heatmap
+
+        Returns:
+            list of (label, RGBA color), empty if the nodes are not colored by a feature
+        """
+        if self.render_mode == 'density':
+            lut = get_lut(density_colormap)
+            norm = self.get_density_norm()
+            # nodes (or weights) per 100 x 100 pixels of the full resolution
+            return [(f'{value * norm * 1e4:.3g} per 100x100 px', tuple(lut[min(int(value * 255), 255)].tolist()))
+                    for value in np.linspace(0, 1, 5).tolist()]
+        mapping = self.get_color_mapping()
+        if mapping is None:
+            return []
+        if self.is_styled_by_feature(mapping):
+            return [(str(category), tuple(self.node_style[category]['color']))
+                    for category in mapping.categories.tolist()]
+        return mapping.legend
+
+    def get_image(self):
+        """
+        Draw the graph (nodes + edges) on the image. Only the layers whose parameters changed are redrawn.
+
+        Returns:
+            image with the graph drawn (cached, it should not be modified)
+        """
+        return self.render()
+
+    def get_preview(self, size):
+        """
+        Draw the graph on the image downsampled to the given size. The coordinates, radii and thicknesses are
+        mapped to that size, such that the cost does not depend on the size of the image.
+
+        Parameters:
+            size: (width, height) of the preview
+
+        Returns:
+            image with the graph drawn (cached, it should not be modified)
+        """
+        height, width = self._img.shape[:2]
+        size = tuple(size)
+        if size == (width, height):
+            return self.render()
+        # only the layers of the last preview size are kept (the tile layers are kept by scale)
+        for key in [key for key in self._layers if key[0] not in ('pyramid', 'tile_points') and
+                    key[1] not in (None, size)]:
+            del self._layers[key]
+        return self.render(size)
+
+    def render(self, size=None):
+        """
+        Composite the layers of the given size, only the layers whose parameters changed are redrawn
+
+        Parameters:
+            size: (width, height) of the drawing, None for the size of the image
+
+        Returns:
+            image with the graph drawn (cached, it should not be modified)
+        """
+        if ('composite', size) in self._layers:
+            return self._layers[('composite', size)]
+
+        background = self.get_background(size)
+        if self.render_mode == 'density':
+            if ('density', size) not in self._layers:
+                fx, fy, length_factor = self.get_size_factors(size)
+                with stats.stage('draw_density'):
+                    self._layers[('density', size)] = self.draw_density(self.get_points(size), background.shape[:2],
+                                                                        fx * fy, length_factor)
+            img = self.blend_density(background, self._layers[('density', size)])
+            self._layers[('composite', size)] = img
+            return img
+
+        if ('edges', size) not in self._layers or ('nodes', size) not in self._layers:
+            _, _, length_factor = self.get_size_factors(size)
+            points = self.get_points(size)
+            if ('edges', size) not in self._layers:
+                with stats.stage('draw_edges'):
+                    # the previews are drawn with a lower level of detail, the full resolution (e.g. saved) is exact
+                    lod = self.get_size_factors(size)[:2] if edge_lod and size is not None else None
+                    self._layers[('edges', size)] = self.draw_edges(points, background.shape[:2], length_factor,
+                                                                    lod=lod)
+            if ('nodes', size) not in self._layers:
+                with stats.stage('draw_nodes'):
+                    self._layers[('nodes', size)] = self.draw_nodes(points, background.shape[:2], length_factor)
+
+        # the blended edges are kept, such that a change of the node colors only repaints the nodes
+        with stats.stage('composite'):
+            if ('edge_blend', size) not in self._layers:
+                self._layers[('edge_blend', size)] = self.blend_edges(background, self._layers[('edges', size)])
+            img = self._layers[('edge_blend', size)].copy()
+            self.paint_nodes(img, self._layers[('nodes', size)])
+        self._layers[('composite', size)] = img
+        return img
+
+    def composite(self, background, coverage, top_node) -> np.ndarray:
+        """
+        Blend the edges and the nodes with the background
+
+        Parameters:
+            background: BGRA background (see get_background)
+            coverage: coverage of the edges (see draw_edges)
+            top_node: index image of the nodes (see draw_nodes)
+
+        Returns:
+            np.ndarray (height, width, 4) uint8
+        """
+        with stats.stage('composite'):
+            img = self.blend_edges(background, coverage)
+            self.paint_nodes(img, top_node)
+        return img
+
+    def blend_edges(self, background, coverage) -> np.ndarray:
+        """
+        Blend the edge color with the background according to the coverage of the edges. Only the covered pixels
+        are written: the fully covered pixels get the edge color, the anti-aliased borders are blended.
+
+        Parameters:
+            background: BGRA background (see get_background)
+            coverage: coverage of the edges (see draw_edges)
+
+        Returns:
+            np.ndarray (height, width, 4) uint8, a copy of the background
+        """
+        img = background.copy()
+        color = to_rgba(self.edge_style['color'])
+        coverage = coverage.ravel()
+        pixels = img.reshape(-1, 4)
+        # the 4 channels of a pixel as one integer -> one write per pixel
+        np.copyto(pixels.view(np.uint32)[:, 0], color.view(np.uint32)[0], where=coverage == 255)
+        border = np.flatnonzero((coverage - np.uint8(1)) < 254)
+        if len(border) > 0:
+            alpha = cv2.merge([coverage[border]] * 4).reshape(-1, 4)
+            colors = np.empty_like(alpha)
+            colors[:] = color
+            pixels[border] = cv2.add(cv2.multiply(pixels[border], cv2.bitwise_not(alpha), scale=1 / 255),
+                                     cv2.multiply(colors, alpha, scale=1 / 255))
         return img
 
-    def save(self, output_path: str):
+    def paint_nodes(self, img, top_node):
+        """
+        Write the color of the node on top of every pixel of the node layer, in place. Only the bounding box of the
+        drawn nodes is written.
+
+        Parameters:
+            img: (height, width, 4) uint8 image
+            top_node: index image of the nodes (see draw_nodes)
+        """
+        rows = np.flatnonzero(top_node.any(axis=1))
+        if len(rows) == 0:
+            return
+        columns = np.flatnonzero(top_node[rows[0]:rows[-1] + 1].any(axis=0))
+        box = (slice(rows[0], rows[-1] + 1), slice(columns[0], columns[-1] + 1))
+        window = top_node[box]
+        # palette lookup of the 4 channels of a pixel as one integer
+        colors = self.get_node_colors().view(np.uint32)[:, 0]
+        np.copyto(img.view(np.uint32)[..., 0][box], colors[window], where=window > 0)
+
+    def get_level(self, scale) -> np.ndarray:
+        """
+        Get the background at a scale of the full resolution (a level of the tile pyramid), the levels are kept
+        until the image or the transparency change. Only the scales up to img_scale have a level, the tiles of
+        bigger scales are interpolated from the image (see render_tile).
+
+        Parameters:
+            scale: scale of the level compared to the full resolution (<= img_scale)
+
+        Returns:
+            np.ndarray (height, width, 4) uint8 BGRA
+        """
+        if ('pyramid', scale) not in self._layers:
+            full_width, full_height = self.full_size
+            size = (max(1, round(full_width * scale)), max(1, round(full_height * scale)))
+            img = self._img
+            if size != (img.shape[1], img.shape[0]):
+                with stats.stage('resize'):
+                    img = cv2.resize(img, size, interpolation=cv2.INTER_AREA)
+            with stats.stage('convert'):
+                bgra = cv2.cvtColor(img, cv2.COLOR_RGB2BGRA)
+                bgra[..., 3] = self.transparency
+            self._layers[('pyramid', scale)] = bgra
+        return self._layers[('pyramid', scale)]
+
+    def render_tile(self, scale, x, y, width, height) -> np.ndarray:
         """
-        Save the image into the output path given
+        Draw a part of the drawing at a scale of the full resolution. Only the edges and the nodes whose bounding box
+        intersects the tile are drawn, such that the cost depends on the size of the tile and not of the image.
+
+        Parameters:
+            scale: scale of the drawing compared to the full resolution of the image (e.g. 0.5, 1, 4)
+            x, y: top left corner of the tile in pixels of the drawing at that scale
+            width, height: size of the tile, it is cropped at the border of the drawing
+
+        Returns:
+            np.ndarray (height, width, 4) uint8, empty if the tile is outside of the drawing
+        """
+        full_width, full_height = self.full_size
+        level_width, level_height = round(full_width * scale), round(full_height * scale)
+        width = max(0, min(width, level_width - x))
+        height = max(0, min(height, level_height - y))
+        if width == 0 or height == 0:
+            return np.zeros((height, width, 4), dtype=np.uint8)
+
+        if scale <= self.img_scale:
+            background = self.get_level(scale)[y:y + height, x:x + width]
+        else:
+            # magnified: only the pixels of the tile are interpolated from the image
+            factor = scale / self.img_scale
+            with stats.stage('resize'):
+                img = cv2.warpAffine(self._img, np.float32([[factor, 0, -x], [0, factor, -y]]), (width, height),
+                                     flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE)
+            with stats.stage('convert'):
+                background = cv2.cvtColor(img, cv2.COLOR_RGB2BGRA)
+                background[..., 3] = self.transparency
+
+        # coordinates of the nodes in the tile
+        if ('tile_points', scale) not in self._layers:
+            self._layers[('tile_points', scale)] = (self.graph.node_positions * (self.scaling * scale)).astype(np.int32)
+        if self.render_mode == 'density':
+            with stats.stage('draw_density'):
+                density = self.draw_tile_density(self._layers[('tile_points', scale)], scale, x, y, width, height,
+                                                 level_width, level_height)
+            return self.blend_density(background, density)
+        points = self._layers[('tile_points', scale)] - np.array([x, y], dtype=np.int32)
+
+        nodes, edges = self.get_tile_elements(points, width, height, scale, origin=(x, y))
+        if edge_lod and scale < 1:
+            # the tiles draw few edges and must match across their borders -> only the short and the duplicated
+            # edges are dropped
+            edges = self.merge_duplicate_edges(points, self.drop_short_edges(points, edges))
+        with stats.stage('draw_edges'):
+            coverage = self.draw_tile_edges(points, edges, (height, width), (-x, -y, level_width - x, level_height - y),
+                                            scale)
+        with stats.stage('draw_nodes'):
+            top_node = self.draw_nodes(points, (height, width), scale, nodes=nodes)
+        return self.composite(background, coverage, top_node)
+
+    def draw_tile_edges(self, points, edges, shape, extent, length_factor) -> np.ndarray:
+        """
+        Draw the coverage of the edges of a tile, on a drawing covering the cells of a grid of edge_cell_size pixels
+        around the tile (whatever the length of the edges). opencv rasterizes a line from its ends, so the edges are
+        cut where they cross the lines of the grid and at the border of the image: every tile draws the same pieces
+        of an edge (the ends of the pieces are passed with sub-pixel precision), and the tiles match the image drawn
+        at once.
+
+        Parameters:
+            points: coordinates of the nodes relative to the top left corner of the tile
+            edges: indices of the edges to draw
+            shape: (height, width) of the tile
+            extent: (left, top, right, bottom) border of the image relative to the top left corner of the tile
+            length_factor: factor applied to the thickness of the edges
+
+        Returns:
+            np.ndarray (height, width) uint8
+        """
+        height, width = shape
+        if len(edges) == 0:
+            return np.zeros(shape, dtype=np.uint8)
+        thickness = self.scale_length(self.edge_style['thickness'], length_factor)
+        margin = thickness + 2
+        cell = self.edge_cell_size
+        # cells of the grid (aligned on the top left corner of the image) within the margin of the tile, in the image
+        x, y = -extent[0], -extent[1]
+        left, top = max((x - margin) // cell * cell, 0) - x, max((y - margin) // cell * cell, 0) - y
+        right = min(-(-(x + width + margin) // cell) * cell - x, extent[2])
+        bottom = min(-(-(y + height + margin) // cell) * cell - y, extent[3])
+
+        ends = points[self.graph.edges[edges]].astype(np.float64)  # (E, 2, 2)
+        start, delta = ends[:, 0], ends[:, 1] - ends[:, 0]
+        # Liang-Barsky: part [t0, t1] of every edge inside the cells, then the crossings of the lines of the grid
+        t0, t1 = np.zeros(len(ends)), np.ones(len(ends))
+        crossings = []
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for axis, low, high in ((0, left, right), (1, top, bottom)):
+                t_low, t_high = (low - start[:, axis]) / delta[:, axis], (high - start[:, axis]) / delta[:, axis]
+                # edges parallel to the axis are inside or outside along the whole edge
+                parallel = delta[:, axis] == 0
+                inside = (start[:, axis] >= low) & (start[:, axis] <= high)
+                t0 = np.where(parallel, np.where(inside, t0, 1.0), np.maximum(t0, np.minimum(t_low, t_high)))
+                t1 = np.where(parallel, np.where(inside, t1, 0.0), np.minimum(t1, np.maximum(t_low, t_high)))
+                grid = np.arange(low + cell, high, cell, dtype=np.float64)
+                crossings.append((grid - start[:, axis, None]) / delta[:, axis, None])
+        # ends of the pieces, the crossings outside of [t0, t1] become empty pieces
+        cuts = np.concatenate([t0[:, None], t1[:, None], *crossings], axis=1)
+        cuts = np.sort(np.where((cuts >= t0[:, None]) & (cuts <= t1[:, None]), cuts, t1[:, None]), axis=1)
+        first, last = cuts[:, :-1], cuts[:, 1:]
+        pieces = np.flatnonzero((last > first).ravel())
+        edge_of_piece = pieces // first.shape[1]
+        segments = np.stack([start[edge_of_piece] + first.ravel()[pieces, None] * delta[edge_of_piece],
+                             start[edge_of_piece] + last.ravel()[pieces, None] * delta[edge_of_piece]], axis=1)
+
+        # the drawing covers the pieces and their thickness, such that opencv does not cut them again
+        coverage = np.zeros((bottom - top + 2 * margin, right - left + 2 * margin), dtype=np.uint8)
+        if len(segments) > 0:
+            segments -= np.array([left - margin, top - margin], dtype=np.float64)
+            cv2.polylines(coverage, np.round(segments * (1 << self.edge_shift)).astype(np.int32), isClosed=False,
+                          color=255, thickness=thickness, lineType=self.edge_style['lineType'], shift=self.edge_shift)
+        return coverage[margin - top:margin - top + height, margin - left:margin - left + width]
+
+    def get_tile_elements(self, points, width, height, length_factor, origin=(0, 0)) -> tuple:
+        """
+        Find the nodes and the edges whose bounding box intersects a tile. The candidates are taken from the spatial
+        index of the graph, such that the cost depends on the number of elements in the tile.
+
+        Parameters:
+            points: coordinates of the nodes relative to the top left corner of the tile
+            width, height: size of the tile
+            length_factor: factor applied to the radius of the nodes and the thickness of the edges
+            origin: (x, y) top left corner of the tile in the drawing at length_factor
+
+        Returns:
+            tuple (np.ndarray, np.ndarray)
+            increasing indices of the nodes and of the edges
+        """
+        node_radii = self.get_node_radii(length_factor)
+        thickness = max(self.scale_length(self.node_style['thickness'], length_factor), 0) + 1
+        half_thickness = self.scale_length(self.edge_style['thickness'], length_factor) // 2 + 1
+        factor = self.scaling * length_factor
+        if factor > 0:
+            # rectangle of the tile in the coordinates of the gxl file (+ 1 pixel lost when truncating the points)
+            rect = ((origin[0] - 1) / factor, (origin[1] - 1) / factor, (origin[0] + width + 1) / factor,
+                    (origin[1] + height + 1) / factor)
+            index = self.graph.spatial_index
+            nodes = index.query_nodes(*rect, margin=(int(node_radii.max(initial=0)) + thickness) / factor)
+            edges = index.query_edges(*rect, margin=half_thickness / factor)
+        else:
+            nodes, edges = np.arange(self.graph.nb_of_nodes), np.arange(self.graph.nb_of_edges)
+        margin = node_radii[nodes] + thickness
+        xs, ys = points[nodes, 0], points[nodes, 1]
+        nodes = nodes[(xs + margin >= 0) & (xs - margin < width) & (ys + margin >= 0) & (ys - margin < height)]
+
+        ends = points[self.graph.edges[edges]]  # (E, 2, 2)
+        low, high = ends.min(axis=1) - half_thickness, ends.max(axis=1) + half_thickness
+        edges = edges[(high[:, 0] >= 0) & (low[:, 0] < width) & (high[:, 1] >= 0) & (low[:, 1] < height)]
+        return nodes, edges
+
+    def get_density_selection(self) -> tuple:
+        """
+        Get the nodes of the heatmap (density_class) and their weights (density_weight), computed once
+
+        Returns:
+            tuple (np.ndarray, np.ndarray)
+            increasing indices of the nodes (None = all the nodes), float64 weights of the nodes (None = 1)
+        """
+        if self._density_selection is None:
+            nodes = None
+            if self.density_class is not None:
+                mapping = self.get_color_mapping()
+                if mapping is None:
+                    raise ValueError('A density class needs a feature to color by')
+                if mapping.categories is not None:
+                    # the class given by the user is a string
+                    matches = [i for i, category in enumerate(mapping.categories.tolist())
+                               if str(category) == str(self.density_class)]
+                    nodes = np.flatnonzero(np.isin(mapping.inverse, matches))
+                else:
+                    values = self.graph.get_node_feature_values(self.color_by_feature)
+                    nodes = np.flatnonzero(values.astype(str) == str(self.density_class))
+            weights = None
+            if self.density_weight is not None:
+                try:
+                    weights = np.asarray(self.graph.get_node_feature_values(self.density_weight), dtype=np.float64)
+                except ValueError:
+                    raise ValueError(f'The feature {self.density_weight} is not numeric, it cannot weight the nodes')
+            self._density_selection = (nodes, weights)
+        return self._density_selection
+
+    def draw_density(self, points, shape, area_factor, length_factor, nodes=None, norm=True) -> np.ndarray:
+        """
+        Draw the heatmap of the nodes: histogram of the nodes over the pixels, smoothed by a gaussian of density_sigma
+        pixels of the full resolution. The cost of the smoothing depends on the number of pixels only.
+
+        Parameters:
+            points: scaled coordinates of the nodes
+            shape: (height, width) of the drawing
+            area_factor: area of a pixel of the full resolution in pixels of the drawing (e.g. scale ** 2)
+            length_factor: factor applied to density_sigma
+            nodes: indices of the nodes which can be in the drawing (None = all the nodes)
+            norm: map the density to 0-255 (see get_density_norm), otherwise return the density
+
+        Returns:
+            np.ndarray (height, width) uint8 (float32 density in nodes per pixel of the full resolution if not norm)
+        """
+        height, width = shape
+        selected, weights = self.get_density_selection()
+        if nodes is None:
+            nodes = selected
+        elif selected is not None:
+            nodes = nodes[np.isin(nodes, selected, assume_unique=True)]
+        if nodes is not None:
+            points = points[nodes]
+            weights = weights[nodes] if weights is not None else None
+
+        xs, ys = points[:, 0], points[:, 1]
+        inside = (xs >= 0) & (xs < width) & (ys >= 0) & (ys < height)
+        pixels = ys[inside].astype(np.int64) * width + xs[inside]
+        histogram = np.bincount(pixels, weights=weights[inside] if weights is not None else None,
+                                minlength=height * width).astype(np.float32).reshape(height, width)
+        # nodes per pixel of the drawing -> nodes per pixel of the full resolution
+        histogram *= area_factor
+        density = cv2.GaussianBlur(histogram, (0, 0), max(density_sigma * length_factor, 0.5),
+                                   borderType=cv2.BORDER_CONSTANT)
+        if not norm:
+            return density
+        density *= 255 / self.get_density_norm()
+        return np.clip(density, 0, 255, out=density).astype(np.uint8)
+
+    def draw_tile_density(self, points, scale, x, y, width, height, level_width, level_height) -> np.ndarray:
+        """
+        Draw the heatmap of a tile. The histogram is drawn on the tile enlarged by 3 sigmas (within the drawing),
+        such that the smoothing matches the heatmap of the whole drawing.
+
+        Parameters:
+            points: coordinates of the nodes in the drawing at that scale
+            scale: scale of the drawing compared to the full resolution
+            x, y, width, height: tile in pixels of the drawing
+            level_width, level_height: size of the drawing
+
+        Returns:
+            np.ndarray (height, width) uint8
+        """
+        margin = math.ceil(3 * max(density_sigma * scale, 0.5)) + 1
+        left, top = max(x - margin, 0), max(y - margin, 0)
+        right, bottom = min(x + width + margin, level_width), min(y + height + margin, level_height)
+        factor = self.scaling * scale
+        nodes = self.graph.spatial_index.query_nodes((left - 1) / factor, (top - 1) / factor, (right + 1) / factor,
+                                                     (bottom + 1) / factor) if factor > 0 else None
+        density = self.draw_density(points - np.array([left, top], dtype=np.int32), (bottom - top, right - left),
+                                    scale ** 2, scale, nodes=nodes)
+        return density[y - top:y - top + height, x - left:x - left + width]
+
+    def get_density_norm(self) -> float:
+        """
+        Get the density mapped to the last color of density_colormap: the density_percentile percentile of the
+        density of the whole image, drawn at most density_reference_size pixels wide. The density is in nodes per
+        pixel of the full resolution, such that the preview, the tiles and the saved image share the same colors.
+
+        Returns:
+            float
+        """
+        if self._density_norm is None:
+            full_width, full_height = self.full_size
+            scale = min(1.0, density_reference_size / max(full_width, full_height))
+            size = (max(1, round(full_width * scale)), max(1, round(full_height * scale)))
+            points = (self.graph.node_positions * (self.scaling * scale)).astype(np.int32)
+            density = self.draw_density(points, (size[1], size[0]), scale ** 2, scale, norm=False)
+            positive = density[density > 0]
+            self._density_norm = float(np.percentile(positive, density_percentile)) if len(positive) > 0 else 1.0
+        return self._density_norm
+
+    def blend_density(self, background, density) -> np.ndarray:
+        """
+        Color the heatmap with density_colormap and blend it with the background, the pixels without nodes show the
+        background
+
+        Parameters:
+            background: BGRA background (see get_background)
+            density: heatmap (see draw_density)
+
+        Returns:
+            np.ndarray (height, width, 4) uint8
+        """
+        with stats.stage('composite'):
+            # the lookup table is RGBA like the drawing
+            color = get_lut(density_colormap)[density]
+            coverage = cv2.merge([cv2.multiply(density, density_opacity / 255)] * 4)
+            return cv2.add(cv2.multiply(background, cv2.bitwise_not(coverage), scale=1 / 255),
+                           cv2.multiply(color, coverage, scale=1 / 255))
+
+    def save(self, output_path: str, verbose: bool = True, encoding: EncodeOptions = None) -> str:
+        """
+        Save the image into the output path given (at the resolution of the image given to the drawer)
 
         Parameters:
             output_path: path to the output directory
+            verbose: print the path of the saved image
+            encoding: format, quality and maximal size of the saved image (None = full size png)
+
+        Returns:
+            path to the saved image
         """
-        output_file = os.path.join(output_path, f'{self.id}-vis.png')
-        cv2.imwrite(output_file, cv2.cvtColor(self.get_image(), cv2.COLOR_RGB2BGRA))
-        print(f'Visualization saved to {output_file}')
+        output_file = os.path.join(output_path, f'{self.id}-vis.{extension(encoding)}')
+        write_image(self.get_image(), output_file, encoding)
+        if verbose:
+            print(f'Visualization saved to {output_file}')
+        return output_file
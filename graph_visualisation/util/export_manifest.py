@@ -0,0 +1,172 @@
+import os
+import json
+import hashlib
+import tempfile
+
+from util.image_encoder import EncodeOptions, extension
+
+# keys of the style changing the drawn images
+style_keys = ('color_by_feature', 'current_node', 'density_class', 'density_weight', 'edge_style', 'node_style',
+              'render_mode', 'scaling', 'transparency')
+
+
+def output_filename(gxl_filepath: str, encoding: EncodeOptions = None) -> str:
+    """
+    Get the name of the image saved for a gxl file (see GraphDrawer.save)
+
+    Parameters:
+        gxl_filepath: path to the gxl file
+        encoding: options of the saved image (None = default options)
+
+    Returns:
+        file name of the image, without directory
+    """
+    return f'{os.path.basename(gxl_filepath)[:-4]}-vis.{extension(encoding)}'
+
+
+def style_hash(style: dict) -> str:
+    """
+    Get a hash of a style which does not depend on the order of its keys or on tuples vs lists
+
+    Parameters:
+        style: style of the drawing (see batch_render.load_style)
+
+    Returns:
+        hexadecimal sha1 of the style
+    """
+    canonical = json.dumps({key: style.get(key) for key in style_keys}, sort_keys=True, default=str)
+    return hashlib.sha1(canonical.encode('utf-8')).hexdigest()
+
+
+def file_signature(filepath: str, previous: dict = None) -> dict:
+    """
+    Get the size, the modification time and the sha1 of a file. The content is only read if the size or the
+    modification time differ from a previous signature.
+
+    Parameters:
+        filepath: path to the file
+        previous: previous signature of the file (optional)
+
+    Returns:
+        dict with the name, size, mtime_ns and sha1 of the file
+    """
+    stat = os.stat(filepath)
+    signature = {'name': os.path.basename(filepath), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+    if previous is not None and all(previous.get(k) == v for k, v in signature.items()):
+        signature['sha1'] = previous['sha1']
+        return signature
+
+    sha1 = hashlib.sha1()
+    with open(filepath, 'rb') as f:
+        for block in iter(lambda: f.read(1024 ** 2), b''):
+            sha1.update(block)
+    signature['sha1'] = sha1.hexdigest()
+    return signature
+
+
+def input_signature(gxl_filepath: str, img_filepath: str = None) -> dict:
+    """
+    Get the signatures of the inputs of an image (to be stored in the manifest once it is saved)
+
+    Parameters:
+        gxl_filepath: path to the gxl file
+        img_filepath: path to the image (None = blank background)
+
+    Returns:
+        dict with the signature of the gxl file and of the image (None if there is no image)
+    """
+    return {'gxl': file_signature(gxl_filepath),
+            'img': file_signature(img_filepath) if img_filepath is not None else None}
+
+
+class ExportManifest:
+    filename = 'vis-manifest.json'
+    # increase when the drawing changes, such that all the images are drawn again
+    version = 2
+
+    def __init__(self, output_dir: str, style: dict, encoding: EncodeOptions = None) -> None:
+        """
+        This class keeps track of the inputs of the images saved in an output directory, in a json file next to
+        them. An image is up to date if it exists and if its gxl file, its image, the style and the encoding
+        options did not change since it was saved. A file whose modification time changed but not its content
+        (e.g. copied again) is still up to date. The style and the encoding are stored with every image, such that
+        the images saved with another style keep their entries (and are up to date again with that style).
+
+        :param output_dir: path to the output directory
+        :param style: style of the drawing (see batch_render.load_style)
+        :param encoding: options of the saved images (None = default options)
+        """
+        self.output_dir = output_dir
+        self.filepath = os.path.join(output_dir, self.filename)
+        self.style_hash = style_hash(style)
+        self.encoding = encoding or EncodeOptions()
+        # {output file name: {'gxl': signature, 'img': signature or None, 'style': style hash,
+        # 'encoding': encoding options}} of the saved images
+        self.entries = {}
+        try:
+            with open(self.filepath) as f:
+                manifest = json.load(f)
+            if manifest.get('version') == self.version:
+                self.entries = manifest['entries']
+        except (OSError, ValueError, KeyError):
+            pass
+
+    def is_up_to_date(self, gxl_filepath: str, img_filepath: str = None) -> bool:
+        """
+        Check if the image of a gxl file does not need to be drawn again
+
+        Parameters:
+            gxl_filepath: path to the gxl file
+            img_filepath: path to the image (None = blank background)
+
+        Returns:
+            bool
+        """
+        filename = output_filename(gxl_filepath, self.encoding)
+        entry = self.entries.get(filename)
+        if entry is None or not os.path.isfile(os.path.join(self.output_dir, filename)):
+            return False
+        if entry.get('style') != self.style_hash or entry.get('encoding') != list(self.encoding):
+            return False
+        if (entry['img'] is None) != (img_filepath is None):
+            return False
+        try:
+            signature = {'gxl': file_signature(gxl_filepath, entry['gxl']),
+                         'img': file_signature(img_filepath, entry['img']) if img_filepath is not None else None}
+        except OSError:
+            return False
+        if any(signature[k] != entry[k] for k in signature):
+            if any(signature[k] is not None and signature[k]['sha1'] != entry[k]['sha1'] for k in signature):
+                return False
+            # only the modification times changed
+            self.entries[filename] = dict(entry, **signature)
+        return True
+
+    def update(self, gxl_filepath: str, signature: dict = None):
+        """
+        Store the inputs of a saved image, or remove its entry if it could not be saved
+
+        Parameters:
+            gxl_filepath: path to the gxl file
+            signature: signature of the inputs taken before drawing (see input_signature), None to remove the entry
+        """
+        if signature is None:
+            self.entries.pop(output_filename(gxl_filepath, self.encoding), None)
+        else:
+            self.entries[output_filename(gxl_filepath, self.encoding)] = dict(signature, style=self.style_hash,
+                                                                              encoding=list(self.encoding))
+
+    def save(self):
+        """
+        Write the manifest (atomically, such that an interrupted export does not leave an invalid file)
+        """
+        os.makedirs(self.output_dir, exist_ok=True)
+        fd, tmp_filepath = tempfile.mkstemp(dir=self.output_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump({'version': self.version, 'entries': self.entries}, f)
+            os.replace(tmp_filepath, self.filepath)
+        except BaseException:
+            if os.path.exists(tmp_filepath):
+                os.remove(tmp_filepath)
+            raise
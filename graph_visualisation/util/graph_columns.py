@@ -0,0 +1,61 @@
+import numpy as np
+
+
+class GraphColumns:
+    __slots__ = ('node_positions', 'edges', 'node_feature_names', 'node_columns', 'node_categories',
+                 'edge_feature_names', 'edge_columns', 'edge_categories')
+
+    def __init__(self, node_positions, edges, node_feature_names, node_columns, node_categories,
+                 edge_feature_names, edge_columns, edge_categories) -> None:
+        """
+        This class holds a parsed graph in a columnar layout
+
+        :param node_positions: (N, 2) float array with the x, y coordinates of the nodes
+        :param edges: (E, 2) int32 array with the indices of the connected nodes
+        :param node_feature_names: names of the node features (None if the nodes have no features)
+        :param node_columns: dictionary with one typed column per node feature (codes for the string features)
+        :param node_categories: dictionary with the categories of the string node features
+        :param edge_feature_names: names of the edge features (None if the edges have no features)
+        :param edge_columns: dictionary with one typed column per edge feature (codes for the string features)
+        :param edge_categories: dictionary with the categories of the string edge features
+        """
+        self.node_positions = node_positions
+        self.edges = edges
+        self.node_feature_names = node_feature_names
+        self.node_columns = node_columns
+        self.node_categories = node_categories
+        self.edge_feature_names = edge_feature_names
+        self.edge_columns = edge_columns
+        self.edge_categories = edge_categories
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Number of bytes used by the arrays of the graph
+        """
+        arrays = [self.node_positions, self.edges, *self.node_columns.values(), *self.node_categories.values(),
+                  *self.edge_columns.values(), *self.edge_categories.values()]
+        return sum(a.nbytes for a in arrays)
+
+    @staticmethod
+    def get_values(columns, categories, feature) -> np.ndarray:
+        """
+        Get the values of a feature column, string features are decoded from their category codes
+
+        Parameters:
+            columns: dictionary of columns
+            categories: dictionary of categories
+            feature: feature name
+
+        Returns:
+            np.ndarray [feature of element 1, feature of element 2, ...]
+        """
+        if feature in categories:
+            return categories[feature][columns[feature]]
+        return columns[feature]
+
+    def get_node_values(self, feature) -> np.ndarray:
+        return self.get_values(self.node_columns, self.node_categories, feature)
+
+    def get_edge_values(self, feature) -> np.ndarray:
+        return self.get_values(self.edge_columns, self.edge_categories, feature)
@@ -1,12 +1,93 @@
+import os
+
 import cv2
 import numpy as np
+from PIL import Image
 
 from util.gxl_graph import ParsedGxlGraph
 from util.draw_graph import GraphDrawer
+from util.lru_cache import file_key
+from util.stats import stats
+
+
+def load_graph(gxl_filepath, color_by_feature=None, cache=None, lazy=False, graph_cache=None):
+    """
+    Parse a gxl file, or take it from the in-memory cache if it did not change since it was parsed. The cached
+    graphs are shared by the viewer, the prefetching and the saving threads: the feature the nodes are colored by is
+    given to the GraphDrawer of each drawing, a shared graph only grows by its lazily decoded features and its spatial
+    index (added under a lock), and the size charged to the cache is updated when it grows.
+
+    :param gxl_filepath: path to the gxl file with the graph
+    :param color_by_feature: name of the feature the nodes should be colored by (decoded while parsing when lazy)
+    :param cache: GxlCache used to avoid parsing the same gxl file again (optional)
+    :param lazy: only decode the node features needed to draw the graph
+    :param graph_cache: LRUCache of the parsed graphs (optional)
+    :return: ParsedGxlGraph
+    """
+    key = file_key(gxl_filepath) if graph_cache is not None else None
+    graph = graph_cache.get(key) if graph_cache is not None else None
+    if graph is None:
+        graph = ParsedGxlGraph(gxl_filepath, color_by_feature=color_by_feature, cache=cache, lazy=lazy)
+        if graph_cache is not None:
+            graph.on_resize = lambda resized_graph: graph_cache.resize(key, resized_graph.nbytes)
+            graph_cache.put(key, graph, graph.nbytes)
+    return graph
+
+
+# reduced decoding modes of opencv, from the smallest to the biggest image
+reduced_decoding = ((8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4),
+                    (2, cv2.IMREAD_REDUCED_COLOR_2))
+
+
+def get_reduction(img_filepath, target_size):
+    """
+    Choose the biggest reduction of a jpeg image that still covers the target size. The other formats are
+    always decoded at full resolution (their decoders cannot skip pixels).
+
+    :param img_filepath: path to the image file
+    :param target_size: (width, height) the image is displayed at, None for the full resolution
+    :return: tuple (int, int) reduction factor and opencv imread flag
+    """
+    if target_size is None or os.path.splitext(img_filepath)[1].lower() not in ('.jpg', '.jpeg'):
+        return 1, cv2.IMREAD_COLOR
+    # only the header is read to get the size of the image
+    with Image.open(img_filepath) as img:
+        width, height = img.size
+    for factor, flag in reduced_decoding:
+        if width / factor >= target_size[0] and height / factor >= target_size[1]:
+            return factor, flag
+    return 1, cv2.IMREAD_COLOR
+
+
+def load_image(img_filepath, image_cache=None, target_size=None):
+    """
+    Decode an image file, or take it from the in-memory cache if it did not change since it was decoded.
+
+    :param img_filepath: path to the image file
+    :param image_cache: LRUCache of the decoded images (optional)
+    :param target_size: (width, height) the image is displayed at, jpeg images are decoded at a reduced
+    resolution that still covers it (None = full resolution)
+    :return: tuple (np.ndarray, float) decoded image and its scale compared to the full resolution
+    """
+    factor, flag = get_reduction(img_filepath, target_size)
+    key = (file_key(img_filepath), factor) if image_cache is not None else None
+    img = image_cache.get(key) if image_cache is not None else None
+    if img is None:
+        with stats.stage('decode'):
+            img = cv2.imread(img_filepath, flag)
+        if image_cache is not None and img is not None:
+            image_cache.put(key, img, img.nbytes)
+    if img is None or factor == 1:
+        return img, 1.0
+
+    with Image.open(img_filepath) as full_img:
+        full_width = full_img.size[0]
+    return img, img.shape[1] / full_width
 
 
 def graph_plotter(gxl_filepath, img_filepath, color_by_feature, node_style, edge_style, scaling, transparency,
-                  current_node):
+                  current_node, render_mode='graph', density_weight=None, density_class=None, cache=None, lazy=False,
+                  graph_cache=None, image_cache=None, target_size=None):
     """
     This function draws a graph on an image.
 
@@ -18,20 +99,31 @@ def graph_plotter(gxl_filepath, img_filepath, color_by_feature, node_style, edge
     :param scaling: x,y coordinates will be scaled accordingly (in case they are not in pixel)
     :param transparency: transparency of the image
     :param current_node: the current node selected in the node style option menu
+    :param render_mode: 'graph' to draw the nodes and the edges, 'density' to draw a heatmap of the nodes
+    :param density_weight: name of the node feature weighting the nodes in the heatmap (None = count the nodes)
+    :param density_class: only the nodes with this value of color_by_feature are in the heatmap (None = all)
+    :param cache: GxlCache used to avoid parsing the same gxl file again (optional)
+    :param lazy: only decode the node features needed to draw the graph
+    :param graph_cache: LRUCache of the parsed graphs (optional)
+    :param image_cache: LRUCache of the decoded images (optional)
+    :param target_size: (width, height) the image is displayed at, allows a faster reduced decoding of the image
+    (None = full resolution)
     """
 
-    graph = ParsedGxlGraph(gxl_filepath, color_by_feature=color_by_feature)
+    graph = load_graph(gxl_filepath, color_by_feature=color_by_feature, cache=cache, lazy=lazy,
+                       graph_cache=graph_cache)
     if img_filepath:
-        img = cv2.imread(img_filepath)
+        img, img_scale = load_image(img_filepath, image_cache=image_cache, target_size=target_size)
     else:
         # If there is no images, draw a blank background
         img = np.zeros([1024, 1024, 1], dtype=np.uint8)
         img.fill(255)
+        img_scale = 1.0
         transparency = 255
 
     graph_img = GraphDrawer(graph, img, scaling=scaling, color_by_feature=color_by_feature,
                             node_style=node_style, edge_style=edge_style,
-                            transparency=transparency, current_node=current_node)
+                            transparency=transparency, current_node=current_node, img_scale=img_scale,
+                            render_mode=render_mode, density_weight=density_weight, density_class=density_class)
 
     return graph_img
-
@@ -0,0 +1,270 @@
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+
+import numpy as np
+
+from util.graph_columns import GraphColumns
+
+
+class GxlCache:
+    meta_filename = 'meta.json'
+
+    def __init__(self, cache_dir: str, max_bytes: int) -> None:
+        """
+        This class stores parsed gxl graphs on disk as .npy files, so that they can be memory mapped instead of
+        being parsed again. An entry is only valid as long as the size and the modification time of its gxl file
+        did not change. When the cache grows bigger than max_bytes, the least recently used entries are removed.
+        The size of the cache is measured once and then kept up to date by the stores, such that the entries are only
+        scanned when the cache is full.
+
+        :param cache_dir: directory where the entries are stored
+        :param max_bytes: maximal size of the cache in bytes
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        # size of the entries in bytes, None until it is measured by the first store
+        self.nbytes = None
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def entry_dir(self, gxl_filepath: str) -> str:
+        """
+        Get the directory of the entry of a gxl file
+
+        Parameters:
+            gxl_filepath: path to the gxl file
+
+        Returns:
+            path to the entry directory (one per gxl file)
+        """
+        key = hashlib.sha1(os.path.abspath(gxl_filepath).encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, key)
+
+    @staticmethod
+    def source_stat(gxl_filepath: str) -> dict:
+        stat = os.stat(gxl_filepath)
+        return {'source': os.path.abspath(gxl_filepath), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+    def load(self, gxl_filepath: str):
+        """
+        Load a graph from the cache
+
+        Parameters:
+            gxl_filepath: path to the gxl file
+
+        Returns:
+            tuple (str, bool, str, GraphColumns) or None
+            ID of the graph, edge IDs present, edge mode and the memory mapped columns,
+            None if the graph is not in the cache or if the gxl file changed since it was stored.
+        """
+        entry_dir = self.entry_dir(gxl_filepath)
+        meta_filepath = os.path.join(entry_dir, self.meta_filename)
+        try:
+            with open(meta_filepath) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if any(meta.get(k) != v for k, v in self.source_stat(gxl_filepath).items()):
+            # the gxl file changed -> the entry is stale
+            self.remove_entry(entry_dir)
+            return None
+
+        def load_arrays(filenames):
+            return {name: np.load(os.path.join(entry_dir, filename), mmap_mode='r')
+                    for name, filename in filenames.items()}
+
+        try:
+            node_positions = np.load(os.path.join(entry_dir, 'node_positions.npy'), mmap_mode='r')
+            node_columns = load_arrays(meta['node_columns'])
+            node_columns['x'], node_columns['y'] = node_positions[:, 0], node_positions[:, 1]
+            columns = GraphColumns(
+                node_positions=node_positions,
+                edges=np.load(os.path.join(entry_dir, 'edges.npy'), mmap_mode='r'),
+                node_feature_names=meta['node_feature_names'],
+                node_columns=node_columns,
+                node_categories=load_arrays(meta['node_categories']),
+                edge_feature_names=meta['edge_feature_names'],
+                edge_columns=load_arrays(meta['edge_columns']),
+                edge_categories=load_arrays(meta['edge_categories']))
+        except (OSError, ValueError, KeyError):
+            self.remove_entry(entry_dir)
+            return None
+
+        # mark the entry as recently used
+        os.utime(meta_filepath)
+        return meta['graph_id'], meta['edge_ids_present'], meta['edgemode'], columns
+
+    def store(self, graph):
+        """
+        Store a parsed graph in the cache and evict the least recently used entries if the cache is full
+
+        Parameters:
+            graph: ParsedGxlGraph
+        """
+        columns = graph.columns
+        entry_dir = self.entry_dir(graph.filepath)
+        meta = self.source_stat(graph.filepath)
+        meta.update({'graph_id': graph.graph_id, 'edge_ids_present': graph.edge_ids_present,
+                     'edgemode': graph.edgemode, 'nbytes': columns.nbytes,
+                     'node_feature_names': columns.node_feature_names,
+                     'edge_feature_names': columns.edge_feature_names})
+
+        # write the entry in a temporary directory first, such that a reader never sees a half written entry
+        tmp_dir = tempfile.mkdtemp(dir=self.cache_dir, prefix='.tmp-')
+        try:
+            np.save(os.path.join(tmp_dir, 'node_positions.npy'), columns.node_positions)
+            np.save(os.path.join(tmp_dir, 'edges.npy'), columns.edges)
+            for kind in ('node_columns', 'node_categories', 'edge_columns', 'edge_categories'):
+                arrays = getattr(columns, kind)
+                if kind == 'node_columns':
+                    # x and y are views on the node positions
+                    arrays = {name: column for name, column in arrays.items() if name not in ('x', 'y')}
+                # features are stored by index, their names could contain characters not allowed in filenames
+                meta[kind] = {name: f'{kind}_{i}.npy' for i, name in enumerate(arrays)}
+                for name, filename in meta[kind].items():
+                    np.save(os.path.join(tmp_dir, filename), np.ascontiguousarray(arrays[name]))
+            with open(os.path.join(tmp_dir, self.meta_filename), 'w') as f:
+                json.dump(meta, f)
+
+            size = self.entry_nbytes(tmp_dir)
+            previous_size = self.entry_nbytes(entry_dir)
+            self.remove(entry_dir)
+            os.replace(tmp_dir, entry_dir)
+        except OSError:
+            self.remove(tmp_dir)
+            return
+
+        self.add_nbytes(size - previous_size)
+
+    def add_nbytes(self, nbytes: int):
+        """
+        Account for entries that grew or shrank, and evict the least recently used entries if the cache is full
+
+        Parameters:
+            nbytes: change of the size of the cache in bytes
+        """
+        if self.nbytes is None:
+            # the first change measures the whole cache, it already contains the change
+            self.nbytes = sum(size for _, size, _ in self.scan())
+        else:
+            self.nbytes += nbytes
+        if self.nbytes > self.max_bytes:
+            self.evict()
+
+    def store_columns(self, gxl_filepath: str, mode: str, columns: dict, categories: dict):
+        """
+        Add feature columns decoded after the graph was stored (see ParsedGxlGraph.decode_lazy_feature) to its
+        entry, such that the next load contains them. Nothing is stored if the entry is missing or stale.
+
+        Parameters:
+            gxl_filepath: path to the gxl file
+            mode: either 'edge' or 'node'
+            columns: {feature name: np.ndarray} decoded columns
+            categories: {feature name: np.ndarray} categories of the decoded string features
+        """
+        entry_dir = self.entry_dir(gxl_filepath)
+        meta_filepath = os.path.join(entry_dir, self.meta_filename)
+        try:
+            with open(meta_filepath) as f:
+                meta = json.load(f)
+            if any(meta.get(k) != v for k, v in self.source_stat(gxl_filepath).items()):
+                return
+
+            previous_size = self.entry_nbytes(entry_dir)
+            for kind, arrays in ((f'{mode}_columns', columns), (f'{mode}_categories', categories)):
+                for name, array in arrays.items():
+                    # named after the feature, two processes adding different features never write the same file
+                    filename = f'{kind}_{hashlib.sha1(name.encode("utf-8")).hexdigest()[:16]}.npy'
+                    filepath = os.path.join(entry_dir, filename)
+                    with tempfile.NamedTemporaryFile(dir=entry_dir, prefix='.tmp-', suffix='.npy',
+                                                     delete=False) as f:
+                        np.save(f, np.ascontiguousarray(array))
+                    os.replace(f.name, filepath)
+                    meta[kind][name] = filename
+
+            with tempfile.NamedTemporaryFile('w', dir=entry_dir, prefix='.tmp-', delete=False) as f:
+                json.dump(meta, f)
+            os.replace(f.name, meta_filepath)
+            size = self.entry_nbytes(entry_dir)
+        except (OSError, ValueError, KeyError):
+            return
+
+        self.add_nbytes(size - previous_size)
+
+    def evict(self):
+        """
+        Remove the least recently used entries until the cache is smaller than max_bytes
+        """
+        entries = self.scan()
+        # other processes sharing the cache directory may have changed it -> the scan measures the size again
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            self.remove(path)
+            total -= size
+        self.nbytes = total
+
+    def scan(self) -> list:
+        """
+        List the entries of the cache
+
+        Returns:
+            list of tuples (int, int, str)
+            last use in nanoseconds, size in bytes and directory of every entry
+        """
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if not entry.is_dir() or entry.name.startswith('.'):
+                continue
+            try:
+                last_used = os.stat(os.path.join(entry.path, self.meta_filename)).st_mtime_ns
+                size = self.entry_nbytes(entry.path)
+            except OSError:
+                continue
+            entries.append((last_used, size, entry.path))
+        return entries
+
+    @staticmethod
+    def entry_nbytes(path: str) -> int:
+        """
+        Get the size of an entry
+
+        Parameters:
+            path: directory of the entry
+
+        Returns:
+            size of the files of the entry in bytes, 0 if the entry does not exist
+        """
+        try:
+            return sum(f.stat().st_size for f in os.scandir(path))
+        except FileNotFoundError:
+            return 0
+
+    def clear(self):
+        """
+        Remove every entry of the cache
+        """
+        for entry in os.scandir(self.cache_dir):
+            self.remove(entry.path)
+        self.nbytes = 0
+
+    def remove_entry(self, entry_dir: str):
+        """
+        Remove an entry and account for its size
+
+        Parameters:
+            entry_dir: directory of the entry
+        """
+        size = self.entry_nbytes(entry_dir)
+        self.remove(entry_dir)
+        if self.nbytes is not None:
+            self.nbytes -= size
+
+    @staticmethod
+    def remove(path):
+        # entries that are still memory mapped cannot be removed on every platform -> they are removed later
+        shutil.rmtree(path, ignore_errors=True)
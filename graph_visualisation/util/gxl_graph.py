@@ -2,6 +2,15 @@ import os
 import xml.etree.ElementTree as ET
 import sys
 import re
+import threading
+from array import array
+
+import numpy as np
+
+from util.graph_columns import GraphColumns
+from util.gxl_cache import GxlCache
+from util.spatial_index import SpatialIndex
+from util.stats import stats
 
 
 class InvalidFileException(Exception):
@@ -9,12 +18,17 @@ class InvalidFileException(Exception):
 
 
 class ParsedGxlGraph:
-    def __init__(self, path_to_gxl: str, color_by_feature: str = None) -> None:
+    def __init__(self, path_to_gxl: str, color_by_feature: str = None, streaming: bool = True,
+                 cache: GxlCache = None, lazy: bool = False) -> None:
         """
         This class contains all the information encoded in a single gxl file = one graph
 
         :param path_to_gxl: path to the gxl file
         :param color_by_feature: modify the color of the nodes
+        :param streaming: parse the gxl in a single pass with iterparse instead of building the whole element tree
+        :param cache: GxlCache the parsed graph is loaded from / stored in (no caching if None)
+        :param lazy: only decode the coordinates (and color_by_feature) while parsing, the other features are
+        decoded the first time they are requested
         """
         self.filepath = path_to_gxl
 
@@ -23,11 +37,37 @@ class ParsedGxlGraph:
         self.file_id = self.filename[:-4]
 
         self.color_by_feature = color_by_feature
+        # features decoded while parsing (None = every feature)
+        self.eager_features = {f for f in ('x', 'y', color_by_feature) if f} if lazy else None
+        # built the first time it is requested (see spatial_index)
+        self._spatial_index = None
+        # the lazily decoded features are added to the cache entry
+        self.cache = cache
+        # function called with the graph when it grows (lazily decoded features, spatial index), e.g. to update
+        # the size charged to an in-memory cache (None = no call)
+        self.on_resize = None
+        # the graph can be shared between threads, the features and the index are added under these locks
+        self._decode_lock = threading.Lock()
+        self._index_lock = threading.Lock()
 
         # parsing the gxl
-        # sets up the following properties: node_features, node_feature_names, edges, edge_features, edge_feature_names,
-        # node_position, graph_id, edge_ids_present and edgemode
-        self.setup_graph_features()
+        # sets up the following properties: graph_id, edge_ids_present, edgemode and columns (node_positions,
+        # node_feature_names, edges, edge_feature_names and the feature columns)
+        cached = None
+        if cache is not None:
+            with stats.stage('gxl_cache'):
+                cached = cache.load(self.filepath)
+            stats.count('gxl_cache_hit' if cached is not None else 'gxl_cache_miss')
+        if cached is not None:
+            self.graph_id, self.edge_ids_present, self.edgemode, self.columns = cached
+        else:
+            with stats.stage('parse'):
+                if streaming:
+                    self.setup_graph_features_streaming()
+                else:
+                    self.setup_graph_features()
+            if cache is not None:
+                cache.store(self)
 
     @property
     def filepath(self) -> str:
@@ -42,18 +82,64 @@ class ParsedGxlGraph:
 
     @property
     def nb_of_nodes(self):
-        return len(self.node_features)
+        return len(self.columns.node_positions)
 
     @property
     def nb_of_edges(self):
-        return len(self.edge_features)
+        return len(self.columns.edges)
+
+    @property
+    def node_positions(self):
+        return self.columns.node_positions
+
+    @property
+    def edges(self):
+        return self.columns.edges
+
+    @property
+    def node_feature_names(self):
+        return self.columns.node_feature_names
+
+    @property
+    def edge_feature_names(self):
+        return self.columns.edge_feature_names
+
+    @property
+    def spatial_index(self) -> SpatialIndex:
+        """
+        Grid index of the node positions and of the edge bounding boxes (built once per graph)
+        """
+        if self._spatial_index is None:
+            with self._index_lock:
+                if self._spatial_index is None:
+                    with stats.stage('spatial_index'):
+                        self._spatial_index = SpatialIndex(self.node_positions, self.edges, on_resize=self.resized)
+                    self.resized()
+        return self._spatial_index
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Number of bytes of the columns and of the spatial index (if it is built)
+        """
+        index = self._spatial_index
+        return self.columns.nbytes + (index.nbytes if index is not None else 0)
+
+    def resized(self):
+        if self.on_resize is not None:
+            self.on_resize(self)
+
+    @property
+    def color_by_features(self):
+        if self.color_by_feature:
+            return self.get_node_feature_values(self.color_by_feature)
+        return None
 
     def setup_graph_features(self):
         """
         Parses the gxl file and sets the following graph properties
         - graph info: graph_id, edge_ids_present and edgemode
-        - node: node_features, node_feature_names, and node_position
-        - edge: edges, edge_features and edge_feature_names
+        - columns: node_positions, node_feature_names, edges, edge_feature_names and the feature columns
         """
         tree = ET.parse(self.filepath)
         root = tree.getroot()
@@ -63,27 +149,41 @@ class ParsedGxlGraph:
 
         self.graph_id, self.edge_ids_present, self.edgemode = self.get_graph_attr(root)  # (str, bool, str)
 
-        # nodes
-        self.node_feature_names, self.node_features, min_node_id = self.get_node_features(root)  # ([str], list)
+        reader = GxlColumnsReader(self.eager_features)
+        for graph_element in root.iter():
+            reader.read(graph_element)
+        self.columns = reader.build()
 
-        # Add the coordinates to their own variable
-        if self.node_feature_names is None or 'x' not in self.node_feature_names and 'y' not in self.node_feature_names:
-            print('Graph does not contain x or y coordinates as features. '
-                  'Coordinates have to be specified in the gxl file as "x" and "y".')
+    def setup_graph_features_streaming(self):
+        """
+        Parses the gxl file in a single pass and sets the same graph properties as setup_graph_features.
 
-        x_ind = self.node_feature_names.index('x')
-        y_ind = self.node_feature_names.index('y')
+        The elements are cleared as soon as they have been read, so the memory used is bounded by the
+        feature columns and not by the element tree.
+        """
+        graph_attr = None
+        reader = GxlColumnsReader(self.eager_features)
 
-        self.node_positions = [[node[x_ind], node[y_ind]] for node in self.node_features]
-        if self.color_by_feature:
-            self.color_by_features = [node[self.node_feature_names.index(self.color_by_feature)] for node in
-                                      self.node_features]
+        for element in iterparse_gxl(self.filepath):
+            if element.tag == 'graph':
+                graph_attr = dict(element.attrib)
+            else:
+                reader.read(element)
 
-        # edges
-        self.edges = self.get_edges(root, shift=min_node_id)  # [[int, int]]
-        self.edge_feature_names, self.edge_features = self.get_edge_features(root)  # ([str], list)
+        # same checks as sanity_check, but on the collected values
+        if graph_attr is None or len(graph_attr) != 3:
+            raise InvalidFileException
+        if len(reader.node_ids) == 0:
+            print(f'File {os.path.basename(self.filepath)} is an empty graph!')
+            raise InvalidFileException
+        elif len(reader.edge_starts) == 0:
+            print(f'File {os.path.basename(self.filepath)} has no edges!')
+
+        self.graph_id, self.edge_ids_present, self.edgemode = (graph_attr['id'], graph_attr['edgeids'] == 'True',
+                                                               graph_attr['edgemode'])
+        self.columns = reader.build()
 
-    def get_node_feature_values(self, feature) -> list:
+    def get_node_feature_values(self, feature) -> np.ndarray:
         """
         Get the feature values of the nodes for a given feature name
 
@@ -91,13 +191,13 @@ class ParsedGxlGraph:
             feature: feature name
 
         Returns:
-            list [feature of node 1, feature of node 2, ...]
+            np.ndarray [feature of node 1, feature of node 2, ...]
         """
-        feature_ind = self.node_feature_names.index(feature)
-        all_features = [nf[feature_ind] for nf in self.node_features]
-        return all_features
+        if feature not in self.columns.node_columns:
+            self.decode_lazy_feature('node', feature)
+        return self.columns.get_node_values(feature)
 
-    def get_edge_feature_values(self, feature) -> list:
+    def get_edge_feature_values(self, feature) -> np.ndarray:
         """
         Get the feature values of the edges for a given feature name
 
@@ -105,71 +205,67 @@ class ParsedGxlGraph:
             feature: feature name
 
         Returns:
-            list [feature of edge 1, feature of edge 2, ...]
+            np.ndarray [feature of edge 1, feature of edge 2, ...]
         """
-        feature_ind = self.edge_features.index(feature)
-        all_features = [[nf][feature_ind] for nf in self.edge_features]
-        return all_features
+        if feature not in self.columns.edge_columns:
+            self.decode_lazy_feature('edge', feature)
+        return self.columns.get_edge_values(feature)
 
-    def get_features(self, root, mode):
+    def get_node_features(self, node: int) -> dict:
         """
-        Get a list of the node or edge features out of the element tree (gxl)
+        Get all the features of a node (e.g. to show them when it is clicked), the features skipped while parsing
+        are decoded in a single scan of the gxl file
 
         Parameters:
-            root: root of ET tree
-            mode: either 'edge' or 'node'
+            node: index of the node
 
         Returns:
-            tuple ([str], [[mixed values]])
-            list of all node features for that tree ([feature name 1, feature name 2, ...],
-            [[feature 1 of node 1, feature 2 of node 1, ...], [feature 1 of node 2, ...], ...])
+            dict {feature name: value}
         """
-        features_info = [[feature for feature in graph_element] for graph_element in root.iter(mode)]
-        if len(features_info) > 0:
-            feature_names = [i.attrib['name'] for i in features_info[0]]
-        else:
-            feature_names = []
+        feature_names = self.node_feature_names or []
+        missing = {f for f in feature_names if f not in self.columns.node_columns}
+        if missing:
+            self.decode_lazy_feature('node', *missing)
+        return {f: self.columns.get_node_values(f)[node] for f in feature_names}
 
-        # check if we have features to generate
-        if len(feature_names) > 0:
-            features = [[self.decode_feature(value) for feature in graph_element for value in feature if
-                         feature.attrib['name'] in feature_names] for graph_element in root.iter(mode)]
-        else:
-            feature_names = None
-            features = []
-
-        return feature_names, features
-
-    def get_node_features(self, root) -> tuple:
-        """
-        Get node feature names/values and the smallest id
-
-        Parameters:
-            root: root of ET tree
-
-        Returns:
-            tuple  ([str], [[mixed values]], int)
-            list of all node features and the minimal id
-        """
-        # minimal node id -> used to shift the edge indexing to 0 (in case node enumeration does not start with 0)
-        regex = r'_(\d+)$'
-        node_ids = [int(re.search(regex, graph_element.attrib['id']).group(1)) for graph_element in root.iter('node')]
-        feature_names, features = self.get_features(root, 'node')
-        return feature_names, features, min(node_ids)
-
-    def get_edge_features(self, root) -> tuple:
+    def decode_lazy_feature(self, mode, *features):
         """
-        Get edge feature names/values
+        Decode features that were skipped while parsing by scanning the gxl file again, the decoded columns are kept
+        (and added to the cache entry of the graph)
 
         Parameters:
-            root: root of ET tree
-
-        Returns:
-             tuple  ([str], [[mixed values]], int)
-             list of all edge features
+            mode: either 'edge' or 'node'
+            features: feature names
         """
-        feature_names, features = self.get_features(root, 'edge')
-        return feature_names, features
+        feature_names = self.node_feature_names if mode == 'node' else self.edge_feature_names
+        for feature in features:
+            if feature_names is None or feature not in feature_names:
+                raise KeyError(feature)
+
+        with self._decode_lock:
+            # another thread may have decoded them in the meantime
+            decoded = self.columns.node_columns if mode == 'node' else self.columns.edge_columns
+            features = {f for f in features if f not in decoded}
+            if not features:
+                return
+
+            builder = FeatureColumnsBuilder(features)
+            for element in iterparse_gxl(self.filepath):
+                if element.tag == mode:
+                    builder.add(element)
+            _, columns, categories = builder.build()
+
+            # the dicts are replaced instead of updated, such that the threads reading them never see one changing.
+            # The categories come first: a decoded column is never seen without its categories.
+            if mode == 'node':
+                self.columns.node_categories = {**self.columns.node_categories, **categories}
+                self.columns.node_columns = {**self.columns.node_columns, **columns}
+            else:
+                self.columns.edge_categories = {**self.columns.edge_categories, **categories}
+                self.columns.edge_columns = {**self.columns.edge_columns, **columns}
+            if self.cache is not None:
+                self.cache.store_columns(self.filepath, mode, columns, categories)
+        self.resized()
 
     def sanity_check(self, root):
         """
@@ -206,39 +302,171 @@ class ParsedGxlGraph:
         return g['id'], g['edgeids'] == 'True', g['edgemode']
 
     @staticmethod
-    def get_edges(root, shift=0) -> list:
+    def decode_feature(f):
+        data_types = {'string': str,
+                      'float': float,
+                      'int': int}
+
+        # convert the feature value to the correct data type as specified in the gxl
+        return data_types[f.tag](f.text.strip())
+
+
+class FeatureColumnsBuilder:
+    # typecode of the buffer used while parsing for each gxl data type (strings are stored as category codes)
+    typecodes = {'float': 'd', 'int': 'q', 'string': 'i'}
+
+    def __init__(self, features: set = None) -> None:
         """
-        Get the start and end points of every edge and store them in a list of lists (from the element tree, gxl)
+        This class collects the features of the nodes (or edges) of a graph one element at a time in typed buffers.
+        The feature names and data types are taken from the first element.
+
+        :param features: names of the features to decode, the others are only listed in feature_names
+        (None = decode every feature)
+        """
+        self.features = features
+        self.feature_names = None
+        self.buffers = {}
+        self.categories = {}
+        self.nb_of_elements = 0
+
+    def add(self, graph_element):
+        """
+        Decode the features of a single node or edge and append them to the buffers
 
         Parameters:
-            root: root of ET tree
-            shift: int, if the smallest id of the nodes is not 0, then shift the edge indexing to start from 0.
+            graph_element: node or edge element (its children are the 'attr' elements)
+        """
+        if self.feature_names is None:
+            self.feature_names = [feature.attrib['name'] for feature in graph_element]
+            for feature in graph_element:
+                if self.features is not None and feature.attrib['name'] not in self.features:
+                    continue
+                data_type = feature[0].tag
+                self.buffers[feature.attrib['name']] = array(self.typecodes[data_type])
+                if data_type == 'string':
+                    self.categories[feature.attrib['name']] = {}
+
+        self.nb_of_elements += 1
+        for feature in graph_element:
+            name = feature.attrib['name']
+            if name not in self.buffers:
+                continue
+            value = ParsedGxlGraph.decode_feature(feature[0])
+            if name in self.categories:
+                # a new category gets the next free code
+                value = self.categories[name].setdefault(value, len(self.categories[name]))
+            try:
+                self.buffers[name].append(value)
+            except TypeError:
+                print(f'Feature {name} does not have the same data type for every element.')
+                raise InvalidFileException
+
+    def build(self) -> tuple:
+        """
+        Convert the buffers to numpy columns
 
         Returns:
-            list [[int, int]]
-            list of indices of connected nodes
+            tuple ([str], {str: np.ndarray}, {str: np.ndarray})
+            feature names (None if the elements have no features), columns and categories of the string features
         """
-        edge_list = []
+        for name, buffer in self.buffers.items():
+            if len(buffer) != self.nb_of_elements:
+                print(f'Feature {name} is not specified for every element.')
+                raise InvalidFileException
 
-        regex = r'_(\d+)$'
-        start_points = [int(re.search(regex, edge.attrib['from']).group(1)) for edge in root.iter('edge')]
-        end_points = [int(re.search(regex, edge.attrib['to']).group(1)) for edge in root.iter('edge')]
-        assert len(start_points) == len(end_points)
+        columns = {name: np.frombuffer(buffer, dtype=buffer.typecode) for name, buffer in self.buffers.items()}
+        categories = {name: np.array(list(codes), dtype=str) for name, codes in self.categories.items()}
+        return self.feature_names or None, columns, categories
 
-        # move enumeration start to 0 if necessary
-        if len(start_points) > 0 and len(end_points) > 0:
-            if shift != 0:
-                start_points = [x - shift for x in start_points]
-                end_points = [x - shift for x in end_points]
-            edge_list = [[start_points[i], end_points[i]] for i in range(len(start_points))]
 
-        return edge_list
+class GxlColumnsReader:
+    id_regex = re.compile(r'_(\d+)$')
 
-    @staticmethod
-    def decode_feature(f):
-        data_types = {'string': str,
-                      'float': float,
-                      'int': int}
+    def __init__(self, node_features: set = None) -> None:
+        """
+        This class reads the node and edge elements of a gxl file (in document order) into a GraphColumns
 
-        # convert the feature value to the correct data type as specified in the gxl
-        return data_types[f.tag](f.text.strip())
+        :param node_features: names of the node features to decode, the coordinates are always decoded
+        (None = decode every node and edge feature, otherwise no edge feature is decoded)
+        """
+        self.node_ids = array('q')
+        self.edge_starts = array('q')
+        self.edge_ends = array('q')
+        self.nodes = FeatureColumnsBuilder(None if node_features is None else node_features | {'x', 'y'})
+        self.edges = FeatureColumnsBuilder(None if node_features is None else set())
+
+    def read(self, graph_element) -> bool:
+        """
+        Read a single element of the gxl
+
+        Parameters:
+            graph_element: element of the ET tree
+
+        Returns:
+            True if the element was a node or an edge, False if it was ignored
+        """
+        if graph_element.tag == 'node':
+            self.node_ids.append(int(self.id_regex.search(graph_element.attrib['id']).group(1)))
+            self.nodes.add(graph_element)
+        elif graph_element.tag == 'edge':
+            self.edge_starts.append(int(self.id_regex.search(graph_element.attrib['from']).group(1)))
+            self.edge_ends.append(int(self.id_regex.search(graph_element.attrib['to']).group(1)))
+            self.edges.add(graph_element)
+        else:
+            return False
+        return True
+
+    def build(self) -> GraphColumns:
+        """
+        Build the columns of the graph out of everything read so far
+
+        Returns:
+            GraphColumns
+        """
+        node_feature_names, node_columns, node_categories = self.nodes.build()
+        edge_feature_names, edge_columns, edge_categories = self.edges.build()
+
+        # Add the coordinates to their own variable
+        if node_feature_names is None or 'x' not in node_feature_names or 'y' not in node_feature_names:
+            print('Graph does not contain x or y coordinates as features. '
+                  'Coordinates have to be specified in the gxl file as "x" and "y".')
+            raise InvalidFileException
+        node_positions = np.column_stack((node_columns['x'], node_columns['y'])).astype(np.float64)
+        # keep x and y as views on the positions
+        node_columns['x'], node_columns['y'] = node_positions[:, 0], node_positions[:, 1]
+
+        # minimal node id -> used to shift the edge indexing to 0 (in case node enumeration does not start with 0)
+        shift = min(self.node_ids) if len(self.node_ids) > 0 else 0
+        edges = np.empty((len(self.edge_starts), 2), dtype=np.int32)
+        edges[:, 0] = np.frombuffer(self.edge_starts, dtype=np.int64) - shift
+        edges[:, 1] = np.frombuffer(self.edge_ends, dtype=np.int64) - shift
+
+        return GraphColumns(node_positions, edges, node_feature_names, node_columns, node_categories,
+                            edge_feature_names, edge_columns, edge_categories)
+
+
+def iterparse_gxl(path_to_gxl: str):
+    """
+    Iterate over the graph, node and edge elements of a gxl file without keeping the element tree in memory.
+    The graph element is yielded when it starts (only its attributes are set), the nodes and edges once they
+    are complete. Every node and edge is cleared after it has been yielded.
+
+    Parameters:
+        path_to_gxl: path to the gxl file
+
+    Returns:
+        generator of elements
+    """
+    graph = None
+    for event, element in ET.iterparse(path_to_gxl, events=('start', 'end')):
+        if event == 'start':
+            if element.tag == 'graph':
+                if graph is not None:
+                    raise InvalidFileException
+                graph = element
+                yield element
+        elif element.tag in ('node', 'edge'):
+            yield element
+            # the node / edge has been read -> drop it (and its siblings) from the partially built tree
+            if graph is not None:
+                graph.clear()
@@ -0,0 +1,193 @@
+import os
+import re
+import threading
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from util.gxl_graph import iterparse_gxl, InvalidFileException
+
+
+class GxlSchema:
+    # number of bytes read at the end of a file to find an edge
+    tail_size = 64 * 1024
+    edge_regex = re.compile(rb'<edge\b[^>]*/>|<edge\b.*?</edge>', re.DOTALL)
+
+    def __init__(self, path_to_gxl: str) -> None:
+        """
+        This class reads the feature names and types of a gxl file without parsing the whole graph. The node
+        features are read on the first node, the edge features on the last edge at the end of the file (or on an
+        edge right after the first node if the end of the file does not contain one).
+
+        :param path_to_gxl: path to the gxl file
+        """
+        self.filepath = path_to_gxl
+        # {feature name: data type}
+        self.node_features = {}
+        self.edge_features = {}
+
+        self.probe()
+
+    def probe(self):
+        """
+        Read the first node (and the first edge if the end of the file does not contain one) of the gxl file. The
+        parsing stops at the element following the first node: if it is not an edge, the edges are only found after
+        every node and the file is treated as having no edge features.
+        """
+        last_edge = self.read_last_edge()
+        if last_edge is not None:
+            self.edge_features = self.get_feature_types(last_edge)
+
+        for element in iterparse_gxl(self.filepath):
+            if element.tag == 'node':
+                if self.node_features:
+                    break
+                self.node_features = self.get_feature_types(element)
+                if last_edge is not None:
+                    break
+            elif element.tag == 'edge':
+                if last_edge is None:
+                    self.edge_features = self.get_feature_types(element)
+                    last_edge = element
+                if self.node_features:
+                    break
+
+    def read_last_edge(self):
+        """
+        Look for a complete edge element at the end of the file
+
+        Returns:
+            edge element or None
+        """
+        with open(self.filepath, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            f.seek(max(0, f.tell() - self.tail_size))
+            tail = f.read()
+
+        edges = self.edge_regex.findall(tail)
+        if not edges:
+            return None
+        try:
+            return ET.fromstring(edges[-1])
+        except ET.ParseError:
+            return None
+
+    @staticmethod
+    def get_feature_types(graph_element) -> dict:
+        """
+        Get the feature names and data types of a node or edge element
+
+        Parameters:
+            graph_element: node or edge element
+
+        Returns:
+            dict {feature name: data type ('string', 'float' or 'int')}
+        """
+        return {feature.attrib['name']: feature[0].tag for feature in graph_element if len(feature) > 0}
+
+
+class GxlDirSchema:
+    def __init__(self, gxl_dir: str, max_workers: int = None) -> None:
+        """
+        This class probes the schema of every gxl file of a directory in background threads and merges them as
+        the files are probed, such that the features of the first files can be used before the whole directory is
+        probed.
+
+        :param gxl_dir: path to the gxl directory
+        :param max_workers: number of threads probing the files (None = default of ThreadPoolExecutor)
+        """
+        self.gxl_dir = gxl_dir
+        # {feature name: data type}, in the order of the first probed file where the feature appears
+        self.node_union, self.node_intersection = {}, {}
+        self.edge_union, self.edge_intersection = {}, {}
+        # number of files probed so far and files that could not be probed
+        self.nb_of_files = 0
+        self.failed = []
+        self.done = False
+
+        self._lock = threading.Lock()
+        self._cancelled = threading.Event()
+        self._thread = threading.Thread(target=self.scan, args=(max_workers,), name='GxlDirSchema', daemon=True)
+        self._thread.start()
+
+    def cancel(self):
+        """
+        Stop probing the directory (e.g. when another directory is chosen)
+        """
+        self._cancelled.set()
+
+    def join(self):
+        """
+        Wait until every file is probed
+        """
+        self._thread.join()
+
+    def scan(self, max_workers):
+        try:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor, os.scandir(self.gxl_dir) as entries:
+                for entry in entries:
+                    if self._cancelled.is_set():
+                        executor.shutdown(cancel_futures=True)
+                        return
+                    if entry.name.lower().endswith('.gxl') and entry.is_file():
+                        executor.submit(self.probe, entry.path).add_done_callback(partial(self.add, entry.path))
+        except OSError:
+            pass
+        finally:
+            self.done = True
+
+    def add(self, filepath, future):
+        """
+        Merge the schema of a probed file (called by the probing threads)
+
+        Parameters:
+            filepath: path to the gxl file
+            future: Future of the GxlSchema of the file (None if it could not be probed)
+        """
+        if future.cancelled():
+            return
+        schema = future.result()
+        with self._lock:
+            if schema is None:
+                self.failed.append(filepath)
+                return
+            if self.nb_of_files == 0:
+                self.node_intersection = dict(schema.node_features)
+                self.edge_intersection = dict(schema.edge_features)
+            self.nb_of_files += 1
+            self.node_intersection = self.merge(self.node_union, self.node_intersection, schema.node_features)
+            self.edge_intersection = self.merge(self.edge_union, self.edge_intersection, schema.edge_features)
+
+    def get_node_intersection(self) -> list:
+        """
+        Get the node features every file probed so far has (to be called by the GUI thread)
+
+        Returns:
+            list of feature names, in the order of the first probed file
+        """
+        with self._lock:
+            return list(self.node_intersection)
+
+    @staticmethod
+    def merge(union, intersection, features) -> dict:
+        """
+        Add the features of a file to the union and intersect them with the intersection
+
+        Parameters:
+            union: union of the features so far (updated in place)
+            intersection: intersection of the features so far
+            features: features of the file
+
+        Returns:
+            dict, the new intersection
+        """
+        for name, data_type in features.items():
+            union.setdefault(name, data_type)
+        return {name: data_type for name, data_type in intersection.items() if name in features}
+
+    @staticmethod
+    def probe(filepath):
+        try:
+            return GxlSchema(filepath)
+        except (OSError, ET.ParseError, InvalidFileException):
+            return None
@@ -0,0 +1,143 @@
+import threading
+from collections import namedtuple
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from util.stats import stats
+
+# options of the saved images:
+# - format: one of formats
+# - quality: quality of jpeg and webp, from 1 to 100 (None = default of OpenCV)
+# - compression: compression level of png, from 0 (fastest) to 9 (smallest) (None = default of OpenCV)
+# - max_size: the images are downscaled such that their width and height are at most max_size (None = full size)
+EncodeOptions = namedtuple('EncodeOptions', ['format', 'quality', 'compression', 'max_size'],
+                           defaults=('png', None, None, None))
+
+# {format: extension of the files}
+formats = {'png': 'png', 'jpeg': 'jpg', 'webp': 'webp', 'webp_lossless': 'webp'}
+
+
+def extension(options: EncodeOptions = None) -> str:
+    """
+    Get the extension of the images saved with some options
+
+    Parameters:
+        options: EncodeOptions (None = default options)
+
+    Returns:
+        extension without dot
+    """
+    options = options or EncodeOptions()
+    if options.format not in formats:
+        raise ValueError(f'Unknown image format {options.format}, expected one of {", ".join(formats)}')
+    return formats[options.format]
+
+
+def encode_image(image: np.ndarray, options: EncodeOptions = None) -> np.ndarray:
+    """
+    Encode an RGB image (OpenCV releases the GIL while encoding, such that it can run in a thread)
+
+    Parameters:
+        image: RGB image
+        options: EncodeOptions (None = default options)
+
+    Returns:
+        np.ndarray with the bytes of the encoded image
+    """
+    options = options or EncodeOptions()
+    ext = extension(options)
+
+    if options.max_size is not None and max(image.shape[:2]) > options.max_size:
+        factor = options.max_size / max(image.shape[:2])
+        size = (max(1, round(image.shape[1] * factor)), max(1, round(image.shape[0] * factor)))
+        with stats.stage('downscale'):
+            image = cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+
+    params = []
+    if options.format == 'png' and options.compression is not None:
+        params = [cv2.IMWRITE_PNG_COMPRESSION, max(0, min(9, int(options.compression)))]
+    elif options.format == 'jpeg' and options.quality is not None:
+        params = [cv2.IMWRITE_JPEG_QUALITY, max(1, min(100, int(options.quality)))]
+    elif options.format == 'webp' and options.quality is not None:
+        params = [cv2.IMWRITE_WEBP_QUALITY, max(1, min(100, int(options.quality)))]
+    elif options.format == 'webp_lossless':
+        # a quality above 100 is lossless
+        params = [cv2.IMWRITE_WEBP_QUALITY, 101]
+
+    # jpeg has no alpha channel
+    conversion = cv2.COLOR_RGB2BGR if options.format == 'jpeg' else cv2.COLOR_RGB2BGRA
+    with stats.stage('encode'):
+        success, encoded = cv2.imencode(f'.{ext}', cv2.cvtColor(image, conversion), params)
+    if not success:
+        raise OSError(f'Could not encode the image as {options.format}')
+    return encoded
+
+
+def write_image(image: np.ndarray, output_file: str, options: EncodeOptions = None) -> str:
+    """
+    Encode an RGB image and write it
+
+    Parameters:
+        image: RGB image
+        output_file: path to the written file
+        options: EncodeOptions (None = default options)
+
+    Returns:
+        output_file
+    """
+    encoded = encode_image(image, options)
+    try:
+        with stats.stage('write'), open(output_file, 'wb') as f:
+            f.write(encoded.data)
+    except OSError as e:
+        raise OSError(f'Could not write {output_file}: {e}') from e
+    return output_file
+
+
+class ImageEncoder:
+    def __init__(self, max_workers: int = 2) -> None:
+        """
+        This class encodes and writes images in background threads, such that the next image can be drawn while
+        the previous one is encoded. At most 2 * max_workers images wait to be encoded: submit blocks when there
+        are more, such that the memory used stays bounded when drawing is faster than encoding.
+
+        :param max_workers: number of threads encoding the images (0 = encode in the calling thread)
+        """
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='ImageEncoder') \
+            if max_workers > 0 else None
+        self._slots = threading.BoundedSemaphore(2 * max(1, max_workers))
+
+    def submit(self, function, *args) -> Future:
+        """
+        Run a function writing an image (e.g. write_image) in a background thread
+
+        Parameters:
+            function: function to run
+            args: parameters of the function
+
+        Returns:
+            Future with the result of the function
+        """
+        if self._executor is None:
+            future = Future()
+            try:
+                future.set_result(function(*args))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+
+        self._slots.acquire()
+        try:
+            future = self._executor.submit(function, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
@@ -0,0 +1,115 @@
+import os
+import re
+
+
+class ImageIndex:
+    # supported image extensions, the first one is preferred when several images match
+    extensions = ('png', 'bmp', 'jpg', 'jpeg', 'gif')
+    # the names are split in tokens at the other characters (e.g. '_', '-', '.' or ' ')
+    token_regex = re.compile(r'[^\W_]+')
+
+    def __init__(self, img_dir: str) -> None:
+        """
+        This class indexes the images of a directory to find the image of a gxl file without listing the directory
+        again. The images whose name (without extension) is the name of the gxl file are preferred, then the images
+        whose name starts with it, then the images whose name contains it (the first name in sorted order). The
+        names are matched on whole tokens (e.g. 'graph_1' is found in 'graph_1_overlay' but not in 'graph_10'), such
+        that every part of a name that can be matched is a key of a dict and a lookup does not search the names.
+        Among several candidates, the extension order of `extensions` decides, then the file name.
+        The index is refreshed when the modification time of the directory changes (image added / removed).
+
+        :param img_dir: path to the image directory
+        """
+        self.img_dir = img_dir
+        self._mtime = None
+        # {file name: normalized stem}
+        self._files = {}
+        # {normalized stem: [file names]}
+        self._stems = {}
+        # {run of tokens: first stem (in sorted order) starting with / containing it}
+        self._prefixes = {}
+        self._substrings = {}
+        # {gxl file name: image path or None}
+        self._lookups = {}
+
+        self.refresh()
+
+    def __len__(self):
+        return len(self._files)
+
+    @staticmethod
+    def split_name(filename):
+        """
+        Split an image file name in normalized stem and extension
+
+        Returns:
+            tuple (str, str) or None if the file is not an image
+        """
+        stem, ext = os.path.splitext(filename)
+        ext = ext[1:].lower()
+        if ext not in ImageIndex.extensions:
+            return None
+        return os.path.normcase(stem), ext
+
+    def refresh(self):
+        """
+        Update the index if the directory changed since the last scan. Only the added and removed images are
+        updated in the stem index, the runs of tokens are indexed again.
+        """
+        mtime = os.stat(self.img_dir).st_mtime_ns
+        if mtime == self._mtime:
+            return
+
+        with os.scandir(self.img_dir) as entries:
+            files = {}
+            for entry in entries:
+                split = self.split_name(entry.name)
+                if split is not None and entry.is_file():
+                    files[entry.name] = split[0]
+
+        for filename in self._files.keys() - files.keys():
+            stem = self._files[filename]
+            self._stems[stem].remove(filename)
+            if not self._stems[stem]:
+                del self._stems[stem]
+        for filename in files.keys() - self._files.keys():
+            self._stems.setdefault(files[filename], []).append(filename)
+
+        self._files = files
+        self._prefixes, self._substrings = {}, {}
+        for stem in sorted(self._stems):
+            spans = [match.span() for match in self.token_regex.finditer(stem)]
+            for i, (start, _) in enumerate(spans):
+                for _, end in spans[i:]:
+                    if start == 0:
+                        self._prefixes.setdefault(stem[start:end], stem)
+                    self._substrings.setdefault(stem[start:end], stem)
+        self._lookups.clear()
+        self._mtime = mtime
+
+    def best(self, filenames):
+        """
+        Get the image with the preferred extension among candidate file names
+        """
+        return min(filenames, key=lambda name: (self.extensions.index(self.split_name(name)[1]), name))
+
+    def lookup(self, gxl_filename):
+        """
+        Find the image corresponding to a gxl file
+
+        Parameters:
+            gxl_filename: name of the gxl file (without extension)
+
+        Returns:
+            path to the image or None if there is none
+        """
+        self.refresh()
+        if gxl_filename in self._lookups:
+            return self._lookups[gxl_filename]
+
+        name = os.path.normcase(gxl_filename)
+        stem = name if name in self._stems else self._prefixes.get(name) or self._substrings.get(name)
+        candidates = self._stems.get(stem)
+        img_filepath = os.path.join(self.img_dir, self.best(candidates)) if candidates else None
+        self._lookups[gxl_filename] = img_filepath
+        return img_filepath
@@ -0,0 +1,142 @@
+import os
+import threading
+from collections import OrderedDict
+
+
+class LRUCache:
+    def __init__(self, max_bytes: int) -> None:
+        """
+        This class keeps values in memory up to a budget of bytes, the least recently used values are evicted first.
+        It can be shared between threads.
+
+        :param max_bytes: maximal number of bytes of all the cached values
+        """
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._entries = OrderedDict()  # {key: (value, nbytes)}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key):
+        """
+        Get a cached value and mark it as recently used
+
+        Parameters:
+            key: key of the value
+
+        Returns:
+            cached value or None if it is not in the cache
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def pop(self, key):
+        """
+        Remove a cached value and return it, e.g. a value that is going to be modified (its size would change while
+        it is in the cache)
+
+        Parameters:
+            key: key of the value
+
+        Returns:
+            cached value or None if it is not in the cache
+        """
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.nbytes -= entry[1]
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value, nbytes: int):
+        """
+        Add a value to the cache, evicting the least recently used values if the budget is exceeded.
+        Values bigger than the whole budget are not cached.
+
+        Parameters:
+            key: key of the value
+            value: value to cache
+            nbytes: size of the value in bytes
+        """
+        if nbytes > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self.nbytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, nbytes)
+            self.nbytes += nbytes
+            while self.nbytes > self.max_bytes:
+                _, (_, evicted_nbytes) = self._entries.popitem(last=False)
+                self.nbytes -= evicted_nbytes
+                self.evictions += 1
+
+    def resize(self, key, nbytes: int):
+        """
+        Update the size of a cached value that grew or shrank, evicting the least recently used values if the budget
+        is exceeded. A value that is not cached (e.g. evicted in the meantime) is not added again.
+
+        Parameters:
+            key: key of the value
+            nbytes: new size of the value in bytes
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            self.nbytes += nbytes - entry[1]
+            if nbytes > self.max_bytes:
+                del self._entries[key]
+                self.nbytes -= nbytes
+            else:
+                self._entries[key] = (entry[0], nbytes)
+            while self.nbytes > self.max_bytes:
+                _, (_, evicted_nbytes) = self._entries.popitem(last=False)
+                self.nbytes -= evicted_nbytes
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    def stats(self) -> dict:
+        """
+        Get the usage statistics of the cache
+
+        Returns:
+            dict with the number of entries, bytes used, hits, misses and evictions
+        """
+        return {'entries': len(self._entries), 'nbytes': self.nbytes, 'max_bytes': self.max_bytes,
+                'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions}
+
+
+def file_key(filepath: str) -> tuple:
+    """
+    Key identifying the current version of a file
+
+    Parameters:
+        filepath: path to the file
+
+    Returns:
+        tuple (str, int, int)
+        absolute path, modification time and size of the file
+    """
+    stat = os.stat(filepath)
+    return os.path.abspath(filepath), stat.st_mtime_ns, stat.st_size
@@ -0,0 +1,42 @@
+from concurrent.futures import ThreadPoolExecutor
+
+
+class Prefetcher:
+    def __init__(self, max_workers: int = 2) -> None:
+        """
+        This class runs prefetching tasks (e.g. filling caches with the files the user will probably open next) in
+        background threads. Each call of prefetch replaces the tasks of the previous call which are not started yet.
+
+        :param max_workers: number of threads running the tasks
+        """
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='Prefetcher')
+        self._futures = []
+
+    def prefetch(self, tasks):
+        """
+        Run tasks in the background, in the given order (the most likely needed first)
+
+        Parameters:
+            tasks: functions without parameters
+        """
+        for future in self._futures:
+            future.cancel()
+        self._futures = [self._executor.submit(self.run, task) for task in tasks]
+
+    def cancel(self):
+        """
+        Drop the tasks which are not started yet
+        """
+        self.prefetch([])
+
+    @staticmethod
+    def run(task):
+        # errors are ignored, they are raised again when the file is actually opened
+        try:
+            task()
+        except Exception:
+            pass
+
+    def shutdown(self):
+        self.cancel()
+        self._executor.shutdown(wait=False)
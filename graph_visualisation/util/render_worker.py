@@ -0,0 +1,90 @@
+import queue
+import threading
+
+
+class RenderWorker:
+    def __init__(self) -> None:
+        """
+        This class runs drawing tasks in a background thread, such that the GUI stays responsive while a graph is
+        drawn. Only the latest request counts: a task submitted while another one is waiting replaces it, and the
+        results of the tasks submitted before the latest one are dropped.
+        """
+        # number of the latest request, the results of older requests are stale
+        self.generation = 0
+
+        self._pending = None  # (generation, task) waiting for the thread
+        self._running = False
+        self._condition = threading.Condition()
+        self._results = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='RenderWorker', daemon=True)
+        self._thread.start()
+
+    @property
+    def busy(self) -> bool:
+        """
+        True while a task is waiting or running
+        """
+        with self._condition:
+            return self._pending is not None or self._running
+
+    def submit(self, task) -> int:
+        """
+        Run a task in the background thread, replacing the task waiting if there is one
+
+        Parameters:
+            task: function without parameters returning the result
+
+        Returns:
+            generation of the request
+        """
+        with self._condition:
+            self.generation += 1
+            self._pending = (self.generation, task)
+            self._condition.notify()
+            return self.generation
+
+    def cancel(self):
+        """
+        Drop the task waiting and the result of the task running
+        """
+        with self._condition:
+            self.generation += 1
+            self._pending = None
+
+    def poll(self):
+        """
+        Get the result of the latest request if it is done (to be called by the GUI thread)
+
+        Returns:
+            tuple (int, result, Exception) generation, result and error (None if the task succeeded), or None if
+            the result of the latest request is not available
+        """
+        latest = None
+        while True:
+            try:
+                result = self._results.get_nowait()
+            except queue.Empty:
+                return latest
+            if result[0] == self.generation:
+                latest = result
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while self._pending is None:
+                    self._condition.wait()
+                generation, task = self._pending
+                self._pending = None
+                self._running = True
+
+            try:
+                result, error = task(), None
+            except Exception as e:
+                result, error = None, e
+
+            with self._condition:
+                # the result is queued before the thread is marked as idle, such that a consumer seeing the worker
+                # idle finds it in the queue
+                if generation == self.generation:
+                    self._results.put((generation, result, error))
+                self._running = False
@@ -0,0 +1,166 @@
+from collections.abc import Sequence
+
+import numpy as np
+
+
+class SearchResult(Sequence):
+    def __init__(self, names, indices) -> None:
+        """
+        This class is a read-only view of the names matching a search, the names are only looked up when they are
+        accessed (e.g. by the visible rows of a VirtualListbox).
+
+        :param names: all the names
+        :param indices: np.ndarray with the indices of the matching names, in the order of the result
+        """
+        self.names = names
+        self.indices = indices
+
+    def __len__(self):
+        return len(self.indices)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.names[i] for i in self.indices[index].tolist()]
+        return self.names[self.indices[index]]
+
+
+class SearchIndex:
+    def __init__(self, names) -> None:
+        """
+        This class searches a list of names case-insensitively. The result lists the names starting with the query,
+        then the names containing it, then the names containing its characters in the same order (fuzzy match),
+        each group in the order of the names.
+
+        The case-folded names are stored as a matrix of bytes, one row per name. The positions where a character
+        of the query occurs are packed in 64 bits words, such that the matches of all the names are updated with a
+        few numpy operations per character. The matches of every prefix of the current query are kept: typing a
+        character only narrows the previous matches, and erasing one goes back to them.
+
+        :param names: list of names
+        """
+        self.names = list(names)
+        encoded = [name.casefold().encode('utf-8') for name in self.names]
+        # number of bytes (multiple of 8) and of 64 bits words per name
+        width = max(8, -(-max(map(len, encoded), default=0) // 8) * 8)
+        self.nb_words = -(-width // 64)
+        # (nb of names, width) uint8, padded with 0 (which never matches a character)
+        self._bytes = np.frombuffer(b''.join(e.ljust(width, b'\0') for e in encoded),
+                                    dtype=np.uint8).reshape(len(encoded), width)
+
+        # [(query, candidates, bytes, rows, fuzzy, starts)] for every prefix of the query:
+        # - candidates: indices of the names matching the query (fuzzy match)
+        # - bytes, rows: the candidates are the rows of bytes (all the rows if rows is None), the bytes are only
+        #   copied once most of their rows do not match anymore
+        # - fuzzy: (nb of candidates, nb_words) bit mask of the positions after the earliest fuzzy match
+        # - starts: (nb of candidates, nb_words) bit mask of the positions where the query starts
+        all_bits = np.full((len(self.names), self.nb_words), np.iinfo(np.uint64).max, dtype=np.uint64)
+        self._states = [(b'', np.arange(len(self.names)), self._bytes, None, all_bits, all_bits)]
+
+    def __len__(self):
+        return len(self.names)
+
+    def search(self, query: str) -> SearchResult:
+        """
+        Find the names matching a query
+
+        Parameters:
+            query: searched string (case insensitive)
+
+        Returns:
+            SearchResult with the matching names, prefix matches first, then substring and fuzzy matches
+        """
+        query = query.casefold().encode('utf-8')
+        while not query.startswith(self._states[-1][0]):
+            self._states.pop()
+        for length in range(len(self._states[-1][0]), len(query)):
+            self._states.append(self.narrow(self._states[-1], query[length]))
+
+        _, candidates, _, _, _, starts = self._states[-1]
+        if len(query) == 0:
+            return SearchResult(self.names, candidates)
+        prefix = (starts[:, 0] & np.uint64(1)) != 0
+        substring = (starts != 0).any(axis=1)
+        return SearchResult(self.names, np.concatenate([candidates[prefix], candidates[substring & ~prefix],
+                                                        candidates[~substring]]))
+
+    def narrow(self, state, character: int) -> tuple:
+        """
+        Add a character to the query of a state and keep the candidates still matching
+
+        Parameters:
+            state: state of the query (see _states)
+            character: byte added to the query
+
+        Returns:
+            state of the new query
+        """
+        query, candidates, candidate_bytes, rows, fuzzy, starts = state
+        # bit p is set where the character is at position p
+        packed = np.packbits(candidate_bytes == character, axis=1, bitorder='little')
+        if packed.shape[1] != self.nb_words * 8:
+            packed = np.concatenate([packed, np.zeros((len(packed), self.nb_words * 8 - packed.shape[1]),
+                                                      dtype=np.uint8)], axis=1)
+        occurrences = packed.view(np.uint64)
+        if rows is not None:
+            occurrences = occurrences[rows]
+
+        # the query starts at p if the previous query started there and the character is at p + len(previous query)
+        starts = starts & self.shift_right(occurrences, len(query))
+
+        # the earliest fuzzy match ends at the first occurrence after the previous one
+        after = occurrences & fuzzy
+        matching = (after != 0).any(axis=1)
+        fuzzy = self.bits_above_lowest(after)
+
+        if not matching.all():
+            candidates, fuzzy, starts = candidates[matching], fuzzy[matching], starts[matching]
+            rows = np.flatnonzero(matching) if rows is None else rows[matching]
+            if 2 * len(rows) < len(candidate_bytes):
+                candidate_bytes, rows = candidate_bytes[rows], None
+        return query + bytes([character]), candidates, candidate_bytes, rows, fuzzy, starts
+
+    @staticmethod
+    def shift_right(words, shift: int) -> np.ndarray:
+        """
+        Shift multi-word bit masks towards the lower bits
+
+        Parameters:
+            words: (n, nb of words) uint64, the first word holds the lowest bits
+            shift: number of bits
+
+        Returns:
+            np.ndarray (n, nb of words) uint64
+        """
+        word_shift, bit_shift = divmod(shift, 64)
+        shifted = np.zeros_like(words)
+        nb_words = words.shape[1] - word_shift
+        if nb_words <= 0:
+            return shifted
+        shifted[:, :nb_words] = words[:, word_shift:] >> np.uint64(bit_shift)
+        if bit_shift > 0 and nb_words > 1:
+            shifted[:, :nb_words - 1] |= words[:, word_shift + 1:] << np.uint64(64 - bit_shift)
+        return shifted
+
+    @staticmethod
+    def bits_above_lowest(words) -> np.ndarray:
+        """
+        Get the bits strictly above the lowest set bit of multi-word bit masks (no bit for an empty mask)
+
+        Parameters:
+            words: (n, nb of words) uint64, the first word holds the lowest bits
+
+        Returns:
+            np.ndarray (n, nb of words) uint64
+        """
+        one = np.uint64(1)
+        lowest = words & (~words + one)
+        # in the word of the lowest bit, all the bits above it (nothing in the empty words)
+        above = ~((lowest << one) - one)
+        if words.shape[1] == 1:
+            return above
+        # the words after the one holding the lowest bit are full, the words before it empty
+        first_word = (words != 0).argmax(axis=1)[:, None]
+        word_index = np.arange(words.shape[1])[None, :]
+        all_bits = np.uint64(np.iinfo(np.uint64).max)
+        above = np.where(word_index > first_word, all_bits, np.where(word_index == first_word, above, 0))
+        return np.where((words != 0).any(axis=1)[:, None], above, 0).astype(np.uint64)
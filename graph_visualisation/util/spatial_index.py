@@ -0,0 +1,225 @@
+import numpy as np
+
+
+class SpatialIndex:
+    # average number of nodes per cell of the grid
+    nodes_per_cell = 4
+    # edges whose bounding box is wider or higher than this number of cells are tested at every query
+    max_edge_cells = 4
+    # number of cells of the edge density texture along the longer side of the grid
+    texture_size = 1024
+
+    def __init__(self, node_positions: np.ndarray, edges: np.ndarray = None, on_resize=None) -> None:
+        """
+        This class indexes the nodes of a graph in a uniform grid, such that the nodes and the edges in a rectangle
+        (e.g. the visible part of the image) and the node nearest to a point (e.g. under the mouse) are found
+        without going through the whole graph.
+        The nodes are sorted by cell: the nodes of a cell are a slice of node_order, and the cells of a row of the
+        grid are contiguous. The edges are indexed by the cell of their first node, the long edges are kept apart.
+        The index is in the coordinates of the gxl file, a rectangle in pixels is divided by the scaling first.
+
+        :param node_positions: (N, 2) array with the x, y coordinates of the nodes
+        :param edges: (E, 2) array with the indices of the connected nodes (None = no edges)
+        :param on_resize: function without parameters called when an array built on request makes the index bigger
+        (None = no call)
+        """
+        positions = np.asarray(node_positions, dtype=np.float64).reshape(-1, 2)
+        self.positions = positions
+        self.edges = np.empty((0, 2), dtype=np.int32) if edges is None else np.asarray(edges).reshape(-1, 2)
+
+        if len(positions) > 0:
+            self.low, self.high = positions.min(axis=0), positions.max(axis=0)
+        else:
+            self.low, self.high = np.zeros(2), np.zeros(2)
+        extent = np.maximum(self.high - self.low, 1e-9)
+        # square cells holding nodes_per_cell nodes on average
+        self.cell_size = max(float(np.sqrt(extent[0] * extent[1] * self.nodes_per_cell / max(len(positions), 1))),
+                             float(extent.max()) / 4096, 1e-9)
+        self.columns, self.rows = (np.floor(extent / self.cell_size).astype(np.int64) + 1).tolist()
+
+        # nodes sorted by cell, cell_starts[c]:cell_starts[c + 1] are the positions in node_order of the cell c
+        cells = self.get_cells(positions)
+        self.node_order = np.argsort(cells, kind='stable').astype(np.int32)
+        self.cell_starts = np.searchsorted(cells[self.node_order], np.arange(self.columns * self.rows + 1))
+
+        # bounding boxes of the edges
+        if len(self.edges) > 0:
+            ends = positions[self.edges]  # (E, 2, 2)
+            self.edge_low, self.edge_high = ends.min(axis=1), ends.max(axis=1)
+        else:
+            self.edge_low, self.edge_high = np.empty((0, 2)), np.empty((0, 2))
+        # short edges sorted by the cell of their first node, long edges tested at every query
+        self.max_edge_size = self.max_edge_cells * self.cell_size
+        long = ((self.edge_high - self.edge_low) > self.max_edge_size).any(axis=1)
+        self.long_edges = np.flatnonzero(long).astype(np.int32)
+        short = np.flatnonzero(~long)
+        edge_cells = cells[self.edges[short, 0]] if len(short) > 0 else np.empty(0, dtype=np.int64)
+        order = np.argsort(edge_cells, kind='stable')
+        self.edge_order = short[order].astype(np.int32)
+        self.edge_cell_starts = np.searchsorted(edge_cells[order], np.arange(self.columns * self.rows + 1))
+        # built the first time they are requested (see get_long_edges and get_edge_texture)
+        self._edges_by_size = None
+        self._edge_texture = None
+        self.on_resize = on_resize
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Number of bytes of the arrays of the index (the positions and the edges belong to the graph)
+        """
+        arrays = [self.node_order, self.cell_starts, self.edge_low, self.edge_high, self.long_edges, self.edge_order,
+                  self.edge_cell_starts, *(self._edges_by_size or ()), *(self._edge_texture or ())[:1]]
+        return sum(a.nbytes for a in arrays)
+
+    def get_cells(self, positions) -> np.ndarray:
+        """
+        Get the cell of points (clipped to the grid)
+
+        Parameters:
+            positions: (N, 2) array of coordinates
+
+        Returns:
+            np.ndarray (N,) int64 row * columns + column
+        """
+        cell = np.floor((positions - self.low) / self.cell_size).astype(np.int64)
+        np.clip(cell[:, 0], 0, self.columns - 1, out=cell[:, 0])
+        np.clip(cell[:, 1], 0, self.rows - 1, out=cell[:, 1])
+        return cell[:, 1] * self.columns + cell[:, 0]
+
+    def get_cell_range(self, x0, y0, x1, y1):
+        """
+        Get the columns and the rows of the cells intersecting a rectangle (None if it is outside of the grid)
+        """
+        c0, r0 = np.floor((np.array([x0, y0]) - self.low) / self.cell_size).astype(np.int64).tolist()
+        c1, r1 = np.floor((np.array([x1, y1]) - self.low) / self.cell_size).astype(np.int64).tolist()
+        if c1 < 0 or r1 < 0 or c0 >= self.columns or r0 >= self.rows or c1 < c0 or r1 < r0:
+            return None
+        return max(c0, 0), max(r0, 0), min(c1, self.columns - 1), min(r1, self.rows - 1)
+
+    def gather(self, order, starts, x0, y0, x1, y1) -> np.ndarray:
+        """
+        Get the elements of the cells intersecting a rectangle (one slice per row of cells)
+        """
+        cell_range = self.get_cell_range(x0, y0, x1, y1)
+        if cell_range is None:
+            return np.empty(0, dtype=order.dtype)
+        c0, r0, c1, r1 = cell_range
+        if c0 == 0 and r0 == 0 and c1 == self.columns - 1 and r1 == self.rows - 1:
+            return order
+        return np.concatenate([order[starts[row * self.columns + c0]:starts[row * self.columns + c1 + 1]]
+                               for row in range(r0, r1 + 1)])
+
+    def query_nodes(self, x0, y0, x1, y1, margin=0.0) -> np.ndarray:
+        """
+        Find the nodes in a rectangle (borders included)
+
+        Parameters:
+            x0, y0, x1, y1: left, top, right and bottom of the rectangle
+            margin: the nodes up to this distance outside of the rectangle are included (e.g. the biggest radius)
+
+        Returns:
+            np.ndarray increasing indices of the nodes
+        """
+        x0, y0, x1, y1 = x0 - margin, y0 - margin, x1 + margin, y1 + margin
+        nodes = self.gather(self.node_order, self.cell_starts, x0, y0, x1, y1)
+        if len(nodes) == len(self.positions) and (self.low >= (x0, y0)).all() and (self.high <= (x1, y1)).all():
+            return np.arange(len(nodes))
+        xs, ys = self.positions[nodes, 0], self.positions[nodes, 1]
+        return np.sort(nodes[(xs >= x0) & (xs <= x1) & (ys >= y0) & (ys <= y1)])
+
+    def query_edges(self, x0, y0, x1, y1, margin=0.0) -> np.ndarray:
+        """
+        Find the edges whose bounding box intersects a rectangle (borders included)
+
+        Parameters:
+            x0, y0, x1, y1: left, top, right and bottom of the rectangle
+            margin: the bounding boxes are enlarged by this distance (e.g. half the thickness of the edges)
+
+        Returns:
+            np.ndarray increasing indices of the edges
+        """
+        x0, y0, x1, y1 = x0 - margin, y0 - margin, x1 + margin, y1 + margin
+        # the first node of an edge intersecting the rectangle is at most max_edge_size outside of it
+        size = self.max_edge_size
+        edges = np.concatenate([self.gather(self.edge_order, self.edge_cell_starts, x0 - size, y0 - size,
+                                            x1 + size, y1 + size), self.long_edges])
+        low, high = self.edge_low[edges], self.edge_high[edges]
+        return np.sort(edges[(high[:, 0] >= x0) & (low[:, 0] <= x1) & (high[:, 1] >= y0) & (low[:, 1] <= y1)])
+
+    def get_long_edges(self, min_size) -> np.ndarray:
+        """
+        Find the edges whose bounding box is at least min_size wide or high. The edges are sorted by size once, such
+        that the cost of a query does not depend on the number of edges.
+
+        Parameters:
+            min_size: minimal width or height
+
+        Returns:
+            np.ndarray indices of the edges, the biggest first
+        """
+        if self._edges_by_size is None:
+            sizes = (self.edge_high - self.edge_low).max(axis=1).astype(np.float32)
+            order = np.argsort(-sizes, kind='stable')
+            self._edges_by_size = (order.astype(np.int32), -sizes[order])
+            if self.on_resize is not None:
+                self.on_resize()
+        order, negative_sizes = self._edges_by_size
+        return order[:np.searchsorted(negative_sizes, -min_size, side='right')]
+
+    def get_edge_texture(self) -> tuple:
+        """
+        Get the number of ends and middles of edges in the cells of a grid covering the nodes (texture_size cells
+        along its longer side), computed once. Resampled to a drawing, it shows where the edges are without drawing
+        them.
+
+        Returns:
+            tuple (np.ndarray, float, float, float)
+            (rows, columns) float32 counts, x and y of the top left corner of the grid and size of its cells
+        """
+        if self._edge_texture is None:
+            extent = np.maximum(self.high - self.low, 1e-9)
+            cell = float(extent.max()) / (self.texture_size - 1)
+            columns, rows = (np.floor(extent / cell).astype(np.int64) + 1).tolist()
+            ends = self.positions[self.edges]  # (E, 2, 2)
+            samples = np.concatenate([ends[:, 0], ends[:, 1], ends.mean(axis=1)])
+            cells = np.floor((samples - self.low) / cell).astype(np.int64)
+            counts = np.bincount(np.minimum(cells[:, 1], rows - 1) * columns + np.minimum(cells[:, 0], columns - 1),
+                                 minlength=rows * columns).astype(np.float32).reshape(rows, columns)
+            self._edge_texture = (counts, float(self.low[0]), float(self.low[1]), cell)
+            if self.on_resize is not None:
+                self.on_resize()
+        return self._edge_texture
+
+    def nearest(self, x, y, max_distance=None):
+        """
+        Find the node nearest to a point, by searching squares of cells growing around it
+
+        Parameters:
+            x, y: coordinates of the point
+            max_distance: only the nodes up to this distance are considered (None = no limit)
+
+        Returns:
+            tuple (int, float) index of the node and its distance, or None if there is no node close enough
+        """
+        if len(self.positions) == 0:
+            return None
+        # distance from the point to the farthest corner of the grid, every node is within it
+        corners = np.array([[self.low[0], self.low[1]], [self.low[0] + self.columns * self.cell_size,
+                                                          self.low[1] + self.rows * self.cell_size]])
+        limit = float(np.hypot(*np.abs(corners - (x, y)).max(axis=0)))
+        if max_distance is not None:
+            limit = min(limit, max_distance)
+
+        radius = self.cell_size
+        while True:
+            radius = min(radius, limit)
+            nodes = self.gather(self.node_order, self.cell_starts, x - radius, y - radius, x + radius, y + radius)
+            if len(nodes) > 0:
+                distances = np.hypot(self.positions[nodes, 0] - x, self.positions[nodes, 1] - y)
+                best = int(np.argmin(distances))
+                # the nodes outside of the square are farther than radius
+                if distances[best] <= radius:
+                    return int(nodes[best]), float(distances[best])
+            if radius >= limit:
+                return None
+            radius *= 2
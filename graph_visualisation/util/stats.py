@@ -0,0 +1,165 @@
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+from util.default_config import profiling
+
+
+class Stats:
+    def __init__(self, enabled: bool = False) -> None:
+        """
+        This class measures the time spent in the stages of the drawing (e.g. parse, decode, draw, encode) and
+        counts events (e.g. cache hits). When it is disabled, stage returns a shared context doing nothing and count
+        returns immediately, such that the instrumented code runs at the same speed.
+        It can be shared between threads.
+
+        :param enabled: measure the stages from the start
+        """
+        self.enabled = enabled
+        # {stage: [count, total seconds, max seconds, last seconds]}
+        self.stages = {}
+        # {counter: value}
+        self.counters = {}
+
+        self._lock = threading.Lock()
+        # records of each thread (see record)
+        self._local = threading.local()
+
+    def reset(self):
+        with self._lock:
+            self.stages = {}
+            self.counters = {}
+
+    def stage(self, name: str):
+        """
+        Measure the time of a block of code
+
+        Parameters:
+            name: name of the stage
+
+        Returns:
+            context manager
+        """
+        if not self.enabled:
+            return _no_stage
+        return _Stage(self, name)
+
+    def merge(self, record: dict):
+        """
+        Add the stages and counters of a record (e.g. made in another process)
+
+        Parameters:
+            record: dict given by record
+        """
+        for name, value in record.items():
+            if isinstance(value, int):
+                self.count(name, value)
+            else:
+                self.add(name, value)
+
+    def add(self, name: str, seconds: float):
+        """
+        Add the time of a stage measured elsewhere (e.g. in another process)
+
+        Parameters:
+            name: name of the stage
+            seconds: duration of the stage
+        """
+        with self._lock:
+            stage = self.stages.get(name)
+            if stage is None:
+                self.stages[name] = [1, seconds, seconds, seconds]
+            else:
+                stage[0] += 1
+                stage[1] += seconds
+                stage[2] = max(stage[2], seconds)
+                stage[3] = seconds
+        for record in getattr(self._local, 'records', ()):
+            record[name] = record.get(name, 0.0) + seconds
+
+    def count(self, name: str, n: int = 1):
+        """
+        Increase a counter
+
+        Parameters:
+            name: name of the counter
+            n: increment
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+        for record in getattr(self._local, 'records', ()):
+            record[name] = record.get(name, 0) + n
+
+    def record(self):
+        """
+        Collect the time of the stages and the counters increased by the current thread in a block of code (e.g. the
+        drawing of one file)
+
+        Returns:
+            context manager giving a dict {stage: total seconds (float), counter: increase (int)}, which stays empty
+            when the stats are disabled
+        """
+        if not self.enabled:
+            return nullcontext({})
+        return self._record()
+
+    @contextmanager
+    def _record(self):
+        if not hasattr(self._local, 'records'):
+            self._local.records = []
+        record = {}
+        self._local.records.append(record)
+        try:
+            yield record
+        finally:
+            self._local.records.remove(record)
+
+    def snapshot(self) -> dict:
+        """
+        Get the measures so far
+
+        Returns:
+            dict with the stages {stage: {count, total, mean, max, last}} (seconds) and the counters
+        """
+        with self._lock:
+            stages = {name: {'count': count, 'total': total, 'mean': total / count, 'max': maximum, 'last': last}
+                      for name, (count, total, maximum, last) in self.stages.items()}
+            return {'stages': stages, 'counters': dict(self.counters)}
+
+    def format(self) -> list:
+        """
+        Get the measures as text, one line per stage or counter (e.g. for the overlay of the viewer)
+
+        Returns:
+            list of str
+        """
+        snapshot = self.snapshot()
+        lines = [f'{name}: {stage["last"] * 1000:.1f} ms (mean {stage["mean"] * 1000:.1f}, '
+                 f'max {stage["max"] * 1000:.1f}, {stage["count"]}x)'
+                 for name, stage in snapshot['stages'].items()]
+        lines += [f'{name}: {value}' for name, value in sorted(snapshot['counters'].items())]
+        return lines
+
+
+class _Stage:
+    __slots__ = ('stats', 'name', 'start')
+
+    def __init__(self, stats, name):
+        self.stats = stats
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.stats.add(self.name, time.perf_counter() - self.start)
+        return False
+
+
+_no_stage = nullcontext()
+
+# stats of the current process, enabled by profiling in the default config, by the viewer or by render_all.py
+stats = Stats(enabled=profiling)
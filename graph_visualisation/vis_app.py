@@ -1,7 +1,9 @@
+import os
 from tkinter import *
 from tkinter import ttk
 
-from util.default_config import nodes
+from util.default_config import nodes, save_all_workers, export_quality, export_compression, export_max_size
+from util.image_encoder import formats
 
 from gui.tk_factory import TkFactory
 
@@ -102,7 +104,7 @@ if __name__ == '__main__':
     lbf = ttk.Frame(mainframe)
     lbf.grid(column=0, row=4, columnspan=2)
 
-    listbox = tk_factory.create_listbox(lbf, 'gxl_listbox')
+    listbox = tk_factory.create_virtual_listbox(lbf, 'gxl_listbox')
     listbox.configure(height=15)
     listbox.pack(side=LEFT, fill=BOTH)
 
@@ -111,6 +113,10 @@ if __name__ == '__main__':
     scrollbar.pack(side=RIGHT, fill=Y)
 
     listbox['yscrollcommand'] = scrollbar.set
+
+    # number of gxl files (or progress while the directory is listed)
+    gxl_progress_label = tk_factory.create_label(mainframe, 'gxl_progress_label')
+    gxl_progress_label.grid(column=0, row=5, columnspan=2)
     listbox.bind('<<ListboxSelect>>', graph_viewer.onselect)
 
     gxl_search_label = tk_factory.create_label(mainframe, 'gxl_search_label')
@@ -128,6 +134,15 @@ if __name__ == '__main__':
     canvas = tk_factory.create_canvas(mainframe, 'canvas')
     canvas.configure(width=600, height=600, bg='white')
     canvas.grid(column=2, row=2, rowspan=6, columnspan=2, sticky='nsew')
+    # zoom with the mouse wheel (Button-4/5 on Linux), pan by dragging, double click to show the whole image again,
+    # click on a node to show its features
+    canvas.bind('<MouseWheel>', graph_viewer.zoom)
+    canvas.bind('<Button-4>', graph_viewer.zoom)
+    canvas.bind('<Button-5>', graph_viewer.zoom)
+    canvas.bind('<ButtonPress-1>', graph_viewer.start_pan)
+    canvas.bind('<B1-Motion>', graph_viewer.pan)
+    canvas.bind('<ButtonRelease-1>', graph_viewer.click)
+    canvas.bind('<Double-Button-1>', graph_viewer.reset_zoom)
 
     # Button to save current image
     save_button = tk_factory.create_button(mainframe, 'save_button', True)
@@ -139,6 +154,84 @@ if __name__ == '__main__':
     save_all_button.configure(text='Save All', command=graph_viewer.save_all)
     save_all_button.grid(column=0, row=11, columnspan=2)
 
+    # Number of processes, progress, pause / cancel buttons and errors of Save All
+    save_all_frame = ttk.Frame(mainframe)
+    save_all_frame.grid(column=0, row=12, columnspan=2)
+
+    save_all_workers_label = tk_factory.create_label(save_all_frame, 'save_all_workers_label')
+    save_all_workers_label.configure(text='Workers:')
+    save_all_workers_label.grid(column=0, row=0)
+    save_all_workers_entry = tk_factory.create_entry(save_all_frame, 'save_all_workers_entry')
+    save_all_workers_entry.configure(width=5, validate='key', validatecommand=(mainframe.register(is_int), '%P'))
+    save_all_workers_entry.insert(0, str(save_all_workers or os.cpu_count() or 1))
+    save_all_workers_entry.grid(column=1, row=0)
+    # draw all the images again, by default only those whose gxl file, image or style changed are drawn
+    save_all_rebuild_checkbutton = tk_factory.create_checkbutton(save_all_frame, 'save_all_rebuild_checkbutton')
+    save_all_rebuild_checkbutton.configure(text='Rebuild all', offvalue=False, onvalue=True,
+                                           variable=graph_viewer.save_all_rebuild)
+    save_all_rebuild_checkbutton.grid(column=2, row=0)
+
+    save_all_progressbar = tk_factory.create_progressbar(save_all_frame, 'save_all_progressbar')
+    save_all_progressbar.configure(orient=HORIZONTAL, length=200, mode='determinate', maximum=100)
+    save_all_progressbar.grid(column=0, row=1, columnspan=2)
+
+    save_all_label = tk_factory.create_label(save_all_frame, 'save_all_label')
+    save_all_label.grid(column=0, row=2, columnspan=2)
+
+    save_all_pause_button = tk_factory.create_button(save_all_frame, 'save_all_pause_button')
+    save_all_pause_button.configure(text='Pause', command=graph_viewer.pause_save_all, state=DISABLED)
+    save_all_pause_button.grid(column=0, row=3)
+    save_all_cancel_button = tk_factory.create_button(save_all_frame, 'save_all_cancel_button')
+    save_all_cancel_button.configure(text='Cancel', command=graph_viewer.cancel_save_all, state=DISABLED)
+    save_all_cancel_button.grid(column=1, row=3)
+
+    # files which could not be saved
+    save_all_errors = tk_factory.create_listbox(save_all_frame, 'save_all_errors')
+    save_all_errors.configure(height=4, width=40)
+    save_all_errors.grid(column=0, row=4, columnspan=2)
+
+    # Format, quality (jpeg / webp), compression level (png) and maximal size of the images saved by Save and Save All
+    export_frame = ttk.Frame(mainframe)
+    export_frame.grid(column=0, row=13, columnspan=2)
+
+    export_format_label = tk_factory.create_label(export_frame, 'export_format_label')
+    export_format_label.configure(text='Format:')
+    export_format_label.grid(column=0, row=0)
+    export_format_menu = tk_factory.create_option_menu(export_frame, 'export_format_menu', False,
+                                                       graph_viewer.export_format, *formats)
+    export_format_menu.grid(column=1, row=0)
+
+    # empty entries = default of OpenCV / full size
+    export_quality_label = tk_factory.create_label(export_frame, 'export_quality_label')
+    export_quality_label.configure(text='Quality (1-100):')
+    export_quality_label.grid(column=0, row=1)
+    export_quality_entry = tk_factory.create_entry(export_frame, 'export_quality_entry')
+    export_quality_entry.configure(width=6, validate='key', validatecommand=(mainframe.register(is_int), '%P'))
+    export_quality_entry.insert(0, '' if export_quality is None else str(export_quality))
+    export_quality_entry.grid(column=1, row=1)
+
+    export_compression_label = tk_factory.create_label(export_frame, 'export_compression_label')
+    export_compression_label.configure(text='PNG level (0-9):')
+    export_compression_label.grid(column=0, row=2)
+    export_compression_entry = tk_factory.create_entry(export_frame, 'export_compression_entry')
+    export_compression_entry.configure(width=6, validate='key', validatecommand=(mainframe.register(is_int), '%P'))
+    export_compression_entry.insert(0, '' if export_compression is None else str(export_compression))
+    export_compression_entry.grid(column=1, row=2)
+
+    export_max_size_label = tk_factory.create_label(export_frame, 'export_max_size_label')
+    export_max_size_label.configure(text='Max size:')
+    export_max_size_label.grid(column=0, row=3)
+    export_max_size_entry = tk_factory.create_entry(export_frame, 'export_max_size_entry')
+    export_max_size_entry.configure(width=6, validate='key', validatecommand=(mainframe.register(is_int), '%P'))
+    export_max_size_entry.insert(0, '' if export_max_size is None else str(export_max_size))
+    export_max_size_entry.grid(column=1, row=3)
+
+    # time of the stages of the drawing and cache statistics shown on the canvas
+    stats_checkbutton = tk_factory.create_checkbutton(mainframe, 'stats_checkbutton')
+    stats_checkbutton.configure(text='Show stats', command=graph_viewer.toggle_stats, offvalue=False, onvalue=True,
+                                variable=graph_viewer.show_stats)
+    stats_checkbutton.grid(column=0, row=14, columnspan=2)
+
     # Customisation on the right of the canvas
     right_canvas_frame = ttk.Frame(mainframe)
     right_canvas_frame.grid(column=6, row=2, columnspan=2, rowspan=12)
@@ -178,6 +271,30 @@ if __name__ == '__main__':
                                              color_by_feature, color_by_feature.get())
     cbf_menu.grid(column=1, row=10)
 
+    # Render mode: the graph or a heatmap of the nodes (optionally weighted by a numeric node feature or restricted
+    # to the nodes with a value of color by feature)
+    graph_viewer.render_mode.trace('w', graph_viewer.onselect)
+    render_mode_label = tk_factory.create_label(right_canvas_frame, 'render_mode_label', True)
+    render_mode_label.configure(text='Render mode:')
+    render_mode_label.grid(column=0, row=12)
+    render_mode_menu = tk_factory.create_option_menu(right_canvas_frame, 'render_mode_menu', True,
+                                                     graph_viewer.render_mode, 'graph', 'density')
+    render_mode_menu.grid(column=1, row=12)
+
+    density_weight_label = tk_factory.create_label(right_canvas_frame, 'density_weight_label', True)
+    density_weight_label.configure(text='Density weight:')
+    density_weight_label.grid(column=0, row=13)
+    density_weight_entry = tk_factory.create_entry(right_canvas_frame, 'density_weight_entry', True)
+    density_weight_entry.grid(column=1, row=13)
+    density_weight_entry.bind('<Return>', graph_viewer.onselect)
+
+    density_class_label = tk_factory.create_label(right_canvas_frame, 'density_class_label', True)
+    density_class_label.configure(text='Density class:')
+    density_class_label.grid(column=0, row=14)
+    density_class_entry = tk_factory.create_entry(right_canvas_frame, 'density_class_entry', True)
+    density_class_entry.grid(column=1, row=14)
+    density_class_entry.bind('<Return>', graph_viewer.onselect)
+
     # Checkbutton if the background should be blank when a graph didn't match with any images
     blank_checkbutton = tk_factory.create_checkbutton(right_canvas_frame, 'blank_checkbutton')
     blank_checkbutton.configure(command=graph_viewer.onselect, offvalue=False, onvalue=True, variable=cb_blank)